@@ -0,0 +1,11 @@
+# benchmarks/__init__.py
+"""
+Medições de desempenho dos repositórios com dados sintéticos reproduzíveis.
+
+Nada aqui é usado pelo caixa: os bancos são gerados em arquivos temporários
+(ou no arquivo indicado) e o 'data/caixa.db' nunca é tocado.
+
+    python -m benchmarks.dados_sinteticos /tmp/base.db --escala grande
+    python -m benchmarks.repositorios --escala pequena --saida resultado.json
+    python -m benchmarks.repositorios --dados /tmp/base.db --comparar anterior.json
+"""
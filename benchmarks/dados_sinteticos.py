@@ -0,0 +1,226 @@
+# benchmarks/dados_sinteticos.py
+"""
+Gerador de bancos sintéticos para os benchmarks.
+
+Com a mesma escala e a mesma semente o conteúdo gerado é sempre o mesmo
+(nomes, preços, datas, UUIDs...), então duas execuções dos benchmarks medem
+exatamente os mesmos dados. As linhas são gravadas direto com executemany,
+em transações de TAMANHO_LOTE, sem passar pelos repositórios; os resumos
+diários são recalculados no final.
+
+Uso:
+    python -m benchmarks.dados_sinteticos /tmp/base.db --escala grande --semente 42
+    python -m benchmarks.dados_sinteticos /tmp/base.db --produtos 2000 --vendas 30000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+import uuid
+
+from src.database import configurar_banco, create_tables, transacao
+from src.models import calcular_subtotal, digito_verificador_gtin, GRAMAS_POR_KG
+from src.relatorios import reconstruir_resumos
+from src.estoque import fotografar_saldos
+
+# (produtos, vendas, itens) de cada escala
+ESCALAS = {
+    "pequena": (1_000, 10_000, 50_000),
+    "media": (10_000, 100_000, 500_000),
+    "grande": (50_000, 1_000_000, 5_000_000),
+}
+SEMENTE_PADRAO = 42
+TAMANHO_LOTE = 20_000
+# Estoque inicial alto para que as vendas medidas nunca falhem por falta de estoque
+ESTOQUE_INICIAL = 10 ** 9
+# As vendas ficam distribuídas nos DIAS_HISTORICO dias anteriores a DATA_FINAL
+DATA_FINAL = datetime.datetime(2024, 12, 31, 22, 0, 0)
+DIAS_HISTORICO = 365
+FRACAO_POR_PESO = 0.2
+FRACAO_CANCELADAS = 0.02
+TIPOS_PAGAMENTO = ("DINHEIRO", "CARTAO", "PIX")
+
+PALAVRAS = ("arroz", "feijão", "açúcar", "café", "leite", "queijo", "pão", "biscoito", "sabão",
+            "detergente", "tomate", "cebola", "batata", "banana", "maçã", "frango", "carne",
+            "óleo", "farinha", "macarrão", "molho", "suco", "água", "refrigerante", "iogurte")
+MARCAS = ("Boa Safra", "Do Campo", "Primor", "Estrela", "Sol Nascente", "Vale Verde", "Bom Preço")
+
+class EscalaDados:
+    """
+    Tamanho do banco sintético e a semente usada para gerá-lo.
+    """
+    def __init__(self, produtos, vendas, itens, semente=SEMENTE_PADRAO):
+        """
+        Args:
+            produtos (int): Quantidade de produtos.
+            vendas (int): Quantidade de vendas.
+            itens (int): Quantidade aproximada de itens (distribuídos entre as vendas).
+            semente (int): Semente do gerador pseudoaleatório.
+        """
+        if produtos <= 0 or vendas < 0 or itens < vendas:
+            raise ValueError("A escala precisa de produtos e de pelo menos um item por venda.")
+        self.produtos = produtos
+        self.vendas = vendas
+        self.itens = itens
+        self.semente = semente
+
+    @classmethod
+    def por_nome(cls, nome, semente=SEMENTE_PADRAO):
+        return cls(*ESCALAS[nome], semente=semente)
+
+    def como_dict(self):
+        return {"produtos": self.produtos, "vendas": self.vendas, "itens": self.itens,
+                "semente": self.semente}
+
+    def __str__(self):
+        return (f"{self.produtos} produtos, {self.vendas} vendas, ~{self.itens} itens "
+                f"(semente {self.semente})")
+
+def nome_produto(indice):
+    """
+    Nome único e pesquisável do produto de número 'indice' (começando em 1).
+    """
+    palavra = PALAVRAS[indice % len(PALAVRAS)]
+    marca = MARCAS[(indice // len(PALAVRAS)) % len(MARCAS)]
+    return f"{palavra.capitalize()} {marca} {indice:06d}"
+
+def codigo_barras_produto(indice):
+    """
+    EAN-13 válido e único do produto de número 'indice'.
+    """
+    corpo = f"789{indice:09d}"
+    return corpo + str(digito_verificador_gtin(corpo))
+
+def _gerar_produtos(rnd, escala):
+    """
+    Gera as linhas de 'produtos': (id, nome, preco, tipo_unidade, estoque, codigo_barras).
+    Também devolve as listas de preço e tipo por produto, usadas nos itens.
+    """
+    linhas, precos, tipos = [], [0], [None] # índice 0 não é usado (IDs começam em 1)
+    for indice in range(1, escala.produtos + 1):
+        tipo = "KG" if rnd.random() < FRACAO_POR_PESO else "UNIDADE"
+        preco = rnd.randint(50, 20_000)
+        linhas.append((indice, nome_produto(indice), preco, tipo, ESTOQUE_INICIAL,
+                       codigo_barras_produto(indice)))
+        precos.append(preco)
+        tipos.append(tipo)
+    return linhas, precos, tipos
+
+def _gerar_vendas(rnd, escala, precos, tipos):
+    """
+    Gera as vendas em blocos de TAMANHO_LOTE: (linhas de 'vendas', linhas de 'itens_venda').
+    """
+    media_itens = escala.itens / escala.vendas if escala.vendas else 0
+    maximo_itens = max(1, int(round(2 * media_itens - 1)))
+    segundos_historico = DIAS_HISTORICO * 24 * 3600
+    inicio_historico = DATA_FINAL - datetime.timedelta(seconds=segundos_historico)
+
+    vendas, itens = [], []
+    for venda_id in range(1, escala.vendas + 1):
+        # Vendas em ordem cronológica, como num caixa de verdade
+        instante = inicio_historico + datetime.timedelta(
+            seconds=segundos_historico * (venda_id - 1) // max(1, escala.vendas) + rnd.randrange(60))
+        total = 0
+        produtos_da_venda = set()
+        for _ in range(rnd.randint(1, maximo_itens)):
+            produto_id = rnd.randint(1, escala.produtos)
+            if produto_id in produtos_da_venda:
+                continue # Uma linha por produto, como na venda em memória
+            produtos_da_venda.add(produto_id)
+            tipo = tipos[produto_id]
+            quantidade = rnd.randint(100, 3 * GRAMAS_POR_KG) if tipo == "KG" else rnd.randint(1, 6)
+            subtotal = calcular_subtotal(precos[produto_id], quantidade, tipo)
+            itens.append((venda_id, produto_id, quantidade, precos[produto_id], subtotal))
+            total += subtotal
+        status = "CANCELADA" if rnd.random() < FRACAO_CANCELADAS else "FINALIZADA"
+        vendas.append((venda_id, instante.strftime("%Y-%m-%d %H:%M:%S"), total, status,
+                       rnd.choice(TIPOS_PAGAMENTO), uuid.UUID(int=rnd.getrandbits(128), version=4).hex))
+
+        if len(itens) >= TAMANHO_LOTE:
+            yield vendas, itens
+            vendas, itens = [], []
+    if vendas:
+        yield vendas, itens
+
+def gerar_banco(caminho, escala, mostrar_progresso=False):
+    """
+    Cria o banco em 'caminho' (que não pode existir) com o schema atual e os
+    dados sintéticos da escala. Retorna um dicionário com a quantidade de
+    linhas gravadas e o tempo gasto.
+    """
+    if os.path.exists(caminho):
+        raise FileExistsError(f"O arquivo '{caminho}' já existe.")
+    inicio = time.perf_counter()
+    configurar_banco(caminho)
+    create_tables()
+
+    rnd = random.Random(escala.semente)
+    produtos, precos, tipos = _gerar_produtos(rnd, escala)
+    with transacao() as conn:
+        conn.executemany("""
+            INSERT INTO produtos (id, nome, preco, tipo_unidade, estoque, codigo_barras)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, produtos)
+        # O estoque inicial entra no histórico de movimentos, como no cadastro
+        inicio_historico = DATA_FINAL - datetime.timedelta(days=DIAS_HISTORICO)
+        conn.executemany("""
+            INSERT INTO movimentos_estoque (produto_id, data_hora, tipo, quantidade, observacao)
+            VALUES (?, ?, 'AJUSTE', ?, 'Cadastro')
+        """, [(linha[0], inicio_historico.strftime("%Y-%m-%d %H:%M:%S"), ESTOQUE_INICIAL) for linha in produtos])
+
+    total_vendas = total_itens = 0
+    for vendas, itens in _gerar_vendas(rnd, escala, precos, tipos):
+        with transacao() as conn:
+            conn.executemany("""
+                INSERT INTO vendas (id, data_hora, total, status, tipo_pagamento, uuid)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, vendas)
+            conn.executemany("""
+                INSERT INTO itens_venda (venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal)
+                VALUES (?, ?, ?, ?, ?)
+            """, itens)
+        total_vendas += len(vendas)
+        total_itens += len(itens)
+        if mostrar_progresso:
+            print(f"\r  {total_vendas}/{escala.vendas} vendas", end="", flush=True)
+    if mostrar_progresso:
+        print()
+
+    reconstruir_resumos()
+    fotografar_saldos()
+    return {"produtos": len(produtos), "vendas": total_vendas, "itens": total_itens,
+            "segundos": time.perf_counter() - inicio}
+
+def adicionar_argumentos_escala(parser):
+    """
+    Argumentos de escala compartilhados com benchmarks.repositorios.
+    """
+    parser.add_argument("--escala", choices=sorted(ESCALAS), default="pequena",
+                        help="Tamanho pré-definido do banco (padrão: pequena)")
+    parser.add_argument("--produtos", type=int, help="Substitui a quantidade de produtos da escala")
+    parser.add_argument("--vendas", type=int, help="Substitui a quantidade de vendas da escala")
+    parser.add_argument("--itens", type=int, help="Substitui a quantidade de itens da escala")
+    parser.add_argument("--semente", type=int, default=SEMENTE_PADRAO, help="Semente dos dados")
+
+def escala_dos_argumentos(args):
+    produtos, vendas, itens = ESCALAS[args.escala]
+    return EscalaDados(args.produtos or produtos, args.vendas if args.vendas is not None else vendas,
+                       args.itens or itens, args.semente)
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Gera um banco com dados sintéticos para benchmarks.")
+    parser.add_argument("arquivo", help="Banco a ser criado (não pode existir)")
+    adicionar_argumentos_escala(parser)
+    args = parser.parse_args(argumentos)
+
+    escala = escala_dos_argumentos(args)
+    print(f"Gerando {escala} em '{args.arquivo}'...")
+    resultado = gerar_banco(args.arquivo, escala, mostrar_progresso=True)
+    print(f"{resultado['produtos']} produtos, {resultado['vendas']} vendas e {resultado['itens']} itens "
+          f"em {resultado['segundos']:.1f}s.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+# benchmarks/repositorios.py
+"""
+Benchmarks do ProdutoRepository e do VendaRepository.
+
+Cada execução roda sobre uma cópia temporária do banco sintético (gerado na
+hora ou lido de --dados), então as medições que gravam ou apagam dados não
+alteram a base e podem ser repetidas. As operações escolhidas em cada
+repetição (IDs, nomes, itens das vendas) também vêm de uma semente fixa.
+
+O resultado sai em JSON (--saida) para comparar execuções: com --comparar,
+as medições cuja mediana piorou mais que --limiar em relação ao arquivo
+anterior são apontadas e o programa termina com código 1.
+
+Uso:
+    python -m benchmarks.repositorios --escala pequena --saida atual.json
+    python -m benchmarks.repositorios --dados /tmp/grande.db --escala grande --comparar anterior.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+from src.database import configurar_banco, gerenciador
+from src.models import Venda, ItemVenda, GRAMAS_POR_KG
+from src.repository import ProdutoRepository, VendaRepository
+
+from .dados_sinteticos import (EscalaDados, gerar_banco, nome_produto, adicionar_argumentos_escala,
+                               escala_dos_argumentos, PALAVRAS, MARCAS)
+
+VERSAO_FORMATO = 1
+LIMIAR_PADRAO = 0.2 # 20% de piora na mediana
+AQUECIMENTO = 5 # Execuções descartadas antes de medir
+ITENS_POR_VENDA_MEDIDA = 5
+
+class Medicao:
+    """
+    Tempos de uma operação medida várias vezes.
+    """
+    def __init__(self, nome):
+        self.nome = nome
+        self.tempos = [] # segundos
+
+    def medir(self, operacao):
+        """
+        Executa operacao() uma vez, guardando o tempo. Retorna o resultado da operação.
+        """
+        inicio = time.perf_counter()
+        resultado = operacao()
+        self.tempos.append(time.perf_counter() - inicio)
+        return resultado
+
+    def resumo(self):
+        tempos = sorted(self.tempos)
+        total = sum(tempos)
+        return {
+            "repeticoes": len(tempos),
+            "total_s": total,
+            "media_ms": total / len(tempos) * 1000 if tempos else 0.0,
+            "min_ms": tempos[0] * 1000 if tempos else 0.0,
+            "p50_ms": _percentil(tempos, 0.50) * 1000,
+            "p95_ms": _percentil(tempos, 0.95) * 1000,
+            "p99_ms": _percentil(tempos, 0.99) * 1000,
+            "max_ms": tempos[-1] * 1000 if tempos else 0.0,
+            "operacoes_por_segundo": len(tempos) / total if total else 0.0,
+        }
+
+def _percentil(ordenados, fracao):
+    """
+    Valor no percentil 'fracao' (0 a 1) de uma lista já ordenada (método do posto mais próximo).
+    """
+    if not ordenados:
+        return 0.0
+    posicao = max(0, min(len(ordenados) - 1, int(round(fracao * len(ordenados))) - 1))
+    return ordenados[posicao]
+
+# --------------------------------------------------------------------------------------
+# Medições. Cada uma recebe (rnd, escala, repeticoes) e devolve uma Medicao.
+# As que alteram o banco ficam no final de MEDICOES.
+
+def produto_por_id(rnd, escala, repeticoes):
+    repo = ProdutoRepository()
+    medicao = Medicao("produto_por_id")
+    for i in range(AQUECIMENTO + repeticoes):
+        produto_id = rnd.randint(1, escala.produtos)
+        if i < AQUECIMENTO:
+            repo.get_by_id(produto_id)
+        else:
+            medicao.medir(lambda: repo.get_by_id(produto_id))
+    return medicao
+
+def produto_por_nome(rnd, escala, repeticoes):
+    repo = ProdutoRepository()
+    medicao = Medicao("produto_por_nome")
+    for i in range(AQUECIMENTO + repeticoes):
+        # Nome digitado em minúsculas: usa o índice NOCASE
+        nome = nome_produto(rnd.randint(1, escala.produtos)).lower()
+        if i < AQUECIMENTO:
+            repo.get_by_name(nome)
+        else:
+            medicao.medir(lambda: repo.get_by_name(nome))
+    return medicao
+
+def produto_busca_texto(rnd, escala, repeticoes):
+    repo = ProdutoRepository()
+    medicao = Medicao("produto_busca_texto")
+    for i in range(AQUECIMENTO + repeticoes):
+        # Prefixos de palavra e marca, como digitado no campo de busca
+        termo = f"{rnd.choice(PALAVRAS)[:4]} {rnd.choice(MARCAS).split()[0][:3]}"
+        if i < AQUECIMENTO:
+            repo.buscar(termo)
+        else:
+            medicao.medir(lambda: repo.buscar(termo))
+    return medicao
+
+def produtos_get_all(rnd, escala, repeticoes):
+    repo = ProdutoRepository()
+    medicao = Medicao("produtos_get_all")
+    repo.get_all()
+    for _ in range(repeticoes):
+        medicao.medir(repo.get_all)
+    return medicao
+
+def venda_por_id_com_itens(rnd, escala, repeticoes):
+    repo = VendaRepository()
+    medicao = Medicao("venda_por_id_com_itens")
+    for i in range(AQUECIMENTO + repeticoes):
+        venda_id = rnd.randint(1, max(1, escala.vendas))
+        if i < AQUECIMENTO:
+            repo.get_by_id(venda_id)
+        else:
+            medicao.medir(lambda: repo.get_by_id(venda_id))
+    return medicao
+
+def venda_finalizar(rnd, escala, repeticoes):
+    """
+    Gravação de uma venda nova com ITENS_POR_VENDA_MEDIDA produtos
+    (venda, itens, baixa de estoque e resumos diários em uma transação).
+    """
+    produto_repo = ProdutoRepository()
+    venda_repo = VendaRepository()
+    medicao = Medicao("venda_finalizar")
+    for i in range(AQUECIMENTO + repeticoes):
+        # Monta a venda fora da medição: só a gravação é medida
+        venda = Venda()
+        for produto_id in rnd.sample(range(1, escala.produtos + 1),
+                                     min(ITENS_POR_VENDA_MEDIDA, escala.produtos)):
+            produto = produto_repo.get_by_id(produto_id)
+            quantidade = rnd.randint(100, 2 * GRAMAS_POR_KG) if produto.tipo_unidade == "KG" else rnd.randint(1, 3)
+            venda.adicionar_item(ItemVenda(produto=produto, quantidade=quantidade,
+                                           preco_unitario_na_venda=produto.preco))
+        tipo_pagamento = rnd.choice(("DINHEIRO", "CARTAO", "PIX"))
+        if i < AQUECIMENTO:
+            venda_repo.finalizar(venda, tipo_pagamento)
+        else:
+            medicao.medir(lambda: venda_repo.finalizar(venda, tipo_pagamento))
+    return medicao
+
+def venda_delete(rnd, escala, repeticoes):
+    repo = VendaRepository()
+    medicao = Medicao("venda_delete")
+    for venda_id in rnd.sample(range(1, escala.vendas + 1), min(repeticoes, escala.vendas)):
+        medicao.medir(lambda: repo.delete(venda_id))
+    return medicao
+
+def produto_delete(rnd, escala, repeticoes):
+    repo = ProdutoRepository()
+    medicao = Medicao("produto_delete")
+    for produto_id in rnd.sample(range(1, escala.produtos + 1), min(repeticoes, escala.produtos)):
+        medicao.medir(lambda: repo.delete(produto_id))
+    return medicao
+
+# (função, repetições padrão)
+MEDICOES = [
+    (produto_por_id, 2000),
+    (produto_por_nome, 2000),
+    (produto_busca_texto, 500),
+    (produtos_get_all, 5),
+    (venda_por_id_com_itens, 1000),
+    (venda_finalizar, 500),
+    (venda_delete, 200),
+    (produto_delete, 200),
+]
+
+# --------------------------------------------------------------------------------------
+
+def copiar_banco(origem, destino):
+    """
+    Copia o banco com a API de backup do SQLite (inclui o que ainda estiver no WAL).
+    """
+    with sqlite3.connect(origem) as fonte, sqlite3.connect(destino) as copia:
+        fonte.backup(copia)
+    fonte.close()
+    copia.close()
+
+def escala_do_banco(caminho, semente):
+    """
+    Lê a escala de um banco sintético já gerado (os IDs vão de 1 ao máximo).
+    """
+    with sqlite3.connect(caminho) as conn:
+        produtos = conn.execute("SELECT COALESCE(MAX(id), 0) FROM produtos").fetchone()[0]
+        vendas = conn.execute("SELECT COALESCE(MAX(id), 0) FROM vendas").fetchone()[0]
+        itens = conn.execute("SELECT COUNT(*) FROM itens_venda").fetchone()[0]
+    conn.close()
+    return EscalaDados(produtos, vendas, itens, semente)
+
+def executar(escala, dados=None, fator=1.0, filtro=None, mostrar_progresso=True):
+    """
+    Roda as medições e retorna o dicionário de resultados (o mesmo gravado por --saida).
+
+    Args:
+        escala (EscalaDados): Escala usada para gerar o banco (e sortear IDs).
+        dados (str, optional): Banco sintético já gerado (a escala passa a ser a dele).
+            Se o arquivo não existir, é gerado nele com a escala informada.
+        fator (float): Multiplica a quantidade de repetições de cada medição.
+        filtro (list, optional): Nomes das medições a executar (padrão: todas).
+    """
+    diretorio = tempfile.mkdtemp(prefix="caixa-bench-")
+    try:
+        geracao = None
+        base = dados or os.path.join(diretorio, "base.db")
+        if not os.path.exists(base):
+            if mostrar_progresso:
+                print(f"Gerando {escala}...")
+            geracao = gerar_banco(base, escala, mostrar_progresso)
+            gerenciador.fechar_todas()
+        # A escala registrada é a do banco (quantidade real de itens; se o banco
+        # foi gerado antes, vale a dele e não a dos argumentos)
+        escala = escala_do_banco(base, escala.semente)
+
+        copia = os.path.join(diretorio, "medicao.db")
+        copiar_banco(base, copia)
+        configurar_banco(copia)
+
+        medicoes = {}
+        for funcao, repeticoes in MEDICOES:
+            if filtro and funcao.__name__ not in filtro:
+                continue
+            if mostrar_progresso:
+                print(f"  {funcao.__name__}...", flush=True)
+            # Cada medição tem a sua semente: o resultado não depende das outras rodarem
+            rnd = random.Random(f"{escala.semente}:{funcao.__name__}")
+            medicao = funcao(rnd, escala, max(1, int(repeticoes * fator)))
+            medicoes[medicao.nome] = medicao.resumo()
+
+        return {
+            "versao_formato": VERSAO_FORMATO,
+            "data": datetime.datetime.now().isoformat(timespec="seconds"),
+            "ambiente": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "plataforma": platform.platform(),
+            },
+            "escala": escala.como_dict(),
+            "geracao": geracao,
+            "medicoes": medicoes,
+        }
+    finally:
+        gerenciador.fechar_todas()
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+def comparar(atual, anterior, limiar=LIMIAR_PADRAO):
+    """
+    Compara a mediana (p50) de cada medição com a de uma execução anterior.
+    Retorna [(nome, p50 anterior, p50 atual, razão, piorou)].
+    """
+    comparacao = []
+    for nome, medicao in atual["medicoes"].items():
+        if nome not in anterior.get("medicoes", {}):
+            continue
+        p50_anterior = anterior["medicoes"][nome]["p50_ms"]
+        p50_atual = medicao["p50_ms"]
+        razao = p50_atual / p50_anterior if p50_anterior else 1.0
+        comparacao.append((nome, p50_anterior, p50_atual, razao, razao > 1 + limiar))
+    return comparacao
+
+def imprimir_resultados(resultado):
+    print("=" * 86)
+    print(f"{'Medição':<24}{'Rep':>6}{'Média':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'Máx':>10}{'op/s':>6}")
+    for nome, m in resultado["medicoes"].items():
+        print(f"{nome:<24}{m['repeticoes']:>6}{m['media_ms']:>8.3f}ms{m['p50_ms']:>8.3f}ms"
+              f"{m['p95_ms']:>8.3f}ms{m['p99_ms']:>8.3f}ms{m['max_ms']:>8.3f}ms{m['operacoes_por_segundo']:>10.0f}")
+    print("=" * 86)
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmarks dos repositórios com dados sintéticos.")
+    adicionar_argumentos_escala(parser)
+    parser.add_argument("--dados", metavar="ARQUIVO",
+                        help="Banco sintético a usar (é gerado nele se não existir; nunca é alterado)")
+    parser.add_argument("--fator", type=float, default=1.0, help="Multiplica as repetições de cada medição")
+    parser.add_argument("--apenas", nargs="+", metavar="MEDICAO",
+                        choices=[funcao.__name__ for funcao, _ in MEDICOES], help="Roda só estas medições")
+    parser.add_argument("--saida", metavar="ARQUIVO", help="Grava os resultados em JSON")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="Resultado anterior (JSON) para comparar")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_PADRAO,
+                        help="Piora aceitável da mediana na comparação (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argumentos)
+
+    escala = escala_dos_argumentos(args)
+    resultado = executar(escala, args.dados, args.fator, args.apenas)
+    imprimir_resultados(resultado)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em '{args.saida}'.")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            anterior = json.load(arquivo)
+        if anterior.get("escala") != resultado["escala"]:
+            print("Aviso: a execução anterior usou outra escala de dados; a comparação é só indicativa.")
+        regressoes = 0
+        for nome, p50_anterior, p50_atual, razao, piorou in comparar(resultado, anterior, args.limiar):
+            marca = "  <-- PIOROU" if piorou else ""
+            print(f"{nome:<24}{p50_anterior:>9.3f}ms -> {p50_atual:>9.3f}ms ({razao:.2f}x){marca}")
+            regressoes += piorou
+        return 1 if regressoes else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,347 @@
+# src/arquivamento.py
+"""
+Arquivamento de vendas antigas em bancos separados, um por período (mês).
+
+O banco do caixa guarda só as vendas recentes: as vendas e os itens dos meses
+já fechados são movidos para 'arquivo/caixa-YYYY-MM.db', ao lado do banco
+principal, e o período é registrado em 'arquivos_vendas'. Assim o banco do
+dia a dia continua pequeno (backup, VACUUM e varreduras mais rápidos), e o
+VendaRepository anexa (ATTACH) os arquivos só quando uma consulta precisa
+deles: por ID, pela faixa de IDs de cada período (e pelas vendas gravadas
+com atraso, registradas uma a uma em 'arquivos_vendas_avulsas'); por data,
+pelos períodos que cruzam o intervalo pedido.
+
+Ficam no banco principal:
+- os resumos diários (os relatórios de fechamento continuam cobrindo os
+  meses arquivados, que não mudam mais);
+- os movimentos de estoque (o 'venda_id' deles continua valendo, pois os IDs
+  das vendas são mantidos no arquivo).
+
+Vendas arquivadas são só para leitura: VendaRepository.delete() e save() não
+as alteram. Para corrigir um período, traga-o de volta com 'restaurar'.
+
+O arquivamento é feito em duas transações, porque com o banco em WAL uma
+transação que grava em mais de um arquivo não é atômica entre eles:
+1. copia as vendas do período para o arquivo (INSERT OR IGNORE, pelo ID);
+2. apaga do banco principal as vendas que já estão no arquivo e registra o período.
+Se o processo parar entre as duas, basta rodar de novo. Uma venda gravada
+depois no período já arquivado (ex: diário reaplicado com atraso) continua
+sendo encontrada no banco principal e é movida na próxima execução; por isso
+os meses mais recentes (MESES_MANTIDOS) nunca são arquivados. Ao reaplicar
+o diário, o UUID da venda também é procurado no arquivo do mês dela, para
+que uma venda já arquivada não seja gravada de novo.
+
+Uso (ex: todo mês, fora do horário de funcionamento):
+    python -m src.arquivamento arquivar [--meses 3] [--compactar]
+    python -m src.arquivamento listar
+    python -m src.arquivamento restaurar 2024-05
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+
+from .database import create_tables, get_db_connection, gerenciador, transacao
+
+# Meses (contando o atual) que nunca saem do banco principal
+MESES_MANTIDOS = 3
+# Pasta dos arquivos, ao lado do banco principal
+DIRETORIO_ARQUIVO = "arquivo"
+# O SQLite anexa no máximo 10 bancos por conexão (SQLITE_MAX_ATTACHED); sobra
+# espaço para quem mais precisar anexar na mesma conexão
+MAXIMO_ANEXADOS = 8
+# Versão do formato dos arquivos (PRAGMA user_version de cada arquivo)
+VERSAO_ARQUIVO = 1
+
+PREFIXO_ESQUEMA = "arquivo_"
+FORMATO_PERIODO = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+def validar_periodo(periodo):
+    """
+    Confere o formato 'YYYY-MM' (o período vira parte do nome do esquema anexado).
+    """
+    if not FORMATO_PERIODO.match(periodo or ""):
+        raise ValueError(f"Período inválido: '{periodo}' (use YYYY-MM).")
+    return periodo
+
+def limites_periodo(periodo):
+    """
+    Retorna (data_inicio, data_fim) do mês 'YYYY-MM': início inclusivo e fim
+    exclusivo, no formato YYYY-MM-DD.
+    """
+    ano, mes = map(int, validar_periodo(periodo).split("-"))
+    proximo_ano, proximo_mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+    return f"{ano:04d}-{mes:02d}-01", f"{proximo_ano:04d}-{proximo_mes:02d}-01"
+
+def periodo_limite(meses_mantidos=MESES_MANTIDOS, hoje=None):
+    """
+    Primeiro período que fica no banco principal: os 'meses_mantidos' meses
+    mais recentes, contando o de 'hoje', não são arquivados.
+    """
+    if meses_mantidos < 1:
+        raise ValueError("Mantenha pelo menos o mês atual no banco principal.")
+    hoje = hoje or datetime.date.today()
+    indice = hoje.year * 12 + hoje.month - 1 - (meses_mantidos - 1)
+    return f"{indice // 12:04d}-{indice % 12 + 1:02d}"
+
+def nome_esquema(periodo):
+    return PREFIXO_ESQUEMA + validar_periodo(periodo).replace("-", "_")
+
+def caminho_arquivo(periodo):
+    """
+    Caminho do banco do período, na pasta de arquivos ao lado do banco principal.
+    """
+    base, extensao = os.path.splitext(os.path.basename(gerenciador.db_path))
+    return os.path.join(os.path.dirname(gerenciador.db_path), DIRETORIO_ARQUIVO,
+                        f"{base}-{validar_periodo(periodo)}{extensao or '.db'}")
+
+def periodos_arquivados(data_inicio=None, data_fim=None, conn=None):
+    """
+    Períodos arquivados que cruzam o intervalo (data_inicio inclusiva e
+    data_fim exclusiva, como nos filtros de vendas), do mais recente para o
+    mais antigo. Retorna as linhas de 'arquivos_vendas'.
+    """
+    condicoes, params = [], []
+    if data_inicio:
+        condicoes.append("data_fim > ?")
+        params.append(data_inicio)
+    if data_fim:
+        condicoes.append("data_inicio < ?")
+        params.append(data_fim)
+    filtro = (" WHERE " + " AND ".join(condicoes)) if condicoes else ""
+    conn = conn or get_db_connection()
+    return conn.execute(f"SELECT * FROM arquivos_vendas{filtro} ORDER BY periodo DESC", params).fetchall()
+
+def anexar(conn, periodo, criar=False):
+    """
+    Anexa à conexão o banco do período (se ainda não estiver anexado) e
+    retorna o nome do esquema para usar nas consultas (ex: arquivo_2024_05.vendas).
+    Sem 'criar', levanta FileNotFoundError se o arquivo do período não existir.
+
+    Se a conexão já tiver MAXIMO_ANEXADOS arquivos, os outros são desanexados
+    antes; isso só é possível fora de uma transação.
+    """
+    esquema = nome_esquema(periodo)
+    anexados = [row[1] for row in conn.execute("PRAGMA database_list").fetchall()
+                if row[1].startswith(PREFIXO_ESQUEMA)]
+    if esquema in anexados:
+        return esquema
+    if len(anexados) >= MAXIMO_ANEXADOS:
+        for outro in anexados:
+            conn.execute(f"DETACH DATABASE {outro}")
+    caminho = caminho_arquivo(periodo)
+    if criar:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    elif not os.path.exists(caminho):
+        raise FileNotFoundError(f"Arquivo do período {periodo} não encontrado: '{caminho}'.")
+    conn.execute(f"ATTACH DATABASE ? AS {esquema}", (caminho,))
+    return esquema
+
+def desanexar_todos(conn=None):
+    """
+    Desanexa todos os arquivos de período da conexão (fora de uma transação).
+    """
+    conn = conn or get_db_connection()
+    for row in conn.execute("PRAGMA database_list").fetchall():
+        if row[1].startswith(PREFIXO_ESQUEMA):
+            conn.execute(f"DETACH DATABASE {row[1]}")
+
+def _criar_tabelas_arquivo(cursor, esquema):
+    """
+    Tabelas 'vendas' e 'itens_venda' do arquivo: as mesmas colunas do banco
+    principal, com os IDs originais (sem AUTOINCREMENT) e os índices das
+    consultas do VendaRepository.
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {esquema}.vendas (
+            id INTEGER PRIMARY KEY,
+            data_hora TEXT NOT NULL, -- Formato YYYY-MM-DD HH:MM:SS
+            total INTEGER NOT NULL, -- centavos
+            status TEXT NOT NULL, -- 'FINALIZADA', 'CANCELADA'
+            tipo_pagamento TEXT, -- 'DINHEIRO', 'CARTAO', 'PIX'
+            uuid TEXT
+        );
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {esquema}.itens_venda (
+            id INTEGER PRIMARY KEY,
+            venda_id INTEGER NOT NULL,
+            produto_id INTEGER NOT NULL, -- produtos fica no banco principal
+            quantidade INTEGER NOT NULL, -- unidades, ou gramas para 'KG'
+            preco_unitario_na_venda INTEGER NOT NULL, -- centavos
+            subtotal INTEGER NOT NULL, -- centavos
+            FOREIGN KEY (venda_id) REFERENCES vendas(id)
+        );
+    """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_itens_venda_venda_id ON itens_venda (venda_id)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {esquema}.idx_vendas_data_hora ON vendas (data_hora)")
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS {esquema}.idx_vendas_status_data_hora ON vendas (status, data_hora)
+    """)
+    cursor.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS {esquema}.idx_vendas_uuid
+        ON vendas (uuid) WHERE uuid IS NOT NULL
+    """)
+    cursor.execute(f"PRAGMA {esquema}.user_version = {int(VERSAO_ARQUIVO)}")
+
+def periodos_para_arquivar(meses_mantidos=MESES_MANTIDOS, hoje=None):
+    """
+    Períodos com vendas no banco principal anteriores aos 'meses_mantidos' mais recentes.
+    """
+    data_limite, _ = limites_periodo(periodo_limite(meses_mantidos, hoje))
+    rows = get_db_connection().execute("""
+        SELECT DISTINCT substr(data_hora, 1, 7) FROM vendas WHERE data_hora < ? ORDER BY 1
+    """, (data_limite,)).fetchall()
+    return [row[0] for row in rows]
+
+def arquivar_periodo(periodo):
+    """
+    Move as vendas e os itens do período para o banco do período (ver as duas
+    etapas na descrição do módulo). Retorna a quantidade de vendas movidas.
+    """
+    data_inicio, data_fim = limites_periodo(periodo)
+    conn = get_db_connection()
+    esquema = anexar(conn, periodo, criar=True)
+
+    # 1. Copia para o arquivo
+    with transacao():
+        cursor = conn.cursor()
+        _criar_tabelas_arquivo(cursor, esquema)
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {esquema}.vendas (id, data_hora, total, status, tipo_pagamento, uuid)
+            SELECT id, data_hora, total, status, tipo_pagamento, uuid
+            FROM main.vendas
+            WHERE data_hora >= ? AND data_hora < ?
+        """, (data_inicio, data_fim))
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {esquema}.itens_venda
+                (id, venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal)
+            SELECT iv.id, iv.venda_id, iv.produto_id, iv.quantidade, iv.preco_unitario_na_venda, iv.subtotal
+            FROM main.itens_venda iv
+            WHERE iv.venda_id IN (SELECT id FROM main.vendas WHERE data_hora >= ? AND data_hora < ?)
+        """, (data_inicio, data_fim))
+
+    # 2. Apaga do banco principal só o que já está no arquivo e registra o período
+    with transacao():
+        cursor = conn.cursor()
+        movidas = f"""
+            SELECT v.id FROM main.vendas v
+            WHERE v.data_hora >= ? AND v.data_hora < ?
+              AND v.id IN (SELECT id FROM {esquema}.vendas)
+        """
+        cursor.execute(f"DELETE FROM main.itens_venda WHERE venda_id IN ({movidas})", (data_inicio, data_fim))
+        cursor.execute(f"DELETE FROM main.vendas WHERE id IN ({movidas})", (data_inicio, data_fim))
+        quantidade = cursor.rowcount
+
+        # A faixa de IDs do período vai só até a primeira venda de um período
+        # seguinte; as vendas do arquivo com ID maior foram gravadas com atraso
+        # e são registradas uma a uma, para a faixa não cobrir outros períodos
+        limites = [row[0] for row in (
+            cursor.execute("SELECT id FROM main.vendas WHERE data_hora >= ? ORDER BY id LIMIT 1",
+                           (data_fim,)).fetchone(),
+            cursor.execute("SELECT MIN(menor_id) FROM main.arquivos_vendas WHERE periodo > ?",
+                           (periodo,)).fetchone(),
+        ) if row is not None and row[0] is not None]
+        limite = min(limites) if limites else None
+        if limite is not None:
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO main.arquivos_vendas_avulsas (venda_id, periodo)
+                SELECT id, ? FROM {esquema}.vendas WHERE id > ?
+            """, (periodo, limite))
+        menor_id, maior_id, na_faixa = cursor.execute(f"""
+            SELECT MIN(id), MAX(id), COUNT(*) FROM {esquema}.vendas WHERE id <= COALESCE(?, id)
+        """, (limite,)).fetchone()
+        if not na_faixa:
+            # Só vendas atrasadas: todas já estão registradas uma a uma
+            menor_id = maior_id = 0
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO main.arquivos_vendas
+                (periodo, arquivo, data_inicio, data_fim, menor_id, maior_id, quantidade_vendas, arquivado_em)
+            SELECT ?, ?, ?, ?, ?, ?, COUNT(*), datetime('now', 'localtime')
+            FROM {esquema}.vendas
+            HAVING COUNT(*) > 0
+        """, (periodo, os.path.basename(caminho_arquivo(periodo)), data_inicio, data_fim, menor_id, maior_id))
+    return quantidade
+
+def arquivar(meses_mantidos=MESES_MANTIDOS, hoje=None, compactar=False):
+    """
+    Arquiva todos os períodos anteriores aos 'meses_mantidos' mais recentes.
+    Com 'compactar', roda VACUUM no banco principal no final para devolver
+    ao disco o espaço liberado.
+    Retorna [(periodo, vendas movidas)].
+    """
+    resultado = []
+    try:
+        for periodo in periodos_para_arquivar(meses_mantidos, hoje):
+            resultado.append((periodo, arquivar_periodo(periodo)))
+    finally:
+        desanexar_todos()
+    if compactar and resultado:
+        get_db_connection().execute("VACUUM")
+    return resultado
+
+def restaurar_periodo(periodo):
+    """
+    Traz as vendas do período de volta para o banco principal, remove o
+    registro do período e apaga o arquivo. Retorna a quantidade de vendas restauradas.
+    """
+    conn = get_db_connection()
+    if conn.execute("SELECT 1 FROM arquivos_vendas WHERE periodo = ?", (periodo,)).fetchone() is None:
+        raise ValueError(f"O período {periodo} não está arquivado.")
+    esquema = anexar(conn, periodo)
+    try:
+        with transacao():
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO main.vendas (id, data_hora, total, status, tipo_pagamento, uuid)
+                SELECT id, data_hora, total, status, tipo_pagamento, uuid FROM {esquema}.vendas
+            """)
+            quantidade = cursor.rowcount
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO main.itens_venda
+                    (id, venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal)
+                SELECT id, venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal
+                FROM {esquema}.itens_venda
+            """)
+            cursor.execute("DELETE FROM main.arquivos_vendas WHERE periodo = ?", (periodo,))
+            cursor.execute("DELETE FROM main.arquivos_vendas_avulsas WHERE periodo = ?", (periodo,))
+    finally:
+        desanexar_todos(conn)
+    os.remove(caminho_arquivo(periodo))
+    return quantidade
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Arquivamento de vendas antigas por período.")
+    subparsers = parser.add_subparsers(dest="acao", required=True)
+    parser_arquivar = subparsers.add_parser("arquivar", help="Move os meses antigos para bancos separados")
+    parser_arquivar.add_argument("--meses", type=int, default=MESES_MANTIDOS,
+                                 help=f"Meses mais recentes mantidos no banco principal (padrão: {MESES_MANTIDOS})")
+    parser_arquivar.add_argument("--compactar", action="store_true",
+                                 help="Roda VACUUM no banco principal depois de arquivar")
+    subparsers.add_parser("listar", help="Lista os períodos arquivados")
+    parser_restaurar = subparsers.add_parser("restaurar", help="Traz um período de volta ao banco principal")
+    parser_restaurar.add_argument("periodo", help="YYYY-MM")
+    args = parser.parse_args(argumentos)
+
+    create_tables()
+    if args.acao == "arquivar":
+        resultado = arquivar(args.meses, compactar=args.compactar)
+        for periodo, quantidade in resultado:
+            print(f"- {periodo}: {quantidade} venda(s) em '{caminho_arquivo(periodo)}'")
+        print(f"{len(resultado)} período(s) arquivado(s).")
+    elif args.acao == "listar":
+        for row in reversed(periodos_arquivados()):
+            print(f"- {row['periodo']}: {row['quantidade_vendas']} venda(s) | IDs {row['menor_id']} a "
+                  f"{row['maior_id']} | {row['arquivo']} | arquivado em {row['arquivado_em']}")
+    else:
+        try:
+            quantidade = restaurar_periodo(args.periodo)
+        except ValueError as e:
+            print(e)
+            return 1
+        print(f"{quantidade} venda(s) de {args.periodo} restaurada(s) no banco principal.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
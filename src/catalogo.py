@@ -0,0 +1,228 @@
+# src/catalogo.py
+import threading
+import time
+from collections import OrderedDict
+
+from .database import gerenciador
+from .repository import ProdutoRepository
+
+class CatalogoProdutos:
+    """
+    Cache em memória (read-through) dos produtos, na frente do ProdutoRepository.
+
+    As consultas por ID, por nome e por código de barras primeiro procuram no
+    cache; só vão ao banco quando o produto ainda não foi carregado. O cache tem
+    tamanho máximo e descarta os produtos usados há mais tempo (LRU).
+
+    O cache é invalidado:
+    - pelo próprio catálogo, em save() e delete();
+    - quando outra conexão (outro caixa, outra thread, outro processo) grava no
+      banco. Isso é detectado com PRAGMA data_version, verificado no máximo uma
+      vez a cada 'intervalo_verificacao' segundos. Nesse caso só os produtos do
+      cache cuja 'versao' mudou no banco são recarregados (ex: os itens de uma
+      venda), e os removidos saem do cache; o resto continua em memória.
+    """
+    def __init__(self, produto_repo=None, tamanho_maximo=5000, intervalo_verificacao=0.5):
+        """
+        Args:
+            produto_repo (ProdutoRepository, optional): Repositório usado para ir ao banco.
+            tamanho_maximo (int): Quantidade máxima de produtos mantidos em memória.
+            intervalo_verificacao (float): Intervalo mínimo (segundos) entre as verificações
+                de mudanças feitas por outras conexões.
+        """
+        self.produto_repo = produto_repo or ProdutoRepository()
+        self.tamanho_maximo = tamanho_maximo
+        self.intervalo_verificacao = intervalo_verificacao
+
+        self._lock = threading.RLock()
+        self._por_id = OrderedDict() # id -> Produto, do menos para o mais usado
+        self._por_chave = {} # (tipo, valor) -> id, ex: ('nome', 'arroz') ou ('codigo', '789...')
+        self._chaves_do_produto = {} # id -> conjunto de chaves que apontam para ele
+
+        # Conexão própria, usada só para PRAGMA data_version. Como ela nunca grava,
+        # qualquer COMMIT de outra conexão (inclusive as da aplicação) muda o valor;
+        # a 'versao' de cada produto diz quais linhas realmente mudaram.
+        self._conexao_versao = None
+        self._data_version = None
+        self._ultima_verificacao = 0.0
+
+    # ----------------------------------------------------------------------------------
+    # Consultas
+
+    def get_by_id(self, produto_id):
+        """
+        Retorna o Produto com o ID informado (do cache ou do banco), ou None.
+        """
+        produto_id = int(produto_id)
+        with self._lock:
+            self._verificar_mudancas()
+            produto = self._por_id.get(produto_id)
+            if produto is not None:
+                self._por_id.move_to_end(produto_id)
+                return produto
+
+        produto = self.produto_repo.get_by_id(produto_id)
+        if produto is not None:
+            self._guardar(produto)
+        return produto
+
+    def get_by_name(self, produto_name):
+        """
+        Retorna o Produto para o nome digitado (mesma regra de ProdutoRepository.get_by_name).
+        """
+        return self._consultar(('nome', produto_name.strip().lower()),
+                               lambda: self.produto_repo.get_by_name(produto_name))
+
+    def get_by_barcode(self, codigo_barras):
+        """
+        Retorna o Produto com o código de barras informado (leitura do scanner), ou None.
+        """
+        codigo_barras = str(codigo_barras).strip()
+        return self._consultar(('codigo', codigo_barras),
+                               lambda: self.produto_repo.get_by_barcode(codigo_barras))
+
+    def buscar(self, termo, limite=20):
+        """
+        Busca por texto. O resultado não é guardado como consulta, mas os
+        produtos encontrados passam a estar no cache.
+        """
+        produtos = self.produto_repo.buscar(termo, limite)
+        return [self._guardar(produto) for produto in produtos]
+
+    def get_all(self):
+        """
+        Lista todos os produtos direto do banco (não passa pelo cache).
+        """
+        return self.produto_repo.get_all()
+
+    def aquecer(self, limite=None):
+        """
+        Pré-carrega produtos no cache (ex: logo após abrir o caixa), já indexados
+        pelo código de barras, para que as leituras do scanner não vão ao banco.
+        Lê só 'limite' produtos (padrão: tamanho_maximo), não o catálogo inteiro.
+        Retorna a quantidade de produtos carregados.
+        """
+        limite = limite or self.tamanho_maximo
+        produtos, _ = self.produto_repo.listar_pagina(limite=limite)
+        for produto in produtos:
+            chave = ('codigo', produto.codigo_barras) if produto.codigo_barras else None
+            self._guardar(produto, chave)
+        return len(produtos)
+
+    # ----------------------------------------------------------------------------------
+    # Escrita (sempre vai ao banco e invalida o cache)
+
+    def save(self, produto):
+        produto = self.produto_repo.save(produto)
+        with self._lock:
+            self._remover(produto.id)
+        self._guardar(produto)
+        return produto
+
+    def delete(self, produto_id):
+        removido = self.produto_repo.delete(produto_id)
+        with self._lock:
+            self._remover(int(produto_id))
+        return removido
+
+    def invalidar(self):
+        """
+        Esvazia o cache por completo.
+        """
+        with self._lock:
+            self._por_id.clear()
+            self._por_chave.clear()
+            self._chaves_do_produto.clear()
+
+    def fechar(self):
+        """
+        Fecha a conexão usada para detectar mudanças.
+        """
+        with self._lock:
+            if self._conexao_versao is not None:
+                self._conexao_versao.close()
+                self._conexao_versao = None
+
+    def __len__(self):
+        return len(self._por_id)
+
+    # ----------------------------------------------------------------------------------
+    # Funções internas
+
+    def _consultar(self, chave, carregar):
+        """
+        Procura a chave no cache; se não houver, usa 'carregar' e guarda o resultado.
+        """
+        with self._lock:
+            self._verificar_mudancas()
+            produto_id = self._por_chave.get(chave)
+            if produto_id is not None and produto_id in self._por_id:
+                self._por_id.move_to_end(produto_id)
+                return self._por_id[produto_id]
+
+        produto = carregar()
+        if produto is not None:
+            produto = self._guardar(produto, chave)
+        return produto
+
+    def _guardar(self, produto, chave=None):
+        """
+        Coloca o produto no cache (e a chave de consulta, se houver) e aplica o LRU.
+        Se o produto já estiver no cache, mantém a instância existente.
+        """
+        with self._lock:
+            existente = self._por_id.get(produto.id)
+            if existente is not None:
+                produto = existente
+                self._por_id.move_to_end(produto.id)
+            else:
+                self._por_id[produto.id] = produto
+            if chave is not None:
+                self._por_chave[chave] = produto.id
+                self._chaves_do_produto.setdefault(produto.id, set()).add(chave)
+
+            while len(self._por_id) > self.tamanho_maximo:
+                produto_antigo_id, _ = self._por_id.popitem(last=False)
+                self._remover(produto_antigo_id)
+        return produto
+
+    def _remover(self, produto_id):
+        """
+        Remove um produto e todas as chaves de consulta que apontam para ele.
+        """
+        self._por_id.pop(produto_id, None)
+        for chave in self._chaves_do_produto.pop(produto_id, ()):
+            self._por_chave.pop(chave, None)
+
+    def _verificar_mudancas(self):
+        """
+        Invalida o cache se outra conexão gravou no banco desde a última verificação.
+        """
+        agora = time.monotonic()
+        if agora - self._ultima_verificacao < self.intervalo_verificacao:
+            return
+        self._ultima_verificacao = agora
+
+        if self._conexao_versao is None:
+            self._conexao_versao = gerenciador.abrir_conexao()
+        versao = self._conexao_versao.execute("PRAGMA data_version").fetchone()[0]
+        if self._data_version is not None and versao != self._data_version:
+            self._recarregar_alterados()
+        self._data_version = versao
+
+    def _recarregar_alterados(self):
+        """
+        Compara a versão de cada produto do cache com a do banco e recarrega só
+        os que mudaram (mantendo o índice por código de barras). Os produtos
+        removidos do banco saem do cache.
+        """
+        versoes = self.produto_repo.versoes(list(self._por_id))
+        alterados = [produto_id for produto_id, produto in self._por_id.items()
+                     if versoes.get(produto_id) != produto.versao]
+        if not alterados:
+            return
+        novos = self.produto_repo.get_many([produto_id for produto_id in alterados if produto_id in versoes])
+        for produto_id in alterados:
+            self._remover(produto_id)
+        for produto in novos:
+            self._guardar(produto, ('codigo', produto.codigo_barras) if produto.codigo_barras else None)
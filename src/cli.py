@@ -1,10 +1,24 @@
 # src/main.py
+import argparse
+import json
+import sqlite3
 import sys
+import time
 from .database import create_tables
-from .repository import ProdutoRepository, VendaRepository
-from .models import Produto, Venda, ItemVenda
+from .repository import ProdutoRepository, VendaRepository, ConflitoVersaoError
+from .models import (Produto, Venda, ItemVenda, validar_codigo_barras, para_centavos,
+                     para_quantidade, formatar_moeda, formatar_quantidade)
+from .catalogo import CatalogoProdutos
+from .diario import abrir_diario
+from .instrumentacao import ativar_pelo_ambiente
 
 venda_atual = None
+# Cache dos produtos usados nas vendas (evita ir ao banco a cada item)
+catalogo = CatalogoProdutos()
+# Diário de vendas (modo --diario): quando ativo, finalizar só grava no diário
+diario = None
+
+TIPOS_PAGAMENTO = ("DINHEIRO", "CARTAO", "PIX")
 
 def menu():
     """
@@ -33,8 +47,8 @@ def registrar_produto():
 
     try:
         preco_input = input("Digite o valor do produto: ")
-        # Substitui a vírgula por ponto para o float funcionar em pt-br
-        preco = float(preco_input.replace(',', '.')) 
+        # Aceita vírgula ou ponto (pt-br) e guarda o valor em centavos
+        preco = para_centavos(preco_input)
         if preco <= 0:
             print("O preço deve ser maior que zero.")
             return
@@ -44,7 +58,8 @@ def registrar_produto():
             print("Tipo de unidade inválido. Use 'UNIDADE' ou 'KG'.")
             return
             
-        estoque = int(input("Digite a quantidade em estoque: "))
+        # Produtos por peso: estoque digitado em kg e guardado em gramas
+        estoque = para_quantidade(input("Digite a quantidade em estoque: "), tipo_unidade_input)
         if estoque < 0:
             print("Estoque não pode ser negativo.")
             return
@@ -52,11 +67,20 @@ def registrar_produto():
     except ValueError:
         print("Entrada inválida. Certifique-se de digitar números para preço e estoque.")
         return
+
+    codigo_barras = input("Código de barras (opcional, Enter para pular): ").strip() or None
+    if codigo_barras:
+        try:
+            codigo_barras = validar_codigo_barras(codigo_barras)
+        except ValueError as e:
+            print(f"Erro: {e}")
+            return
     
     produto_repo = ProdutoRepository()
     
     # 1. Cria um objeto Produto a partir das entradas do usuário
-    novo_produto = Produto(nome=nome, preco=preco, tipo_unidade=tipo_unidade_input, estoque=estoque)
+    novo_produto = Produto(nome=nome, preco=preco, tipo_unidade=tipo_unidade_input, estoque=estoque,
+                           codigo_barras=codigo_barras)
 
     # 2. Usa o Repositório para salvar o objeto no banco de dados
     produto_repo.save(novo_produto)
@@ -81,7 +105,7 @@ def remover_produto():
     print("="*50)
     print("LISTA DE PRODUTOS CADASTRADOS:")
     for p in produtos:
-        print(f"- [ID: {p.id}] Nome: {p.nome} | Preço: R${p.preco:.2f} | Estoque: {p.estoque}")
+        print(f"- [ID: {p.id}] Nome: {p.nome} | Preço: {formatar_moeda(p.preco)} | Estoque: {formatar_quantidade(p.estoque, p.tipo_unidade)}")
     print("="*50)
 
     try:
@@ -158,7 +182,7 @@ def editar_produto():
     print("="*50)
     print("PRODUTOS PARA EDIÇÃO:")
     for p in produtos:
-        print(f"- [ID: {p.id}] Nome: {p.nome} | Preço: R${p.preco:.2f} | Estoque: {p.estoque} | Tipo: {p.tipo_unidade}")
+        print(f"- [ID: {p.id}] Nome: {p.nome} | Preço: {formatar_moeda(p.preco)} | Estoque: {formatar_quantidade(p.estoque, p.tipo_unidade)} | Tipo: {p.tipo_unidade}")
     print("="*50)
 
     try:
@@ -178,16 +202,16 @@ def editar_produto():
 
     # Pede as novas informações, dando a opção de manter a atual
     novo_nome = input(f"Novo nome ({produto.nome}): ").strip()
-    novo_preco_str = input(f"Novo preço ({produto.preco}): ").strip()
+    novo_preco_str = input(f"Novo preço ({formatar_moeda(produto.preco)}): ").strip()
     novo_tipo = input(f"Novo tipo de unidade ({produto.tipo_unidade}): ").upper().strip()
-    novo_estoque_str = input(f"Novo estoque ({produto.estoque}): ").strip()
+    novo_estoque_str = input(f"Novo estoque ({formatar_quantidade(produto.estoque, produto.tipo_unidade)}): ").strip()
 
     # Atualiza o objeto Produto com as novas informações se forem fornecidas
     if novo_nome:
         produto.nome = novo_nome
     if novo_preco_str:
         try:
-            novo_preco = float(novo_preco_str.replace(',', '.'))
+            novo_preco = para_centavos(novo_preco_str)
             produto.preco = novo_preco
         except ValueError:
             print("Valor do preço inválido. O preço não foi alterado.")
@@ -199,14 +223,19 @@ def editar_produto():
         produto.tipo_unidade = novo_tipo
     if novo_estoque_str:
         try:
-            novo_estoque = int(novo_estoque_str)
+            novo_estoque = para_quantidade(novo_estoque_str, produto.tipo_unidade)
             produto.estoque = novo_estoque
         except ValueError:
             print("Valor do estoque inválido. O estoque não foi alterado.")
             return
 
-    # Salva o objeto Produto atualizado no banco de dados
-    produto_repo.save(produto)
+    # Salva o objeto Produto atualizado no banco de dados. Se outro caixa alterou
+    # o produto enquanto ele era editado, nada é gravado.
+    try:
+        produto_repo.save(produto)
+    except ConflitoVersaoError as e:
+        print(f"Não foi possível salvar: {e}")
+        return
     print(f"\nProduto '{produto.nome}' atualizado com sucesso!")
 
 def mostrar_parcial():
@@ -222,55 +251,71 @@ def mostrar_parcial():
     print("=" * 50)
     print("RESUMO DA VENDA:")
     for i, item in enumerate(venda_atual.itens):
-        print(f"{i + 1}. {item.produto.nome}: \tR$ {item.subtotal:.2f}")
+        print(f"{i + 1}. {item.produto.nome}: \t{formatar_moeda(item.subtotal)}")
     
     print("-" * 50)
-    print(f"Sub-Total: R${venda_atual.total:.2f}")
+    print(f"Sub-Total: {formatar_moeda(venda_atual.total)}")
     print("=" * 50)
     
 def finalizar_compra():
     """
     Finaliza a venda em andamento, atualiza o estoque e salva no banco de dados.
+    Tudo acontece em uma única transação: ou a venda inteira é gravada, ou nada é.
     """
     global venda_atual
     venda_repo = VendaRepository()
-    produto_repo = ProdutoRepository()
     
     if not venda_atual or not venda_atual.itens:
         print("Não há itens para finalizar a compra.")
         return
 
     print("=" * 50)
-    print(f"Valor a ser cobrado: R${venda_atual.total:.2f}")
+    print(f"Valor a ser cobrado: {formatar_moeda(venda_atual.total)}")
     
     tipo_pagamento = input("Tipo de pagamento (DINHEIRO/CARTAO/PIX): ").upper()
-    if tipo_pagamento not in ["DINHEIRO", "CARTAO", "PIX"]:
+    if tipo_pagamento not in TIPOS_PAGAMENTO:
         print("Tipo de pagamento inválido.")
         return
-        
-    venda_atual.status = "FINALIZADA"
-    venda_atual.tipo_pagamento = tipo_pagamento
-
-    # Atualiza o estoque no banco de dados para cada item da venda
-    print("Atualizando estoque...")
-    for item in venda_atual.itens:
-        produto = produto_repo.get_by_id(item.produto.id)
-        if produto:
-            try:
-                produto.atualizar_estoque(-item.quantidade)
-                produto_repo.save(produto)
-            except ValueError as e:
-                print(f"Erro ao atualizar estoque do produto '{produto.nome}': {e}")
-                # Em um sistema real, aqui você cancelaria a transação e informaria ao usuário.
-
-    # Salva a venda e seus itens no banco de dados
-    venda_repo.save(venda_atual)
-    
+
+    try:
+        concluir_venda(tipo_pagamento, venda_repo)
+    except (ValueError, sqlite3.Error, OSError) as e:
+        # Estoque insuficiente, banco bloqueado ou falha ao gravar o diário: a venda
+        # em andamento continua aberta para uma nova tentativa
+        print(f"Não foi possível finalizar a compra: {e}")
+        return
+
     print("\nCompra finalizada com sucesso!")
     print("=" * 50)
 
+def concluir_venda(tipo_pagamento, venda_repo=None):
+    """
+    Finaliza a venda em andamento e começa uma nova. Usado pelo menu e pelo modo script.
+    Levanta ValueError (ou EstoqueInsuficienteError) se a venda não puder ser finalizada,
+    sqlite3.Error se o banco falhar e OSError se o diário não puder ser gravado; em
+    todos os casos a venda em andamento é mantida.
+
+    Args:
+        tipo_pagamento (str): 'DINHEIRO', 'CARTAO' ou 'PIX'.
+        venda_repo (VendaRepository, optional): Repositório usado fora do modo diário.
+
+    Returns:
+        Venda: A venda finalizada.
+    """
+    global venda_atual
+    if tipo_pagamento not in TIPOS_PAGAMENTO:
+        raise ValueError(f"Tipo de pagamento inválido: '{tipo_pagamento}'.")
+
+    # Salva a venda, seus itens e a baixa de estoque em uma única transação
+    # (ou, no modo diário, grava no diário e o banco é atualizado em lote)
+    if diario is not None:
+        venda = diario.registrar(venda_atual, tipo_pagamento)
+    else:
+        venda = (venda_repo or VendaRepository()).finalizar(venda_atual, tipo_pagamento)
+
     # Limpa a venda atual para uma nova transação
     venda_atual = Venda()
+    return venda
 
 def adicionar_produto_a_venda():
     """
@@ -288,51 +333,253 @@ def adicionar_produto_a_venda():
     print("="*50)
     print("PRODUTOS DISPONÍVEIS:")
     for p in produtos:
-        print(f"- [ID: {p.id}] Nome: {p.nome} | Preço: R${p.preco:.2f} | Estoque: {p.estoque}")
+        print(f"- [ID: {p.id}] Nome: {p.nome} | Preço: {formatar_moeda(p.preco)} | Estoque: {formatar_quantidade(p.estoque, p.tipo_unidade)}")
     print("="*50)
     
     try:
         produto_id = int(input("Digite o ID do produto para adicionar à venda: "))
-        quantidade = float(input("Digite a quantidade: "))
     except ValueError:
         print("Entrada inválida. Digite números para ID e quantidade.")
         return
         
-    produto_selecionado = produto_repo.get_by_id(produto_id)
+    produto_selecionado = catalogo.get_by_id(produto_id)
     if not produto_selecionado:
         print("ID de produto não encontrado.")
         return
 
     try:
-        # A validação de estoque está no método da classe Produto
-        if quantidade <= 0 or quantidade > produto_selecionado.estoque:
-            raise ValueError("Quantidade inválida ou insuficiente em estoque.")
-            
-        # Cria um objeto ItemVenda e o adiciona à Venda em andamento
-        item_venda = ItemVenda(
-            produto=produto_selecionado, 
-            quantidade=quantidade,
-            preco_unitario_na_venda=produto_selecionado.preco # Salva o preço atual
-        )
-        
-        venda_atual.adicionar_item(item_venda)
-        print(f"'{produto_selecionado.nome}' adicionado à venda. Subtotal: R${item_venda.subtotal:.2f}")
+        # Produtos por peso: quantidade digitada em kg e guardada em gramas
+        quantidade = para_quantidade(input("Digite a quantidade: "), produto_selecionado.tipo_unidade)
+    except ValueError:
+        print("Entrada inválida. Digite números para ID e quantidade.")
+        return
+
+    try:
+        linha = incluir_na_venda(produto_selecionado, quantidade)
+        print(f"'{produto_selecionado.nome}' adicionado à venda. Subtotal: {formatar_moeda(linha.subtotal)}")
     except ValueError as e:
         print(f"Erro: {e}")
 
+def incluir_na_venda(produto, quantidade):
+    """
+    Adiciona o produto à venda em andamento. Usado pelo menu e pelo modo script.
+    Levanta ValueError se a quantidade for inválida ou o estoque não cobrir a venda.
+
+    Args:
+        produto (Produto): Produto vendido (normalmente vindo do catálogo).
+        quantidade (int): Quantidade na unidade de controle (unidades, ou gramas para 'KG').
+
+    Returns:
+        ItemVenda: A linha da venda com a quantidade já somada.
+    """
+    # O estoque precisa cobrir também o que já está na venda deste produto
+    linha = venda_atual.obter_linha(produto.id)
+    ja_na_venda = linha.quantidade if linha else 0
+    if quantidade <= 0 or ja_na_venda + quantidade > produto.estoque:
+        raise ValueError("Quantidade inválida ou insuficiente em estoque.")
+
+    # Cria um objeto ItemVenda e o adiciona à Venda em andamento
+    item_venda = ItemVenda(
+        produto=produto,
+        quantidade=quantidade,
+        preco_unitario_na_venda=produto.preco # Salva o preço atual
+    )
+
+    # Se o produto já estiver na venda, a quantidade é somada à mesma linha
+    return venda_atual.adicionar_item(item_venda)
+
+def retirar_da_venda(produto_id, quantidade=None):
+    """
+    Retira um produto da venda em andamento (ex: item lido a mais).
+    Levanta ValueError se o produto não estiver na venda.
+
+    Args:
+        produto_id (int): ID do produto.
+        quantidade (int, optional): Quantidade a retirar. Se omitida, a linha inteira sai da venda.
+    """
+    if quantidade is None:
+        removido = venda_atual.remover_linha(produto_id)
+    else:
+        if quantidade <= 0:
+            raise ValueError("Quantidade inválida.")
+        removido = venda_atual.decrementar(produto_id, quantidade)
+    if not removido:
+        raise ValueError(f"O produto {produto_id} não está na venda.")
 
+# ----------------------------------------------------------------------------------
+# Modo script (--script): repete um fluxo de operações de caixa sem o menu
+
+def executar_operacao(comando):
+    """
+    Executa um comando do script usando as mesmas funções do menu.
+    Levanta ValueError (ou KeyError, se faltar um campo) se a operação falhar.
+
+    Comandos (um objeto JSON por linha):
+        {"op": "adicionar", "produto_id": 3, "quantidade": "2"}
+        {"op": "adicionar", "codigo_barras": "7891234567895", "quantidade": "0,350"}
+        {"op": "remover", "produto_id": 3}              (quantidade opcional)
+        {"op": "finalizar", "tipo_pagamento": "PIX"}
+        {"op": "cancelar"}                              (descarta a venda em andamento)
+    A quantidade segue o que é digitado no menu: unidades, ou kg para produtos por peso.
+    """
+    global venda_atual
+    operacao = comando["op"]
+    if operacao == "adicionar":
+        if "codigo_barras" in comando:
+            produto = catalogo.get_by_barcode(comando["codigo_barras"])
+        else:
+            produto = catalogo.get_by_id(int(comando["produto_id"]))
+        if not produto:
+            raise ValueError("Produto não encontrado.")
+        quantidade = para_quantidade(str(comando.get("quantidade", 1)), produto.tipo_unidade)
+        incluir_na_venda(produto, quantidade)
+    elif operacao == "remover":
+        produto_id = int(comando["produto_id"])
+        quantidade = None
+        if comando.get("quantidade") is not None:
+            linha = venda_atual.obter_linha(produto_id)
+            if linha is None:
+                raise ValueError(f"O produto {produto_id} não está na venda.")
+            quantidade = para_quantidade(str(comando["quantidade"]), linha.produto.tipo_unidade)
+        retirar_da_venda(produto_id, quantidade)
+    elif operacao == "finalizar":
+        concluir_venda(str(comando.get("tipo_pagamento", "DINHEIRO")).upper())
+    elif operacao == "cancelar":
+        venda_atual = Venda()
+    else:
+        raise ValueError(f"Operação desconhecida: '{operacao}'.")
 
+def _percentil(ordenados, fracao):
+    """
+    Valor no percentil 'fracao' (0 a 1) de uma lista já ordenada (método do posto mais próximo).
+    """
+    if not ordenados:
+        return 0.0
+    posicao = max(0, min(len(ordenados) - 1, int(round(fracao * len(ordenados))) - 1))
+    return ordenados[posicao]
 
+def executar_script(caminho):
+    """
+    Lê o arquivo JSON Lines de comandos e executa um por um, medindo o tempo de
+    cada operação. Linhas inválidas e operações que falharem são contadas como
+    erro e o script continua.
+
+    Returns:
+        dict: Estatísticas por operação ({op: {quantidade, erros, media_ms, p50_ms,
+        p95_ms, p99_ms, max_ms}}), além de 'operacoes', 'erros', 'vendas',
+        'segundos' e 'operacoes_por_segundo' do script inteiro.
+    """
+    global venda_atual
+    venda_atual = Venda()
+    tempos = {} # op -> [segundos]
+    erros = {} # op -> quantidade
+    exemplos_erro = [] # (linha, mensagem), só os primeiros
+    vendas = 0
+
+    inicio = time.perf_counter()
+    with open(caminho, encoding="utf-8") as arquivo:
+        for numero_linha, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                comando = json.loads(linha)
+                operacao = comando["op"]
+                if not isinstance(operacao, str):
+                    raise TypeError(f"'op' deve ser texto, não {type(operacao).__name__}")
+            except (ValueError, KeyError, TypeError) as e:
+                erros["invalida"] = erros.get("invalida", 0) + 1
+                if len(exemplos_erro) < 10:
+                    exemplos_erro.append((numero_linha, f"linha inválida ({e})"))
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                executar_operacao(comando)
+            except (ValueError, KeyError, TypeError, ConflitoVersaoError, sqlite3.Error) as e:
+                erros[operacao] = erros.get(operacao, 0) + 1
+                if len(exemplos_erro) < 10:
+                    exemplos_erro.append((numero_linha, f"{operacao}: {e}"))
+            else:
+                if operacao == "finalizar":
+                    vendas += 1
+            tempos.setdefault(operacao, []).append(time.perf_counter() - t0)
+    segundos = time.perf_counter() - inicio
+
+    estatisticas = {}
+    for operacao in sorted(set(tempos) | set(erros)):
+        medidas = sorted(tempos.get(operacao, []))
+        estatisticas[operacao] = {
+            "quantidade": len(medidas),
+            "erros": erros.get(operacao, 0),
+            "media_ms": (sum(medidas) / len(medidas) * 1000) if medidas else 0.0,
+            "p50_ms": _percentil(medidas, 0.50) * 1000,
+            "p95_ms": _percentil(medidas, 0.95) * 1000,
+            "p99_ms": _percentil(medidas, 0.99) * 1000,
+            "max_ms": (medidas[-1] * 1000) if medidas else 0.0,
+        }
+    total_operacoes = sum(len(medidas) for medidas in tempos.values())
+    return {
+        "por_operacao": estatisticas,
+        "operacoes": total_operacoes,
+        "erros": sum(erros.values()),
+        "exemplos_erro": exemplos_erro,
+        "vendas": vendas,
+        "segundos": segundos,
+        "operacoes_por_segundo": total_operacoes / segundos if segundos else 0.0,
+        "vendas_por_segundo": vendas / segundos if segundos else 0.0,
+    }
+
+def imprimir_desempenho(resultado):
+    """
+    Mostra as estatísticas retornadas por executar_script().
+    """
+    print("=" * 78)
+    print(f"{'Operação':<12}{'Qtd':>8}{'Erros':>7}{'Média':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'Máx':>10}")
+    for operacao, e in resultado["por_operacao"].items():
+        print(f"{operacao:<12}{e['quantidade']:>8}{e['erros']:>7}{e['media_ms']:>8.3f}ms"
+              f"{e['p50_ms']:>8.3f}ms{e['p95_ms']:>8.3f}ms{e['p99_ms']:>8.3f}ms{e['max_ms']:>8.3f}ms")
+    print("-" * 78)
+    print(f"Operações: {resultado['operacoes']} | Erros: {resultado['erros']} | "
+          f"Vendas finalizadas: {resultado['vendas']} | Tempo: {resultado['segundos']:.2f}s")
+    print(f"Vazão: {resultado['operacoes_por_segundo']:.1f} operações/s | "
+          f"{resultado['vendas_por_segundo']:.1f} vendas/s")
+    for numero_linha, mensagem in resultado["exemplos_erro"]:
+        print(f"  Linha {numero_linha}: {mensagem}")
+    print("=" * 78)
 
 # O restante do seu main.py, agora completo.
-def main():
+def main(argumentos=None):
     """
     Loop principal do sistema de caixa.
     """
+    parser = argparse.ArgumentParser(description="Sistema de caixa (modo texto).")
+    parser.add_argument("--diario", nargs="?", const="", metavar="ARQUIVO",
+                        help="Finaliza as vendas no diário de vendas (padrão: data/caixa.diario)")
+    parser.add_argument("--script", metavar="ARQUIVO",
+                        help="Executa as operações do arquivo JSON Lines sem o menu e mostra o desempenho")
+    parser.add_argument("--saida", metavar="ARQUIVO",
+                        help="Com --script, grava também as estatísticas em JSON")
+    args = parser.parse_args(argumentos)
+
+    ativar_pelo_ambiente() # CAIXA_INSTRUMENTACAO=1: mede o acesso ao banco (ver src/instrumentacao.py)
     create_tables()
     
-    global venda_atual
+    global venda_atual, diario
     venda_atual = Venda()
+    if args.diario is not None:
+        diario = abrir_diario(args.diario or None)
+
+    if args.script:
+        try:
+            resultado = executar_script(args.script)
+        finally:
+            if diario is not None:
+                diario.fechar()
+        imprimir_desempenho(resultado)
+        if args.saida:
+            with open(args.saida, "w", encoding="utf-8") as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+        return 1 if resultado["erros"] else 0
 
     while True:
         opcao = menu()
@@ -347,9 +594,11 @@ def main():
             gerenciar_produtos()
         elif opcao == "s":
             print("Encerrando o sistema...")
+            if diario is not None:
+                diario.fechar() # Grava no banco as vendas que ainda estão só no diário
             sys.exit(0)
         else:
             print("Opção inválida, tente novamente!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
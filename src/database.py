@@ -1,5 +1,8 @@
 import sqlite3
 import os
+import threading
+import atexit
+from contextlib import contextmanager
 
 # Define o nome do arquivo do banco de dados
 DB_NAME = 'caixa.db'
@@ -7,26 +10,168 @@ DB_NAME = 'caixa.db'
 # Se a pasta 'data' não existir, ela será criada.
 DB_PATH = os.path.join('data', DB_NAME)
 
-def get_db_connection():
+# Vários caixas (processos) podem usar o mesmo arquivo ao mesmo tempo:
+# - WAL: leitores não bloqueiam o escritor e vice-versa;
+# - busy_timeout: em vez de falhar na hora com "database is locked", espera o
+#   outro escritor terminar (até o limite abaixo);
+# - synchronous=NORMAL: seguro com WAL (uma queda de energia pode perder só as
+#   últimas transações, nunca corromper o banco) e bem mais rápido que FULL.
+TEMPO_ESPERA_BLOQUEIO = 10.0 # segundos
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "NORMAL"
+
+class GerenciadorConexoes:
     """
-    Função para obter uma conexão com o banco de dados SQLite.
-    Se o diretório 'data' não existir, ele será criado.
+    Mantém uma conexão SQLite de longa duração por thread.
+
+    Abrir e fechar uma conexão a cada operação custa caro e descarta o cache
+    de statements e de páginas do SQLite. Aqui cada thread recebe a sua própria
+    conexão na primeira vez que precisa do banco e a reutiliza até o
+    encerramento do programa (ou até fechar_todas ser chamado).
     """
-    # Garante que o diretório 'data' exista
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conexoes = [] # Todas as conexões abertas, para o encerramento limpo
+        # Classe das conexões abertas (a instrumentação troca por uma subclasse que mede os comandos)
+        self.fabrica_conexao = sqlite3.Connection
 
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row # Permite acessar colunas como dicionário (ex: row['nome'])
-    return conn
+    def abrir_conexao(self):
+        """
+        Abre uma nova conexão configurada para o banco atual.
+        A conexão retornada não é gerenciada: quem a abriu deve fechá-la.
+        Para o uso normal prefira obter(), que reaproveita a conexão da thread.
+        """
+        diretorio = os.path.dirname(self.db_path)
+        if diretorio:
+            # Garante que o diretório 'data' exista
+            os.makedirs(diretorio, exist_ok=True)
 
-def create_tables():
+        # isolation_level=None: as transações são controladas explicitamente por transacao().
+        # check_same_thread=False apenas para permitir que fechar_todas() feche conexões
+        # de outras threads; no uso normal cada thread só usa a sua própria conexão.
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                               timeout=TEMPO_ESPERA_BLOQUEIO, factory=self.fabrica_conexao)
+        conn.row_factory = sqlite3.Row # Permite acessar colunas como dicionário (ex: row['nome'])
+        conn.execute(f"PRAGMA busy_timeout = {int(TEMPO_ESPERA_BLOQUEIO * 1000)}")
+        conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE}") # Fica gravado no arquivo; repetir é barato
+        conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+        return conn
+
+    def obter(self):
+        """
+        Retorna a conexão da thread atual, abrindo-a se ainda não existir.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self.abrir_conexao()
+            self._local.conn = conn
+            self._local.profundidade = 0
+            with self._lock:
+                self._conexoes.append(conn)
+        return conn
+
+    @contextmanager
+    def conexao(self):
+        """
+        Empresta a conexão da thread atual (sem abrir transação).
+        """
+        yield self.obter()
+
+    @contextmanager
+    def transacao(self):
+        """
+        Executa o bloco dentro de uma transação.
+        Faz COMMIT ao sair normalmente e ROLLBACK se ocorrer uma exceção.
+        Transações aninhadas são absorvidas pela transação mais externa.
+
+        A transação é aberta com BEGIN IMMEDIATE: o bloqueio de escrita é pego
+        logo no início (esperando até busy_timeout se outro caixa estiver
+        gravando). Com um BEGIN comum, duas transações que leram e depois tentam
+        gravar podem se bloquear mutuamente e uma delas falha sem esperar.
+        """
+        conn = self.obter()
+        if self._local.profundidade == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.profundidade += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.profundidade -= 1
+            if self._local.profundidade == 0:
+                conn.rollback()
+            raise
+        else:
+            self._local.profundidade -= 1
+            if self._local.profundidade == 0:
+                conn.commit()
+
+    def fechar_thread_atual(self):
+        """
+        Fecha a conexão da thread atual (útil ao final de threads de trabalho).
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            with self._lock:
+                if conn in self._conexoes:
+                    self._conexoes.remove(conn)
+            conn.close()
+            self._local.conn = None
+
+    def fechar_todas(self):
+        """
+        Fecha todas as conexões abertas por este gerenciador.
+        """
+        with self._lock:
+            conexoes, self._conexoes = self._conexoes, []
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        # Força as threads a reabrirem conexões caso voltem a usar o banco
+        self._local = threading.local()
+
+# Gerenciador usado por toda a aplicação
+gerenciador = GerenciadorConexoes()
+atexit.register(gerenciador.fechar_todas)
+
+def configurar_banco(db_path):
+    """
+    Aponta a aplicação para outro arquivo de banco de dados (ex: testes ou benchmarks).
+    As conexões abertas para o banco anterior são fechadas.
+    """
+    gerenciador.fechar_todas()
+    gerenciador.db_path = db_path
+
+def get_db_connection():
+    """
+    Função para obter a conexão com o banco de dados SQLite da thread atual.
+    A conexão é compartilhada e não deve ser fechada por quem a chama.
+    """
+    return gerenciador.obter()
+
+def transacao():
     """
-    Cria as tabelas necessárias no banco de dados se elas não existirem.
-    Usamos IF NOT EXISTS para evitar erros caso as tabelas já existam.
+    Atalho para gerenciador.transacao().
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    return gerenciador.transacao()
 
+# --------------------------------------------------------------------------------------
+# Migrações do schema
+#
+# A versão do schema fica gravada no próprio arquivo do banco (PRAGMA user_version).
+# Cada migração leva o banco da versão anterior para a sua versão e roda dentro de
+# uma transação junto com a atualização do número da versão: se falhar, nada muda.
+# Para evoluir o banco, acrescente uma nova função ao final de MIGRACOES
+# (nunca altere uma migração que já foi publicada).
+
+def _migracao_tabelas_iniciais(cursor):
+    """
+    Versão 1: tabelas originais do sistema.
+    Usamos IF NOT EXISTS porque bancos antigos (versão 0) já possuem essas tabelas.
+    """
     # Tabela: Produtos
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS produtos (
@@ -63,12 +208,400 @@ def create_tables():
         );
     """)
 
-    conn.commit() # Salva as mudanças no banco de dados
-    conn.close() # Fecha a conexão
+def _migracao_indices(cursor):
+    """
+    Versão 2: índices nas colunas mais consultadas.
+    """
+    # Itens de uma venda e vendas de um produto
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_itens_venda_venda_id ON itens_venda (venda_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_itens_venda_produto_id ON itens_venda (produto_id)")
+    # Listagens de vendas por data e por status + data
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vendas_data_hora ON vendas (data_hora)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_vendas_status_data_hora ON vendas (status, data_hora)")
+    # Busca exata por nome sem diferenciar maiúsculas/minúsculas
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_produtos_nome_nocase ON produtos (nome COLLATE NOCASE)")
+
+def _migracao_busca_produtos(cursor):
+    """
+    Versão 3: índice de texto completo (FTS5) para a busca de produtos por nome.
+    A tabela 'produtos_busca' só guarda o índice (content='produtos') e é mantida
+    em sincronia por triggers. A busca ignora acentos e aceita prefixos.
+    Se o SQLite não tiver FTS5, a migração não cria nada e a busca usa LIKE.
+    """
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS produtos_busca USING fts5(
+                nome,
+                content='produtos',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2',
+                prefix='1 2 3'
+            );
+        """)
+    except sqlite3.OperationalError:
+        # SQLite compilado sem FTS5
+        return
+
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS produtos_busca_ai AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_busca (rowid, nome) VALUES (new.id, new.nome);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS produtos_busca_ad AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_busca (produtos_busca, rowid, nome) VALUES ('delete', old.id, old.nome);
+        END;
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS produtos_busca_au AFTER UPDATE OF nome ON produtos BEGIN
+            INSERT INTO produtos_busca (produtos_busca, rowid, nome) VALUES ('delete', old.id, old.nome);
+            INSERT INTO produtos_busca (rowid, nome) VALUES (new.id, new.nome);
+        END;
+    """)
+    # Indexa os produtos que já existiam
+    cursor.execute("INSERT INTO produtos_busca (produtos_busca) VALUES ('rebuild')")
+
+def _migracao_codigo_barras(cursor):
+    """
+    Versão 4: código de barras (EAN-8, UPC-A, EAN-13 ou GTIN-14) dos produtos.
+    O índice único parcial ignora os produtos sem código (NULL).
+    """
+    cursor.execute("ALTER TABLE produtos ADD COLUMN codigo_barras TEXT")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_codigo_barras
+        ON produtos (codigo_barras) WHERE codigo_barras IS NOT NULL
+    """)
+
+def _migracao_resumos_diarios(cursor):
+    """
+    Versão 5: resumos diários de vendas (por tipo de pagamento e por produto),
+    mantidos pelo VendaRepository. Já nascem preenchidos com o histórico existente.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_vendas_dia (
+            dia TEXT NOT NULL, -- YYYY-MM-DD
+            tipo_pagamento TEXT NOT NULL, -- '' quando não informado
+            quantidade_vendas INTEGER NOT NULL,
+            total REAL NOT NULL,
+            PRIMARY KEY (dia, tipo_pagamento)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS resumo_produtos_dia (
+            dia TEXT NOT NULL, -- YYYY-MM-DD
+            produto_id INTEGER NOT NULL,
+            quantidade REAL NOT NULL,
+            total REAL NOT NULL,
+            PRIMARY KEY (dia, produto_id)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        INSERT INTO resumo_vendas_dia (dia, tipo_pagamento, quantidade_vendas, total)
+        SELECT substr(data_hora, 1, 10), COALESCE(tipo_pagamento, ''), COUNT(*), SUM(total)
+        FROM vendas
+        WHERE status = 'FINALIZADA'
+        GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO resumo_produtos_dia (dia, produto_id, quantidade, total)
+        SELECT substr(v.data_hora, 1, 10), iv.produto_id, SUM(iv.quantidade), SUM(iv.subtotal)
+        FROM itens_venda iv
+        JOIN vendas v ON v.id = iv.venda_id
+        WHERE v.status = 'FINALIZADA'
+        GROUP BY 1, 2
+    """)
+
+def _reconstruir_tabela(cursor, tabela, ddl_nova, select_dados):
+    """
+    Recria uma tabela com outra definição (o SQLite não altera o tipo de colunas).
+    'ddl_nova' é o CREATE TABLE com o nome '<tabela>_nova' e 'select_dados' o SELECT
+    que lê da tabela antiga os valores, já convertidos, na ordem das colunas novas.
+    Índices e triggers da tabela são recriados e o contador do AUTOINCREMENT é mantido.
+    """
+    cursor.execute("""
+        SELECT sql FROM sqlite_master
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (tabela,))
+    objetos = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabela,))
+    row = cursor.fetchone()
+    sequencia = row[0] if row else None
+
+    cursor.execute(ddl_nova)
+    cursor.execute(f"INSERT INTO {tabela}_nova {select_dados}")
+    cursor.execute(f"DROP TABLE {tabela}")
+    cursor.execute(f"ALTER TABLE {tabela}_nova RENAME TO {tabela}")
+    for sql in objetos:
+        cursor.execute(sql)
+    if sequencia is not None:
+        cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequencia, tabela))
+
+def _migracao_centavos(cursor):
+    """
+    Versão 6: dinheiro em centavos (INTEGER) e produtos por peso em gramas.
+    Converte preços, totais e subtotais (REAL, em reais) para centavos, e
+    quantidades/estoque dos produtos 'KG' (REAL, em quilos) para gramas.
+    """
+    _reconstruir_tabela(cursor, "produtos", """
+        CREATE TABLE produtos_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE,
+            preco INTEGER NOT NULL, -- centavos (por quilo, para 'KG')
+            tipo_unidade TEXT NOT NULL, -- 'UNIDADE' ou 'KG'
+            estoque INTEGER NOT NULL DEFAULT 0, -- unidades, ou gramas para 'KG'
+            codigo_barras TEXT
+        );
+    """, """
+        SELECT id, nome, CAST(ROUND(preco * 100) AS INTEGER), tipo_unidade,
+               CAST(ROUND(estoque * (CASE WHEN tipo_unidade = 'KG' THEN 1000 ELSE 1 END)) AS INTEGER),
+               codigo_barras
+        FROM produtos
+    """)
+
+    _reconstruir_tabela(cursor, "vendas", """
+        CREATE TABLE vendas_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data_hora TEXT NOT NULL, -- Formato YYYY-MM-DD HH:MM:SS
+            total INTEGER NOT NULL, -- centavos
+            status TEXT NOT NULL, -- 'FINALIZADA', 'CANCELADA'
+            tipo_pagamento TEXT -- 'DINHEIRO', 'CARTAO', 'PIX'
+        );
+    """, """
+        SELECT id, data_hora, CAST(ROUND(total * 100) AS INTEGER), status, tipo_pagamento
+        FROM vendas
+    """)
+
+    # Itens de produtos que já foram removidos: fracionados são tratados como KG
+    _reconstruir_tabela(cursor, "itens_venda", """
+        CREATE TABLE itens_venda_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            venda_id INTEGER NOT NULL,
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL, -- unidades, ou gramas para 'KG'
+            preco_unitario_na_venda INTEGER NOT NULL, -- centavos
+            subtotal INTEGER NOT NULL, -- centavos
+            FOREIGN KEY (venda_id) REFERENCES vendas(id),
+            FOREIGN KEY (produto_id) REFERENCES produtos(id)
+        );
+    """, """
+        SELECT iv.id, iv.venda_id, iv.produto_id,
+               CAST(ROUND(iv.quantidade * (CASE
+                   WHEN p.tipo_unidade = 'KG' THEN 1000
+                   WHEN p.id IS NULL AND iv.quantidade <> CAST(iv.quantidade AS INTEGER) THEN 1000
+                   ELSE 1 END)) AS INTEGER),
+               CAST(ROUND(iv.preco_unitario_na_venda * 100) AS INTEGER),
+               CAST(ROUND(iv.subtotal * 100) AS INTEGER)
+        FROM itens_venda iv
+        LEFT JOIN produtos p ON p.id = iv.produto_id
+    """)
+
+    # Os resumos diários são recalculados já em centavos/gramas
+    for tabela in ("resumo_vendas_dia", "resumo_produtos_dia"):
+        cursor.execute(f"DROP TABLE {tabela}")
+    cursor.execute("""
+        CREATE TABLE resumo_vendas_dia (
+            dia TEXT NOT NULL, -- YYYY-MM-DD
+            tipo_pagamento TEXT NOT NULL, -- '' quando não informado
+            quantidade_vendas INTEGER NOT NULL,
+            total INTEGER NOT NULL, -- centavos
+            PRIMARY KEY (dia, tipo_pagamento)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        CREATE TABLE resumo_produtos_dia (
+            dia TEXT NOT NULL, -- YYYY-MM-DD
+            produto_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL, -- unidades, ou gramas para 'KG'
+            total INTEGER NOT NULL, -- centavos
+            PRIMARY KEY (dia, produto_id)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        INSERT INTO resumo_vendas_dia (dia, tipo_pagamento, quantidade_vendas, total)
+        SELECT substr(data_hora, 1, 10), COALESCE(tipo_pagamento, ''), COUNT(*), SUM(total)
+        FROM vendas
+        WHERE status = 'FINALIZADA'
+        GROUP BY 1, 2
+    """)
+    cursor.execute("""
+        INSERT INTO resumo_produtos_dia (dia, produto_id, quantidade, total)
+        SELECT substr(v.data_hora, 1, 10), iv.produto_id, SUM(iv.quantidade), SUM(iv.subtotal)
+        FROM itens_venda iv
+        JOIN vendas v ON v.id = iv.venda_id
+        WHERE v.status = 'FINALIZADA'
+        GROUP BY 1, 2
+    """)
+
+def _migracao_uuid_vendas(cursor):
+    """
+    Versão 7: identificador único (UUID) de cada venda, gerado no caixa.
+    Permite gravar a mesma venda mais de uma vez sem duplicá-la (ex: ao reaplicar
+    o diário de vendas). Vendas antigas ficam sem UUID (NULL).
+    """
+    cursor.execute("ALTER TABLE vendas ADD COLUMN uuid TEXT")
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_vendas_uuid
+        ON vendas (uuid) WHERE uuid IS NOT NULL
+    """)
+
+def _migracao_versao_produtos(cursor):
+    """
+    Versão 8: número de versão de cada produto, incrementado a cada alteração.
+    As atualizações só são aplicadas se a versão no banco for a mesma que foi
+    lida (controle de concorrência otimista entre caixas).
+    """
+    cursor.execute("ALTER TABLE produtos ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+
+def _migracao_movimentos_estoque(cursor):
+    """
+    Versão 9: histórico de movimentos de estoque (só de acréscimo) e fotografias
+    periódicas dos saldos (ver src/estoque.py). O estoque atual de cada produto
+    entra como um movimento AJUSTE 'Saldo inicial', já fotografado.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS movimentos_estoque (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            produto_id INTEGER NOT NULL,
+            data_hora TEXT NOT NULL, -- Formato YYYY-MM-DD HH:MM:SS
+            tipo TEXT NOT NULL, -- 'VENDA', 'DEVOLUCAO', 'REPOSICAO', 'AJUSTE'
+            quantidade INTEGER NOT NULL, -- Com sinal: negativa para saídas (gramas para 'KG')
+            venda_id INTEGER, -- Vendas e devoluções
+            observacao TEXT,
+            FOREIGN KEY (produto_id) REFERENCES produtos(id)
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_movimentos_estoque_produto
+        ON movimentos_estoque (produto_id, id)
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS saldos_estoque (
+            produto_id INTEGER NOT NULL,
+            data_hora TEXT NOT NULL, -- Momento da fotografia
+            ultimo_movimento_id INTEGER NOT NULL, -- A fotografia inclui os movimentos até este ID
+            saldo INTEGER NOT NULL,
+            PRIMARY KEY (produto_id, data_hora)
+        ) WITHOUT ROWID;
+    """)
+    cursor.execute("""
+        INSERT INTO movimentos_estoque (produto_id, data_hora, tipo, quantidade, observacao)
+        SELECT id, datetime('now', 'localtime'), 'AJUSTE', estoque, 'Saldo inicial'
+        FROM produtos
+        WHERE estoque != 0
+    """)
+    cursor.execute("""
+        INSERT INTO saldos_estoque (produto_id, data_hora, ultimo_movimento_id, saldo)
+        SELECT produto_id, data_hora, id, quantidade
+        FROM movimentos_estoque
+    """)
+
+def _migracao_arquivos_vendas(cursor):
+    """
+    Versão 10: registro dos períodos de vendas arquivados em bancos separados
+    (ver src/arquivamento.py). As faixas de data e de ID de cada período dizem
+    quais arquivos uma consulta precisa anexar.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS arquivos_vendas (
+            periodo TEXT PRIMARY KEY, -- YYYY-MM
+            arquivo TEXT NOT NULL, -- Nome do arquivo na pasta 'arquivo', ao lado do banco
+            data_inicio TEXT NOT NULL, -- Início do período (inclusivo), YYYY-MM-DD
+            data_fim TEXT NOT NULL, -- Fim do período (exclusivo), YYYY-MM-DD
+            menor_id INTEGER NOT NULL, -- Faixa de IDs das vendas arquivadas
+            maior_id INTEGER NOT NULL,
+            quantidade_vendas INTEGER NOT NULL,
+            arquivado_em TEXT NOT NULL -- Formato YYYY-MM-DD HH:MM:SS
+        ) WITHOUT ROWID;
+    """)
+
+def _migracao_vendas_avulsas_arquivadas(cursor):
+    """
+    Versão 11: vendas arquivadas fora da faixa de IDs do seu período (gravadas
+    com atraso, ex: diário reaplicado depois que meses mais novos já tinham
+    vendas). Ficam aqui para não alargar a faixa de 'arquivos_vendas', que
+    passaria a cobrir os IDs de outros períodos.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS arquivos_vendas_avulsas (
+            venda_id INTEGER PRIMARY KEY,
+            periodo TEXT NOT NULL -- Período arquivado que guarda a venda
+        );
+    """)
 
-    print(f"Tabelas criadas ou já existentes no banco de dados '{DB_NAME}'.")
+# Lista ordenada de migrações: a posição (começando em 1) é a versão resultante
+MIGRACOES = [
+    _migracao_tabelas_iniciais,
+    _migracao_indices,
+    _migracao_busca_produtos,
+    _migracao_codigo_barras,
+    _migracao_resumos_diarios,
+    _migracao_centavos,
+    _migracao_uuid_vendas,
+    _migracao_versao_produtos,
+    _migracao_movimentos_estoque,
+    _migracao_arquivos_vendas,
+    _migracao_vendas_avulsas_arquivadas,
+]
+
+VERSAO_SCHEMA = len(MIGRACOES)
+
+def obter_versao_schema(conn=None):
+    """
+    Retorna a versão do schema gravada no banco (0 para bancos nunca migrados).
+    """
+    conn = conn or get_db_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def tabela_existe(nome, conn=None):
+    """
+    Verifica se uma tabela (ou tabela virtual) existe no banco.
+    """
+    conn = conn or get_db_connection()
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nome,)).fetchone()
+    return row is not None
+
+def migrar():
+    """
+    Aplica, em ordem, todas as migrações ainda não aplicadas ao banco.
+    Retorna a lista de versões aplicadas (vazia se o banco já estava atualizado).
+    """
+    aplicadas = []
+    versao = obter_versao_schema()
+    if versao > VERSAO_SCHEMA:
+        raise RuntimeError(f"O banco está na versão {versao}, mais nova que a suportada ({VERSAO_SCHEMA}).")
+
+    for numero, migracao in enumerate(MIGRACOES[versao:], start=versao + 1):
+        with transacao() as conn:
+            migracao(conn.cursor())
+            # PRAGMA não aceita parâmetros; 'numero' é sempre um inteiro nosso
+            conn.execute(f"PRAGMA user_version = {int(numero)}")
+        aplicadas.append(numero)
+    return aplicadas
+
+def create_tables():
+    """
+    Cria ou atualiza as tabelas do banco de dados, aplicando as migrações pendentes.
+    """
+    aplicadas = migrar()
+    if aplicadas:
+        print(f"Banco de dados '{DB_NAME}' atualizado para a versão {VERSAO_SCHEMA} do schema.")
+    else:
+        print(f"Tabelas criadas ou já existentes no banco de dados '{DB_NAME}'.")
+
+def preparar_banco():
+    """
+    Versão de create_tables() para a abertura do caixa: com o schema já na
+    versão atual, só lê PRAGMA user_version (nenhum DDL e nenhuma mensagem).
+    Retorna a lista de versões aplicadas.
+    """
+    if obter_versao_schema() == VERSAO_SCHEMA:
+        return []
+    aplicadas = migrar()
+    if aplicadas:
+        print(f"Banco de dados '{DB_NAME}' atualizado para a versão {VERSAO_SCHEMA} do schema.")
+    return aplicadas
 
 if __name__ == "__main__":
     # Este bloco só será executado se você rodar 'python src/database.py' diretamente
     create_tables()
-    print(f"Banco de dados '{DB_NAME}' configurado na pasta 'data'.")
\ No newline at end of file
+    print(f"Banco de dados '{DB_NAME}' configurado na pasta 'data'.")
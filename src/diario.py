@@ -0,0 +1,304 @@
+# src/diario.py
+"""
+Diário de vendas: registro local, só de acréscimo, das vendas finalizadas.
+
+No modo diário, finalizar uma venda apenas acrescenta uma linha JSON ao arquivo
+do diário e força a gravação em disco (fsync). A venda está garantida a partir
+daí, mesmo que o banco esteja bloqueado (ex: por um relatório) ou o programa
+caia em seguida. Uma thread passa as vendas do diário para o 'caixa.db' em
+lotes, uma transação por lote.
+
+Cada venda tem um UUID gerado no caixa e a gravação no banco ignora UUIDs já
+gravados. Por isso é seguro reaplicar o diário inteiro ao iniciar o programa:
+as vendas que não chegaram ao banco são gravadas e as outras são ignoradas.
+Quando todas as vendas do diário estão no banco, o arquivo é esvaziado.
+
+Formato de cada linha:
+    {"uuid": "...", "data_hora": "...", "total": 1234, "tipo_pagamento": "PIX",
+     "itens": [{"produto_id": 1, "nome": "...", "tipo_unidade": "UNIDADE",
+                "quantidade": 2, "preco_unitario": 500, "subtotal": 1000}, ...]}
+
+Uso:
+    diario = abrir_diario() # reaplica o que ficou pendente e inicia a gravação em lotes
+    diario.registrar(venda, "PIX")
+    ...
+    diario.fechar() # grava o que falta no banco
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from .database import gerenciador
+from .models import Produto, Venda, ItemVenda
+from .repository import VendaRepository, EstoqueInsuficienteError
+
+def caminho_padrao():
+    """
+    Diário ao lado do banco de dados atual (ex: data/caixa.diario).
+    """
+    return os.path.splitext(gerenciador.db_path)[0] + ".diario"
+
+def venda_para_registro(venda):
+    """
+    Converte uma venda finalizada no dicionário gravado em uma linha do diário.
+    """
+    return {
+        "uuid": venda.uuid,
+        "data_hora": venda.data_hora,
+        "total": venda.total,
+        "tipo_pagamento": venda.tipo_pagamento,
+        "itens": [{
+            "produto_id": item.produto.id,
+            "nome": item.produto.nome,
+            "tipo_unidade": item.produto.tipo_unidade,
+            "quantidade": item.quantidade,
+            "preco_unitario": item.preco_unitario_na_venda,
+            "subtotal": item.subtotal,
+        } for item in venda.itens],
+    }
+
+def registro_para_venda(registro):
+    """
+    Monta a Venda (com os itens) a partir de uma linha do diário.
+    """
+    venda = Venda(data_hora=registro["data_hora"], total=registro["total"], status="FINALIZADA",
+                  tipo_pagamento=registro["tipo_pagamento"], uuid=registro["uuid"])
+    for item in registro["itens"]:
+        produto = Produto(id=item["produto_id"], nome=item["nome"], tipo_unidade=item["tipo_unidade"])
+        venda.carregar_item(ItemVenda(produto=produto, quantidade=item["quantidade"],
+                                      preco_unitario_na_venda=item["preco_unitario"],
+                                      subtotal=item["subtotal"]))
+    return venda
+
+class DiarioVendas:
+    """
+    Diário de vendas com gravação em lotes no banco (ver a descrição do módulo).
+    """
+    def __init__(self, caminho=None, venda_repo=None, tamanho_lote=200, intervalo=0.5):
+        """
+        Args:
+            caminho (str, optional): Arquivo do diário. Defaults to caminho_padrao().
+            venda_repo (VendaRepository, optional): Repositório usado na gravação no banco.
+            tamanho_lote (int): Máximo de vendas gravadas por transação.
+            intervalo (float): Segundos entre as gravações em lote da thread.
+        """
+        self.caminho = caminho or caminho_padrao()
+        self.venda_repo = venda_repo or VendaRepository()
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.ultimo_erro = None # Último erro ao gravar no banco (a gravação é tentada de novo)
+
+        self._lock = threading.Lock() # Protege o arquivo e a lista de pendentes
+        self._lock_descarga = threading.Lock() # Uma gravação no banco por vez
+        self._pendentes = [] # Vendas no diário que ainda não foram gravadas no banco
+        self._acordar = threading.Event()
+        self._parar = False
+        self._thread = None
+
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        self._arquivo = open(self.caminho, "a", encoding="utf-8")
+        if self._arquivo.tell() > 0 and not self._termina_com_quebra_de_linha():
+            # A última linha ficou pela metade (queda durante a escrita): termina a
+            # linha para que a próxima venda não seja grudada nela
+            self._arquivo.write("\n")
+            self._arquivo.flush()
+
+    @property
+    def pendentes(self):
+        """
+        Quantidade de vendas registradas que ainda não estão no banco.
+        """
+        return len(self._pendentes)
+
+    def registrar(self, venda, tipo_pagamento):
+        """
+        Finaliza a venda gravando-a no diário (com fsync). A venda ainda não
+        recebe ID: ele é preenchido quando a thread grava o lote no banco.
+        Levanta EstoqueInsuficienteError se o estoque conhecido em memória não
+        cobrir a venda; nesse caso nada é registrado.
+        """
+        if venda.id:
+            raise ValueError("A venda já foi registrada no banco de dados.")
+        itens = venda.itens
+        if not itens:
+            raise ValueError("Não há itens para finalizar a venda.")
+
+        # Sem ir ao banco: confere com o estoque dos produtos carregados
+        faltantes = [item.produto.nome for item in itens if item.quantidade > item.produto.estoque]
+        if faltantes:
+            raise EstoqueInsuficienteError(faltantes)
+
+        status_anterior, pagamento_anterior = venda.status, venda.tipo_pagamento
+        venda.status = "FINALIZADA"
+        venda.tipo_pagamento = tipo_pagamento
+        with self._lock:
+            posicao = self._arquivo.tell()
+            try:
+                linha = json.dumps(venda_para_registro(venda), ensure_ascii=False)
+                self._arquivo.write(linha + "\n")
+                self._arquivo.flush()
+                os.fsync(self._arquivo.fileno())
+            except BaseException:
+                # Nada foi confirmado: tira do arquivo o que possa ter sido escrito
+                # (para não ser reaplicado depois) e devolve a venda ao estado anterior
+                try:
+                    self._arquivo.truncate(posicao)
+                except (OSError, ValueError):
+                    pass
+                venda.status, venda.tipo_pagamento = status_anterior, pagamento_anterior
+                raise
+            self._pendentes.append(venda)
+
+        for item in itens:
+            item.produto.estoque -= item.quantidade
+        if len(self._pendentes) >= self.tamanho_lote:
+            self._acordar.set()
+        return venda
+
+    def reaplicar(self):
+        """
+        Lê o diário inteiro e grava no banco as vendas que ainda não estão lá.
+        Deve ser chamado ao iniciar, antes de registrar vendas novas.
+        Retorna a quantidade de vendas inseridas no banco.
+        """
+        vendas = []
+        with open(self.caminho, encoding="utf-8") as arquivo:
+            for numero_linha, linha in enumerate(arquivo, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    vendas.append(registro_para_venda(json.loads(linha)))
+                except (ValueError, KeyError, TypeError) as e:
+                    # Só a última linha pode estar incompleta (queda durante a escrita);
+                    # como ela não foi confirmada ao cliente, é ignorada.
+                    print(f"Diário: linha {numero_linha} ignorada ({e}).")
+
+        with self._lock:
+            self._pendentes = vendas + self._pendentes
+        return self.descarregar(tudo=True)
+
+    def descarregar(self, tudo=False):
+        """
+        Grava no banco as vendas pendentes, em lotes de 'tamanho_lote' por transação.
+        Com tudo=False grava só um lote. Se o banco estiver bloqueado, as vendas
+        continuam pendentes e 'ultimo_erro' guarda o motivo.
+        Retorna a quantidade de vendas inseridas no banco.
+        """
+        inseridas = 0
+        with self._lock_descarga:
+            while True:
+                with self._lock:
+                    lote = self._pendentes[:self.tamanho_lote]
+                if not lote:
+                    break
+                try:
+                    inseridas += self.venda_repo.gravar_finalizadas(lote)
+                except sqlite3.OperationalError as e:
+                    # Banco bloqueado ou indisponível: tenta de novo na próxima vez
+                    self.ultimo_erro = e
+                    break
+                except sqlite3.Error as e:
+                    # Alguma venda do lote não pode ser gravada: grava uma a uma
+                    # e separa as problemáticas para não travar o diário
+                    self.ultimo_erro = e
+                    try:
+                        inseridas += self._gravar_individualmente(lote)
+                    except sqlite3.OperationalError as e:
+                        self.ultimo_erro = e
+                        break
+
+                with self._lock:
+                    del self._pendentes[:len(lote)]
+                    if not self._pendentes:
+                        self._esvaziar_arquivo()
+                if not tudo:
+                    break
+        return inseridas
+
+    def iniciar(self):
+        """
+        Inicia a thread que grava as vendas pendentes no banco a cada 'intervalo'.
+        """
+        if self._thread is None:
+            self._parar = False
+            self._thread = threading.Thread(target=self._executar, name="diario-vendas", daemon=True)
+            self._thread.start()
+
+    def fechar(self):
+        """
+        Para a thread, grava no banco o que ainda estiver pendente e fecha o arquivo.
+        """
+        if self._thread is not None:
+            self._parar = True
+            self._acordar.set()
+            self._thread.join()
+            self._thread = None
+        self.descarregar(tudo=True)
+        with self._lock:
+            self._arquivo.close()
+
+    # ----------------------------------------------------------------------------------
+    # Funções internas
+
+    def _executar(self):
+        try:
+            while not self._parar:
+                self._acordar.wait(self.intervalo)
+                self._acordar.clear()
+                if self._pendentes:
+                    try:
+                        self.descarregar(tudo=True)
+                    except Exception as e:
+                        # Ex: falha ao gravar o arquivo de rejeitadas. As vendas continuam
+                        # pendentes (no diário e na memória) e a gravação é tentada de novo
+                        self.ultimo_erro = e
+                        print(f"Diário: erro ao gravar as vendas pendentes no banco ({e}).")
+        finally:
+            gerenciador.fechar_thread_atual()
+
+    def _gravar_individualmente(self, lote):
+        """
+        Grava as vendas do lote uma por transação. As que falharem vão para o
+        arquivo '<diário>.rejeitadas' para análise manual.
+        """
+        inseridas = 0
+        for venda in lote:
+            try:
+                inseridas += self.venda_repo.gravar_finalizadas([venda])
+            except sqlite3.OperationalError:
+                raise
+            except sqlite3.Error as e:
+                with open(self.caminho + ".rejeitadas", "a", encoding="utf-8") as arquivo:
+                    registro = venda_para_registro(venda)
+                    registro["erro"] = str(e)
+                    arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                    arquivo.flush()
+                    os.fsync(arquivo.fileno())
+        return inseridas
+
+    def _termina_com_quebra_de_linha(self):
+        with open(self.caminho, "rb") as arquivo:
+            arquivo.seek(-1, os.SEEK_END)
+            return arquivo.read(1) == b"\n"
+
+    def _esvaziar_arquivo(self):
+        """
+        Todas as vendas do diário já estão no banco: o arquivo pode recomeçar vazio.
+        Chamado com self._lock adquirido.
+        """
+        self._arquivo.truncate(0)
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+
+def abrir_diario(caminho=None, **opcoes):
+    """
+    Abre o diário, grava no banco o que ficou pendente da última execução e
+    inicia a gravação em lotes. Retorna o DiarioVendas.
+    """
+    diario = DiarioVendas(caminho, **opcoes)
+    diario.reaplicar()
+    diario.iniciar()
+    return diario
@@ -0,0 +1,213 @@
+# src/estoque.py
+"""
+Movimentos de estoque: histórico só de acréscimo de tudo o que altera o estoque.
+
+Cada entrada ou saída de mercadoria grava uma linha em 'movimentos_estoque'
+(quantidade com sinal: negativa para saídas) na mesma transação em que
+'produtos.estoque' é atualizado de forma incremental (estoque = estoque + ?).
+Assim 'produtos.estoque' continua sendo o saldo atual, lido sem somar nada, e
+o histórico permite auditar e saber o saldo em qualquer data. Os movimentos
+nunca são alterados nem apagados; correções são feitas com novos movimentos.
+
+Tipos de movimento:
+    VENDA      saída por venda (gravado pelo VendaRepository)
+    DEVOLUCAO  entrada por devolução de cliente
+    REPOSICAO  entrada de mercadoria (compra, recebimento)
+    AJUSTE     inventário, correção manual, cadastro e importação do catálogo
+
+Para que o saldo em uma data não precise percorrer o histórico inteiro,
+'saldos_estoque' guarda fotografias periódicas: o saldo de cada produto que
+teve movimento desde a fotografia anterior. O saldo em uma data é a última
+fotografia até a data mais os movimentos gravados depois dela. Agende:
+    python -m src.estoque fotografar       (ex: todo dia, no fechamento)
+
+Consultas:
+    python -m src.estoque saldo 2024-05-31 [--produto 12]
+    python -m src.estoque historico 12
+    python -m src.estoque conferir         (saldo atual x soma dos movimentos)
+"""
+import argparse
+import datetime
+import sys
+
+from .database import create_tables, get_db_connection, transacao
+from .models import formatar_quantidade
+
+TIPOS_MOVIMENTO = ("VENDA", "DEVOLUCAO", "REPOSICAO", "AJUSTE")
+
+def agora():
+    """
+    Data e hora atual no formato gravado no banco (YYYY-MM-DD HH:MM:SS).
+    """
+    return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def registrar_movimentos(cursor, movimentos, data_hora=None):
+    """
+    Acrescenta movimentos ao histórico. Não altera 'produtos.estoque': quem
+    chama atualiza o saldo na mesma transação.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor da transação que altera o estoque.
+        movimentos (list): Tuplas (produto_id, tipo, quantidade, venda_id, observacao).
+            A quantidade tem sinal (negativa para saídas); movimentos zerados são ignorados.
+        data_hora (str, optional): Momento dos movimentos. Defaults to agora().
+    """
+    data_hora = data_hora or agora()
+    linhas = []
+    for produto_id, tipo, quantidade, venda_id, observacao in movimentos:
+        if tipo not in TIPOS_MOVIMENTO:
+            raise ValueError(f"Tipo de movimento inválido: '{tipo}'.")
+        if quantidade:
+            linhas.append((produto_id, data_hora, tipo, quantidade, venda_id, observacao))
+    if linhas:
+        cursor.executemany("""
+            INSERT INTO movimentos_estoque (produto_id, data_hora, tipo, quantidade, venda_id, observacao)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, linhas)
+
+def registrar_saida_venda(cursor, venda):
+    """
+    Movimentos VENDA dos itens de uma venda recém-gravada (data/hora da venda).
+    """
+    registrar_movimentos(cursor, [(item.produto.id, "VENDA", -item.quantidade, venda.id, None)
+                                  for item in venda.itens], venda.data_hora)
+
+def fotografar_saldos():
+    """
+    Grava em 'saldos_estoque' o saldo atual dos produtos que tiveram movimento
+    desde a última fotografia de cada um. Retorna a quantidade de linhas gravadas.
+    """
+    data_hora = agora()
+    with transacao() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM movimentos_estoque")
+        ultimo_movimento_id = cursor.fetchone()[0]
+        # Dentro da transação ninguém grava: produtos.estoque é exatamente a soma
+        # dos movimentos até 'ultimo_movimento_id'
+        cursor.execute("""
+            INSERT OR REPLACE INTO saldos_estoque (produto_id, data_hora, ultimo_movimento_id, saldo)
+            SELECT p.id, ?, ?, p.estoque
+            FROM produtos p
+            WHERE EXISTS (
+                SELECT 1 FROM movimentos_estoque m
+                WHERE m.produto_id = p.id
+                  AND m.id > COALESCE((SELECT s.ultimo_movimento_id FROM saldos_estoque s
+                                       WHERE s.produto_id = p.id
+                                       ORDER BY s.data_hora DESC LIMIT 1), 0)
+            )
+        """, (data_hora, ultimo_movimento_id))
+        return cursor.rowcount
+
+# Saldo em uma data: última fotografia até a data + movimentos gravados depois dela.
+# Os movimentos de uma fotografia têm sempre data/hora até a dela (vendas gravadas
+# depois, vindas do diário, têm data mais antiga mas ID maior), então basta somar
+# os de ID maior com data/hora até a data pedida.
+SQL_SALDOS_EM = """
+    SELECT p.id, p.nome, p.tipo_unidade,
+           COALESCE(f.saldo, 0) + COALESCE((
+               SELECT SUM(m.quantidade) FROM movimentos_estoque m
+               WHERE m.produto_id = p.id
+                 AND m.id > COALESCE(f.ultimo_movimento_id, 0)
+                 AND m.data_hora <= :data_hora
+           ), 0) AS saldo
+    FROM produtos p
+    LEFT JOIN saldos_estoque f
+           ON f.produto_id = p.id
+          AND f.data_hora = (SELECT s.data_hora FROM saldos_estoque s
+                             WHERE s.produto_id = p.id AND s.data_hora <= :data_hora
+                             ORDER BY s.data_hora DESC LIMIT 1)
+"""
+
+def saldos_em(data_hora, produto_id=None):
+    """
+    Saldo de estoque ao final de 'data_hora' ('YYYY-MM-DD' vale até o fim do dia).
+    Retorna [(produto_id, nome, tipo_unidade, saldo)], ou só o produto informado.
+    """
+    if len(data_hora) == 10:
+        data_hora += " 23:59:59"
+    sql = SQL_SALDOS_EM
+    params = {"data_hora": data_hora}
+    if produto_id is not None:
+        sql += " WHERE p.id = :produto_id"
+        params["produto_id"] = produto_id
+    rows = get_db_connection().execute(sql + " ORDER BY p.id", params).fetchall()
+    return [tuple(row) for row in rows]
+
+def saldo_em(produto_id, data_hora):
+    """
+    Saldo de um produto em uma data (ver saldos_em), ou None se o produto não existir.
+    """
+    linhas = saldos_em(data_hora, produto_id)
+    return linhas[0][3] if linhas else None
+
+def historico(produto_id, data_inicio=None, data_fim=None, limite=100):
+    """
+    Retorna [(id, data_hora, tipo, quantidade, venda_id, observacao)] dos
+    movimentos do produto, do mais recente para o mais antigo
+    (data_inicio inclusiva e data_fim exclusiva).
+    """
+    condicoes, params = ["produto_id = ?"], [produto_id]
+    if data_inicio:
+        condicoes.append("data_hora >= ?")
+        params.append(data_inicio)
+    if data_fim:
+        condicoes.append("data_hora < ?")
+        params.append(data_fim)
+    rows = get_db_connection().execute(f"""
+        SELECT id, data_hora, tipo, quantidade, venda_id, observacao
+        FROM movimentos_estoque
+        WHERE {" AND ".join(condicoes)}
+        ORDER BY id DESC
+        LIMIT ?
+    """, params + [limite]).fetchall()
+    return [tuple(row) for row in rows]
+
+def conferir():
+    """
+    Compara o saldo atual (produtos.estoque) com a soma dos movimentos.
+    Retorna [(produto_id, nome, estoque, soma dos movimentos)] dos que divergem
+    (ex: estoque alterado direto no banco, sem movimento).
+    """
+    rows = get_db_connection().execute("""
+        SELECT p.id, p.nome, p.estoque, COALESCE(SUM(m.quantidade), 0) AS soma
+        FROM produtos p
+        LEFT JOIN movimentos_estoque m ON m.produto_id = p.id
+        GROUP BY p.id
+        HAVING p.estoque != soma
+        ORDER BY p.id
+    """).fetchall()
+    return [tuple(row) for row in rows]
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Movimentos e saldos de estoque.")
+    subparsers = parser.add_subparsers(dest="acao", required=True)
+    subparsers.add_parser("fotografar", help="Grava o saldo atual dos produtos que tiveram movimento")
+    parser_saldo = subparsers.add_parser("saldo", help="Saldo de estoque em uma data")
+    parser_saldo.add_argument("data", help="YYYY-MM-DD ou 'YYYY-MM-DD HH:MM:SS'")
+    parser_saldo.add_argument("--produto", type=int, help="Só este produto")
+    parser_historico = subparsers.add_parser("historico", help="Últimos movimentos de um produto")
+    parser_historico.add_argument("produto", type=int)
+    parser_historico.add_argument("--limite", type=int, default=50)
+    subparsers.add_parser("conferir", help="Confere o saldo atual com a soma dos movimentos")
+    args = parser.parse_args(argumentos)
+
+    create_tables()
+    if args.acao == "fotografar":
+        print(f"Saldo gravado para {fotografar_saldos()} produto(s).")
+    elif args.acao == "saldo":
+        for produto_id, nome, tipo_unidade, saldo in saldos_em(args.data, args.produto):
+            print(f"- [ID: {produto_id}] {nome}: {formatar_quantidade(saldo, tipo_unidade)}")
+    elif args.acao == "historico":
+        for movimento_id, data_hora, tipo, quantidade, venda_id, observacao in historico(args.produto, limite=args.limite):
+            detalhe = f"venda {venda_id}" if venda_id else (observacao or "")
+            print(f"{data_hora} | {tipo:<9} | {quantidade:>+10} | {detalhe}")
+    else:
+        divergentes = conferir()
+        for produto_id, nome, estoque, soma in divergentes:
+            print(f"- [ID: {produto_id}] {nome}: estoque {estoque} | movimentos {soma}")
+        print(f"{len(divergentes)} produto(s) com divergência.")
+        return 1 if divergentes else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,27 @@
 # src/gui/admin_window.py
+import sqlite3
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
 
-from src.models import Produto
+from src.models import (Produto, validar_codigo_barras, para_centavos, para_quantidade,
+                        formatar_moeda, formatar_quantidade)
 from src.repository import ProdutoRepository
+from src.gui.trabalhador import TrabalhadorBanco
 
 class AdminWindow(tk.Toplevel):
     """
     Representa a janela administrativa para o dono gerenciar os produtos.
     """
-    def __init__(self, master):
+    def __init__(self, master, trabalhador=None, catalogo=None):
+        """
+        Args:
+            master (tk.Misc): Janela principal.
+            trabalhador (TrabalhadorBanco, optional): Thread do banco compartilhada com a
+                janela principal. Se não for informada, a janela cria a sua.
+            catalogo (CatalogoProdutos, optional): Cache de produtos da janela principal.
+                As gravações passam por ele, para que o caixa veja o produto alterado.
+        """
         super().__init__(master)
         self.title("Modo Administrativo - Gerenciar Produtos")
         self.geometry("600x450")
@@ -18,6 +29,12 @@ class AdminWindow(tk.Toplevel):
         self.transient(master)
         
         self.produto_repo = ProdutoRepository()
+        # O catálogo atualiza o próprio cache dentro da tarefa, na thread do banco: o caixa
+        # fica sabendo da alteração mesmo que esta janela feche antes da resposta
+        self._gravacao = catalogo or self.produto_repo
+        # Consultas e gravações rodam fora da thread da interface
+        self._trabalhador_proprio = trabalhador is None
+        self.trabalhador = trabalhador or TrabalhadorBanco(self)
 
         # Frame de login
         self.login_frame = ttk.Frame(self, padding="20")
@@ -41,6 +58,11 @@ class AdminWindow(tk.Toplevel):
             messagebox.showerror("Erro de Senha", "Senha incorreta. Acesso negado.")
             self.senha_entry.delete(0, tk.END)
 
+    # Produtos buscados no banco por vez; novas páginas são carregadas ao rolar a lista
+    TAMANHO_PAGINA = 200
+    # Espera (ms) depois da última tecla antes de buscar
+    ATRASO_BUSCA = 300
+
     def setup_admin_panel(self):
         self.admin_frame = ttk.Frame(self, padding="10")
         self.admin_frame.pack(fill="both", expand=True)
@@ -52,32 +74,152 @@ class AdminWindow(tk.Toplevel):
         ttk.Button(self.button_frame, text="Editar Produto", command=self.edit_product_form).pack(side="left", padx=5)
         ttk.Button(self.button_frame, text="Deletar Produto", command=self.delete_product).pack(side="left", padx=5)
 
-        self.product_treeview = ttk.Treeview(self.admin_frame, columns=("id", "nome", "preco", "estoque"), show="headings")
-        self.product_treeview.heading("id", text="ID")
-        self.product_treeview.heading("nome", text="Nome")
-        self.product_treeview.heading("preco", text="Preço")
-        self.product_treeview.heading("estoque", text="Estoque")
+        # Busca enquanto digita (com um pequeno atraso para não consultar a cada tecla)
+        self.search_frame = ttk.Frame(self.admin_frame)
+        self.search_frame.pack(fill="x")
+        ttk.Label(self.search_frame, text="Buscar:").pack(side="left", padx=5)
+        self.busca_var = tk.StringVar()
+        self.busca_var.trace_add("write", lambda *args: self.agendar_busca())
+        ttk.Entry(self.search_frame, textvariable=self.busca_var, width=30).pack(side="left", padx=5)
+        self.status_label = ttk.Label(self.search_frame, text="")
+        self.status_label.pack(side="right", padx=5)
+
+        self.list_frame = ttk.Frame(self.admin_frame)
+        self.list_frame.pack(fill="both", expand=True, pady=10)
+
+        self.product_treeview = ttk.Treeview(self.list_frame, columns=("id", "nome", "preco", "estoque"), show="headings")
+        # Clicar no cabeçalho ordena pela coluna (no banco); clicar de novo inverte a ordem
+        for coluna, titulo in (("id", "ID"), ("nome", "Nome"), ("preco", "Preço"), ("estoque", "Estoque")):
+            self.product_treeview.heading(coluna, text=titulo, command=lambda c=coluna: self.ordenar_por(c))
         
         self.product_treeview.column("id", width=50, anchor="center")
         self.product_treeview.column("preco", width=100, anchor="center")
         self.product_treeview.column("estoque", width=100, anchor="center")
-        
-        self.product_treeview.pack(fill="both", expand=True, pady=10)
+
+        self.scrollbar = ttk.Scrollbar(self.list_frame, orient="vertical", command=self.product_treeview.yview)
+        self.product_treeview.configure(yscrollcommand=self._ao_rolar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.product_treeview.pack(side="left", fill="both", expand=True)
+
+        self.ordem = "nome"
+        self.decrescente = False
+        self._busca_agendada = None
+        self._proximo_cursor = None
+        self._total_produtos = 0
+        self._geracao = 0 # Muda a cada recarga; respostas de recargas antigas são descartadas
+        self._carregando = False
         self.display_products_in_treeview()
 
+    def destroy(self):
+        if getattr(self, "_trabalhador_proprio", False):
+            self.trabalhador.parar(aguardar=False)
+        super().destroy()
+
     def display_products_in_treeview(self):
-        for item in self.product_treeview.get_children():
-            self.product_treeview.delete(item)
-        
-        produtos = self.produto_repo.get_all()
+        """
+        Recarrega a lista do início com a busca e a ordenação atuais.
+        Só a primeira página é buscada; as outras vêm conforme a lista é rolada.
+        """
+        self._geracao += 1
+        self._proximo_cursor = None
+        self._carregando = True
+        geracao = self._geracao
+        termo, ordem, decrescente = self.busca_var.get(), self.ordem, self.decrescente
+
+        def consultar():
+            total = self.produto_repo.contar(termo)
+            return total, self.produto_repo.listar_pagina(self.TAMANHO_PAGINA, None, ordem, decrescente, termo)
+
+        def mostrar(resultado):
+            if not self.winfo_exists():
+                return # A janela foi fechada antes da resposta
+            if geracao != self._geracao:
+                return # O usuário já mudou a busca ou a ordenação
+            self._total_produtos, (produtos, self._proximo_cursor) = resultado
+            self.product_treeview.delete(*self.product_treeview.get_children())
+            self._inserir_produtos(produtos)
+
+        self.status_label.config(text="Carregando...")
+        self.trabalhador.enviar(consultar, ao_concluir=mostrar, ao_falhar=self._ao_falhar_carga)
+
+    def carregar_proxima_pagina(self):
+        """
+        Busca a próxima página no banco e acrescenta as linhas ao final da lista.
+        """
+        if self._carregando or self._proximo_cursor is None:
+            return # Já há uma página a caminho, ou já está tudo carregado
+        self._carregando = True
+        geracao = self._geracao
+        cursor, termo, ordem, decrescente = self._proximo_cursor, self.busca_var.get(), self.ordem, self.decrescente
+
+        def mostrar(resultado):
+            if not self.winfo_exists() or geracao != self._geracao:
+                return
+            produtos, self._proximo_cursor = resultado
+            self._inserir_produtos(produtos)
+
+        self.trabalhador.enviar(
+            lambda: self.produto_repo.listar_pagina(self.TAMANHO_PAGINA, cursor, ordem, decrescente, termo),
+            ao_concluir=mostrar, ao_falhar=self._ao_falhar_carga)
+
+    def _inserir_produtos(self, produtos):
         for p in produtos:
-            self.product_treeview.insert("", "end", values=(p.id, p.nome, f"R${p.preco:.2f}", p.estoque))
+            if self.product_treeview.exists(str(p.id)):
+                continue # Produto adicionado nesta tela, já mostrado no topo
+            self.product_treeview.insert("", "end", iid=str(p.id), values=self._valores_produto(p))
+        self._carregando = False
+        self.atualizar_status()
+
+    def _ao_falhar_carga(self, erro):
+        if not self.winfo_exists():
+            return
+        self._carregando = False
+        self.atualizar_status()
+        messagebox.showerror("Erro", f"Não foi possível carregar os produtos: {erro}")
+
+    def _ao_rolar(self, inicio, fim):
+        """
+        Repassa a posição para a barra de rolagem e, perto do fim da lista,
+        carrega mais uma página.
+        """
+        self.scrollbar.set(inicio, fim)
+        if float(fim) > 0.9 and self._proximo_cursor is not None:
+            # Fora do callback de rolagem, para não inserir linhas durante o redesenho
+            self.after_idle(self.carregar_proxima_pagina)
+
+    def agendar_busca(self):
+        """
+        Reinicia o atraso da busca a cada tecla; a lista só é recarregada
+        quando o usuário para de digitar.
+        """
+        if self._busca_agendada is not None:
+            self.after_cancel(self._busca_agendada)
+        self._busca_agendada = self.after(self.ATRASO_BUSCA, self._executar_busca)
+
+    def _executar_busca(self):
+        self._busca_agendada = None
+        self.display_products_in_treeview()
+
+    def ordenar_por(self, coluna):
+        if coluna == self.ordem:
+            self.decrescente = not self.decrescente
+        else:
+            self.ordem, self.decrescente = coluna, False
+        self.display_products_in_treeview()
+
+    def atualizar_status(self):
+        carregados = len(self.product_treeview.get_children())
+        self.status_label.config(text=f"{carregados} de {self._total_produtos} produto(s)")
+
+    @staticmethod
+    def _valores_produto(p):
+        return (p.id, p.nome, formatar_moeda(p.preco), formatar_quantidade(p.estoque, p.tipo_unidade))
 
     def add_product_form(self):
         # Janela pop-up para adicionar produto
         add_win = tk.Toplevel(self)
         add_win.title("Adicionar Novo Produto")
-        add_win.geometry("500x300")
+        add_win.geometry("500x360")
 
         ttk.Label(add_win, text="Nome:").pack(pady=5)
         name_entry = ttk.Entry(add_win)
@@ -91,26 +233,51 @@ class AdminWindow(tk.Toplevel):
         stock_entry = ttk.Entry(add_win)
         stock_entry.pack(pady=5)
 
+        ttk.Label(add_win, text="Código de barras (opcional):").pack(pady=5)
+        barcode_entry = ttk.Entry(add_win)
+        barcode_entry.pack(pady=5)
+
         def save():
             try:
                 nome = name_entry.get().strip()
-                preco = float(price_entry.get().replace(',', '.'))
-                estoque = int(stock_entry.get())
-
-                if not nome or preco <= 0 or estoque < 0:
-                    messagebox.showerror("Erro", "Campos inválidos. Por favor, preencha corretamente.")
-                    return
-                
-                # Assume tipo_unidade como 'UNIDADE' para simplificar o formulário
-                novo_produto = Produto(nome=nome, preco=preco, tipo_unidade="UNIDADE", estoque=estoque)
-                self.produto_repo.save(novo_produto)
-                self.display_products_in_treeview()
-                add_win.destroy()
-                messagebox.showinfo("Sucesso", "Produto adicionado!")
+                preco = para_centavos(price_entry.get())
+                estoque = para_quantidade(stock_entry.get(), "UNIDADE")
             except ValueError:
                 messagebox.showerror("Erro", "Preço ou estoque devem ser números válidos.")
+                return
 
-        ttk.Button(add_win, text="Salvar", command=save).pack(pady=10)
+            if not nome or preco <= 0 or estoque < 0:
+                messagebox.showerror("Erro", "Campos inválidos. Por favor, preencha corretamente.")
+                return
+
+            codigo_barras = barcode_entry.get().strip() or None
+            try:
+                if codigo_barras:
+                    codigo_barras = validar_codigo_barras(codigo_barras)
+            except ValueError as e:
+                messagebox.showerror("Erro", str(e))
+                return
+
+            # Assume tipo_unidade como 'UNIDADE' para simplificar o formulário
+            novo_produto = Produto(nome=nome, preco=preco, tipo_unidade="UNIDADE", estoque=estoque,
+                                   codigo_barras=codigo_barras)
+
+            def concluido(produto):
+                if not self.winfo_exists():
+                    return # A janela foi fechada antes da resposta
+                # Mostra o produto novo no topo da lista, sem recarregar as outras linhas
+                self.product_treeview.insert("", 0, iid=str(produto.id), values=self._valores_produto(produto))
+                self.product_treeview.selection_set(str(produto.id))
+                self.product_treeview.see(str(produto.id))
+                self._total_produtos += 1
+                self.atualizar_status()
+                add_win.destroy()
+                messagebox.showinfo("Sucesso", "Produto adicionado!")
+
+            self._salvar_em_segundo_plano(add_win, save_button, lambda: self._gravacao.save(novo_produto), concluido)
+
+        save_button = ttk.Button(add_win, text="Salvar", command=save)
+        save_button.pack(pady=10)
 
     def edit_product_form(self):
         selected_item = self.product_treeview.selection()
@@ -120,11 +287,27 @@ class AdminWindow(tk.Toplevel):
 
         item_data = self.product_treeview.item(selected_item, "values")
         produto_id = item_data[0]
-        produto = self.produto_repo.get_by_id(produto_id)
 
+        def carregado(produto):
+            if not self.winfo_exists():
+                return
+            if produto is None:
+                messagebox.showerror("Erro", "O produto não existe mais.")
+                return
+            self._abrir_form_edicao(produto)
+
+        def falhou(erro):
+            if self.winfo_exists():
+                messagebox.showerror("Erro", f"Não foi possível carregar o produto: {erro}")
+
+        # O produto é lido na thread do banco (versão e estoque atuais)
+        self.trabalhador.enviar(lambda: self.produto_repo.get_by_id(produto_id), ao_concluir=carregado,
+                                ao_falhar=falhou)
+
+    def _abrir_form_edicao(self, produto):
         edit_win = tk.Toplevel(self)
         edit_win.title(f"Editar Produto: {produto.nome}")
-        edit_win.geometry("500x300")
+        edit_win.geometry("500x360")
         
         ttk.Label(edit_win, text="Nome:").pack(pady=5)
         name_entry = ttk.Entry(edit_win)
@@ -133,28 +316,67 @@ class AdminWindow(tk.Toplevel):
         
         ttk.Label(edit_win, text="Preço:").pack(pady=5)
         price_entry = ttk.Entry(edit_win)
-        price_entry.insert(0, produto.preco)
+        price_entry.insert(0, f"{produto.preco // 100},{produto.preco % 100:02d}")
         price_entry.pack(pady=5)
 
         ttk.Label(edit_win, text="Estoque:").pack(pady=5)
         stock_entry = ttk.Entry(edit_win)
-        stock_entry.insert(0, produto.estoque)
+        stock_entry.insert(0, formatar_quantidade(produto.estoque, produto.tipo_unidade).replace(" kg", ""))
         stock_entry.pack(pady=5)
 
+        ttk.Label(edit_win, text="Código de barras (opcional):").pack(pady=5)
+        barcode_entry = ttk.Entry(edit_win)
+        barcode_entry.insert(0, produto.codigo_barras or "")
+        barcode_entry.pack(pady=5)
+
         def save_edit():
             try:
                 produto.nome = name_entry.get().strip()
-                produto.preco = float(price_entry.get().replace(',', '.'))
-                produto.estoque = int(stock_entry.get())
-                
-                self.produto_repo.save(produto)
-                self.display_products_in_treeview()
-                edit_win.destroy()
-                messagebox.showinfo("Sucesso", "Produto editado com sucesso!")
+                produto.preco = para_centavos(price_entry.get())
+                produto.estoque = para_quantidade(stock_entry.get(), produto.tipo_unidade)
             except ValueError:
                 messagebox.showerror("Erro", "Preço ou estoque devem ser números válidos.")
+                return
 
-        ttk.Button(edit_win, text="Salvar Alterações", command=save_edit).pack(pady=10)
+            try:
+                codigo_barras = barcode_entry.get().strip()
+                produto.codigo_barras = validar_codigo_barras(codigo_barras) if codigo_barras else None
+            except ValueError as e:
+                messagebox.showerror("Erro", str(e))
+                return
+
+            def concluido(produto):
+                if not self.winfo_exists():
+                    return # A janela foi fechada antes da resposta
+                # Atualiza só a linha editada
+                if self.product_treeview.exists(str(produto.id)):
+                    self.product_treeview.item(str(produto.id), values=self._valores_produto(produto))
+                edit_win.destroy()
+                messagebox.showinfo("Sucesso", "Produto editado com sucesso!")
+
+            self._salvar_em_segundo_plano(edit_win, save_button, lambda: self._gravacao.save(produto), concluido)
+
+        save_button = ttk.Button(edit_win, text="Salvar Alterações", command=save_edit)
+        save_button.pack(pady=10)
+
+    def _salvar_em_segundo_plano(self, janela, botao, tarefa, ao_concluir):
+        """
+        Executa a gravação na thread do banco. Enquanto isso o botão fica
+        desabilitado e a janela mostra que está salvando.
+        """
+        texto_original = botao.cget("text")
+        botao.config(state="disabled", text="Salvando...")
+
+        def falhou(erro):
+            if not janela.winfo_exists():
+                return
+            botao.config(state="normal", text=texto_original)
+            if isinstance(erro, sqlite3.IntegrityError):
+                messagebox.showerror("Erro", "Já existe um produto com este nome ou código de barras.", parent=janela)
+            else:
+                messagebox.showerror("Erro", f"Não foi possível salvar o produto: {erro}", parent=janela)
+
+        self.trabalhador.enviar(tarefa, ao_concluir=ao_concluir, ao_falhar=falhou)
 
     def delete_product(self):
         selected_item = self.product_treeview.selection()
@@ -166,9 +388,24 @@ class AdminWindow(tk.Toplevel):
         produto_id = item_data[0]
         produto_nome = item_data[1]
         
-        if messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja deletar o produto '{produto_nome}'?"):
-            if self.produto_repo.delete(produto_id):
+        if not messagebox.askyesno("Confirmar Exclusão", f"Tem certeza que deseja deletar o produto '{produto_nome}'?"):
+            return
+
+        def concluido(removido):
+            if not self.winfo_exists():
+                return # A janela foi fechada antes da resposta
+            if removido:
+                if self.product_treeview.exists(str(produto_id)):
+                    self.product_treeview.delete(str(produto_id))
+                self._total_produtos -= 1
+                self.atualizar_status()
                 messagebox.showinfo("Sucesso", "Produto deletado com sucesso!")
-                self.display_products_in_treeview()
             else:
-                messagebox.showerror("Erro", "Não foi possível deletar o produto.")
\ No newline at end of file
+                messagebox.showerror("Erro", "Não foi possível deletar o produto.")
+
+        def falhou(erro):
+            if self.winfo_exists():
+                messagebox.showerror("Erro", f"Não foi possível deletar o produto: {erro}")
+
+        self.trabalhador.enviar(lambda: self._gravacao.delete(produto_id), ao_concluir=concluido,
+                                ao_falhar=falhou)
\ No newline at end of file
@@ -2,25 +2,40 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import messagebox
-from src.gui.admin_window import AdminWindow
 
 # Importa as classes e repositórios do backend
-from src.models import Produto, Venda, ItemVenda
+from src.models import (Produto, Venda, ItemVenda, parece_codigo_barras, para_quantidade,
+                        formatar_moeda, formatar_quantidade)
 from src.repository import ProdutoRepository, VendaRepository
+from src.catalogo import CatalogoProdutos
+from src.gui.trabalhador import TrabalhadorBanco
 
 class MainWindow:
     """
     Representa a janela principal da aplicação de sistema de caixa.
     """
-    def __init__(self, root):
+    def __init__(self, root, diario=None):
+        """
+        Args:
+            root (tk.Tk): Janela raiz.
+            diario (DiarioVendas, optional): Se informado, as vendas são finalizadas no
+                diário de vendas em vez de gravadas direto no banco.
+        """
         self.root = root
+        self.diario = diario
         self.root.title("Sistema de Caixa - Operador")
         self.root.geometry("800x600")
 
-        # Inicializa a venda em andamento e os repositórios
-        self.venda_atual = Venda()
+        # Inicializa os repositórios (a venda em andamento é criada depois da tela, em nova_venda)
+        self.venda_atual = None
         self.produto_repo = ProdutoRepository()
         self.venda_repo = VendaRepository()
+        # Cache dos produtos: as consultas durante a venda não vão ao banco
+        self.catalogo = CatalogoProdutos(self.produto_repo)
+        # Gravações vão para uma thread separada: a tela não trava esperando o disco
+        self.trabalhador = TrabalhadorBanco(self.root)
+        self._salvando = False
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
 
         # Configura as colunas para se expandirem
         self.root.columnconfigure(0, weight=1)
@@ -39,10 +54,12 @@ class MainWindow:
         self.input_frame = ttk.Frame(self.main_frame)
         self.input_frame.grid(row=0, column=0, columnspan=2, sticky="ew")
 
-        ttk.Label(self.input_frame, text="Nome do Produto:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        ttk.Label(self.input_frame, text="Código de barras ou Nome:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
         self.produto_id_entry = ttk.Entry(self.input_frame, width=15)
         self.produto_id_entry.grid(row=0, column=1, padx=5, pady=5)
         self.produto_id_entry.focus()
+        # O leitor de código de barras "digita" o código e envia Enter
+        self.produto_id_entry.bind("<Return>", lambda event: self.adicionar_item_a_venda())
 
         ttk.Label(self.input_frame, text="Quantidade:").grid(row=0, column=2, padx=5, pady=5, sticky="w")
         self.quantidade_entry = ttk.Entry(self.input_frame, width=15)
@@ -54,8 +71,9 @@ class MainWindow:
         
         ttk.Button(self.button_frame, text="Adicionar", command=self.adicionar_item_a_venda).grid(row=0, column=0, padx=5)
         ttk.Button(self.button_frame, text="Remover", command=self.remover_item_da_venda).grid(row=0, column=1, padx=5)
-        ttk.Button(self.button_frame, text="Finalizar", command=self.finalizar_venda).grid(row=0, column=2, padx=5)
-        ttk.Button(self.button_frame, text="Administrador", command=lambda: AdminWindow(self.root)).grid(row=0, column=3, padx=5)
+        ttk.Button(self.button_frame, text="Diminuir", command=self.diminuir_item_da_venda).grid(row=0, column=2, padx=5)
+        ttk.Button(self.button_frame, text="Finalizar", command=self.finalizar_venda).grid(row=0, column=3, padx=5)
+        ttk.Button(self.button_frame, text="Administrador", command=self.abrir_administrador).grid(row=0, column=4, padx=5)
         
         # Lista de itens da venda (Treeview)
         self.venda_treeview = ttk.Treeview(self.main_frame, columns=("id", "nome", "qtd", "subtotal"), show="headings")
@@ -66,26 +84,53 @@ class MainWindow:
         self.venda_treeview.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=5, pady=5)
 
         # Label para mostrar o total da venda
-        self.total_label = ttk.Label(self.main_frame, text="Total: R$ 0.00", font=("Arial", 16, "bold"))
+        self.total_label = ttk.Label(self.main_frame, text=f"Total: {formatar_moeda(0)}", font=("Arial", 16, "bold"))
         self.total_label.grid(row=2, column=1, sticky="e", padx=5, pady=10)
 
+        # Mostra quando a venda está sendo gravada
+        self.status_label = ttk.Label(self.main_frame, text="")
+        self.status_label.grid(row=2, column=0, sticky="w", padx=5, pady=10)
+
+        self.nova_venda()
+
+        # Com a janela já na tela, carrega os produtos no cache em segundo plano:
+        # as primeiras leituras do scanner já encontram o produto em memória
+        self.root.after_idle(self._aquecer_catalogo)
+
         # Define os métodos
     def adicionar_item_a_venda(self):
+        if self._salvando:
+            self.root.bell() # A venda anterior ainda está sendo gravada
+            return
         try:
-            # Obtém o nome e a quantidade do produto
-            produto_nome = self.produto_id_entry.get().strip()
-            quantidade = float(self.quantidade_entry.get().replace(',', '.'))
-        except (ValueError, tk.TclError):
-            messagebox.showerror("Erro de entrada", "Por favor, insira um nome e uma quantidade válidos.")
+            # Obtém o código (ou nome) e a quantidade do produto.
+            # Sem quantidade informada, cada leitura conta como 1 unidade.
+            entrada_produto = self.produto_id_entry.get().strip()
+            quantidade_texto = self.quantidade_entry.get().strip() or "1"
+        except tk.TclError:
+            messagebox.showerror("Erro de entrada", "Por favor, insira um código ou nome e uma quantidade válidos.")
             return
 
-        produto_selecionado = self.produto_repo.get_by_name(produto_nome)
+        if not entrada_produto:
+            return
+
+        # Caminho principal: código de barras lido pelo scanner (busca exata e indexada).
+        # Se o texto não for um código válido, procura pelo nome.
+        if parece_codigo_barras(entrada_produto):
+            produto_selecionado = self.catalogo.get_by_barcode(entrada_produto)
+        else:
+            produto_selecionado = self.catalogo.get_by_name(entrada_produto)
         if not produto_selecionado:
             messagebox.showerror("Erro", "Produto não encontrado.")
             return
 
         try:
-            if quantidade <= 0 or quantidade > produto_selecionado.estoque:
+            # Produtos por peso: quantidade digitada em kg e guardada em gramas
+            quantidade = para_quantidade(quantidade_texto, produto_selecionado.tipo_unidade)
+            # O estoque precisa cobrir também o que já está na venda deste produto
+            linha = self.venda_atual.obter_linha(produto_selecionado.id)
+            ja_na_venda = linha.quantidade if linha else 0
+            if quantidade <= 0 or ja_na_venda + quantidade > produto_selecionado.estoque:
                 raise ValueError("Quantidade inválida ou insuficiente em estoque.")
             
             item_venda = ItemVenda(
@@ -94,9 +139,8 @@ class MainWindow:
                 preco_unitario_na_venda=produto_selecionado.preco
             )
             
+            # A linha da tabela e o total são atualizados pelo aviso da venda (_ao_alterar_venda)
             self.venda_atual.adicionar_item(item_venda)
-            self.update_item_list()
-            self.update_total()
 
             self.produto_id_entry.delete(0, tk.END)
             self.quantidade_entry.delete(0, tk.END)
@@ -106,6 +150,8 @@ class MainWindow:
             messagebox.showerror("Erro de lógica", str(e))
     
     def remover_item_da_venda(self):
+        if self._salvando:
+            return
         selected_item = self.venda_treeview.selection()
         if not selected_item:
             messagebox.showwarning("Aviso", "Selecione um item para remover.")
@@ -115,56 +161,144 @@ class MainWindow:
         item_data = self.venda_treeview.item(selected_item, "values")
         item_id_do_treeview = item_data[0]
         
-        # Remove o item da lista em memória da venda atual
-        self.venda_atual.itens = [item for item in self.venda_atual.itens if str(item.produto.id) != item_id_do_treeview]
-        self.venda_atual.total = sum(item.subtotal for item in self.venda_atual.itens)
+        # Remove a linha do produto da venda atual (a tabela e o total são atualizados pelo aviso da venda)
+        self.venda_atual.remover_linha(int(item_id_do_treeview))
 
-        self.update_item_list()
-        self.update_total()
+    def diminuir_item_da_venda(self):
+        """
+        Diminui a quantidade da linha selecionada (ex: um item lido a mais).
+        Usa a quantidade digitada ou, se vazia, 1 unidade (1 kg para produtos por peso).
+        """
+        if self._salvando:
+            return
+        selected_item = self.venda_treeview.selection()
+        if not selected_item:
+            messagebox.showwarning("Aviso", "Selecione um item para diminuir.")
+            return
+
+        produto_id = int(self.venda_treeview.item(selected_item, "values")[0])
+        linha = self.venda_atual.obter_linha(produto_id)
+        if linha is None:
+            return
+        try:
+            quantidade = para_quantidade(self.quantidade_entry.get().strip() or "1", linha.produto.tipo_unidade)
+            if quantidade <= 0:
+                raise ValueError("Quantidade inválida.")
+        except ValueError as e:
+            messagebox.showerror("Erro de lógica", str(e))
+            return
+
+        # Se a quantidade chegar a zero, a linha é removida
+        self.venda_atual.decrementar(produto_id, quantidade)
+        self.quantidade_entry.delete(0, tk.END)
 
     def finalizar_venda(self):
+        if self._salvando:
+            return
         if not self.venda_atual or not self.venda_atual.itens:
             messagebox.showwarning("Aviso", "Não há itens para finalizar a compra.")
             return
 
-        try:
-            # Salva a venda no banco de dados
-            self.venda_repo.save(self.venda_atual)
-            
-            # Atualiza o estoque de cada produto no banco de dados
-            for item in self.venda_atual.itens:
-                produto_db = self.produto_repo.get_by_id(item.produto.id)
-                if produto_db:
-                    produto_db.atualizar_estoque(-item.quantidade)
-                    self.produto_repo.save(produto_db)
-            
-            messagebox.showinfo("Sucesso", "Venda finalizada com sucesso!")
+        venda = self.venda_atual
+        if self.diario is not None:
+            # Modo diário: a gravação no arquivo é rápida e o banco é atualizado em lote
+            try:
+                self.diario.registrar(venda, venda.tipo_pagamento)
+            except Exception as e:
+                self._ao_falhar_finalizacao(e)
+                return
+            self._ao_finalizar_venda(venda)
+            return
 
-            # Reinicia a venda para uma nova transação
-            self.venda_atual = Venda()
-            self.update_item_list()
-            self.update_total()
+        # Salva a venda, os itens e a baixa de estoque em uma única transação,
+        # na thread do banco. Enquanto isso a venda fica travada na tela.
+        self._definir_salvando(True)
+        self.trabalhador.enviar(lambda: self.venda_repo.finalizar(venda, venda.tipo_pagamento),
+                                ao_concluir=self._ao_finalizar_venda,
+                                ao_falhar=self._ao_falhar_finalizacao)
 
-        except Exception as e:
-            messagebox.showerror("Erro na finalização", f"Ocorreu um erro ao finalizar a venda: {e}")
+    def _ao_finalizar_venda(self, venda):
+        self._definir_salvando(False)
+        # Reinicia a venda para uma nova transação
+        self.nova_venda()
+        # No modo diário a venda ainda não tem ID (recebe ao ser gravada no banco)
+        self.status_label.config(text=f"Venda {venda.id or venda.uuid[:8]} finalizada.")
 
-    def update_item_list(self):
-        # Limpa o Treeview antes de preencher
-        for item in self.venda_treeview.get_children():
-            self.venda_treeview.delete(item)
+    def _ao_falhar_finalizacao(self, erro):
+        # Nada foi gravado: a venda continua na tela para ser corrigida
+        self._definir_salvando(False)
+        messagebox.showerror("Erro na finalização", f"Ocorreu um erro ao finalizar a venda: {erro}")
+
+    def _definir_salvando(self, salvando):
+        self._salvando = salvando
+        self.status_label.config(text="Salvando venda..." if salvando else "")
+        self.root.config(cursor="watch" if salvando else "")
+
+    def fechar(self):
+        """
+        Fecha a aplicação depois de terminar as gravações pendentes.
+        """
+        self.trabalhador.parar()
+        self.root.destroy()
+
+    def abrir_administrador(self):
+        """
+        Abre a janela administrativa. O módulo só é importado no primeiro uso,
+        para não atrasar a abertura do caixa.
+        """
+        from src.gui.admin_window import AdminWindow
+        AdminWindow(self.root, self.trabalhador, self.catalogo)
+
+    def _aquecer_catalogo(self):
+        # Falhar no aquecimento não impede a venda: o catálogo busca no banco sob demanda
+        self.trabalhador.enviar(self.catalogo.aquecer, ao_falhar=lambda erro: None)
+
+    def nova_venda(self):
+        """
+        Começa uma venda nova: limpa a tabela e passa a ouvir as mudanças da venda.
+        """
+        if self.venda_atual is not None:
+            self.venda_atual.remover_ouvinte(self._ao_alterar_venda)
+        self.venda_atual = Venda()
+        self.venda_atual.adicionar_ouvinte(self._ao_alterar_venda)
+        self.update_item_list()
+        self.update_total()
 
-        # Adiciona os itens da venda atual ao Treeview
+    def update_item_list(self):
+        """
+        Redesenha a tabela inteira. Só é usado ao trocar de venda; durante a venda
+        cada mudança atualiza apenas a sua linha (_ao_alterar_venda).
+        """
+        self.venda_treeview.delete(*self.venda_treeview.get_children())
         for item in self.venda_atual.itens:
-            self.venda_treeview.insert("", "end", values=(
-                item.produto.id, 
-                item.produto.nome, 
-                item.quantidade, 
-                f"R${item.subtotal:.2f}"
-            ))
+            self.venda_treeview.insert("", "end", iid=str(item.produto.id), values=self._valores_linha(item))
+
+    def _ao_alterar_venda(self, evento, linha):
+        """
+        Ouvinte da venda atual: insere, atualiza ou remove só a linha afetada.
+        O id da linha no Treeview é o ID do produto (uma linha por produto na venda).
+        """
+        iid = str(linha.produto.id)
+        if evento == "removida":
+            if self.venda_treeview.exists(iid):
+                self.venda_treeview.delete(iid)
+        elif self.venda_treeview.exists(iid):
+            self.venda_treeview.item(iid, values=self._valores_linha(linha))
+        else:
+            self.venda_treeview.insert("", "end", iid=iid, values=self._valores_linha(linha))
+            self.venda_treeview.see(iid)
+        self.update_total()
+
+    @staticmethod
+    def _valores_linha(item):
+        return (item.produto.id,
+                item.produto.nome,
+                formatar_quantidade(item.quantidade, item.produto.tipo_unidade),
+                formatar_moeda(item.subtotal))
 
     def update_total(self):
         # Atualiza o rótulo do total
-        self.total_label.config(text=f"Total: R$ {self.venda_atual.total:.2f}")
+        self.total_label.config(text=f"Total: {formatar_moeda(self.venda_atual.total)}")
 
     def run(self):
         """
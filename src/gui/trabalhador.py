@@ -0,0 +1,113 @@
+# src/gui/trabalhador.py
+import queue
+import threading
+
+from tkinter import messagebox
+
+from src.database import gerenciador
+
+class TrabalhadorBanco:
+    """
+    Executa o acesso ao banco (gravações e consultas pesadas) em uma thread
+    separada, para que a interface não trave se o disco estiver lento ou o
+    banco estiver bloqueado por outro processo.
+
+    As tarefas são executadas uma de cada vez, na ordem em que foram enviadas.
+    O resultado (ou o erro) volta para a thread da interface por uma fila lida
+    com root.after(): os callbacks sempre rodam na thread do Tk, então podem
+    mexer nos widgets normalmente.
+
+    Uso:
+        trabalhador.enviar(lambda: repo.save(produto),
+                           ao_concluir=lambda produto: ...,
+                           ao_falhar=lambda erro: ...)
+    """
+    def __init__(self, root, intervalo_ms=50):
+        """
+        Args:
+            root (tk.Misc): Qualquer widget da aplicação (usado para agendar com after()).
+            intervalo_ms (int): Intervalo entre as verificações de resultados prontos.
+        """
+        self.root = root
+        self.intervalo_ms = intervalo_ms
+        self._tarefas = queue.Queue()
+        self._resultados = queue.Queue()
+        self._pendentes = 0 # Tarefas enviadas cujo callback ainda não rodou
+        self._verificando = False
+
+        self._thread = threading.Thread(target=self._executar, name="trabalhador-banco", daemon=True)
+        self._thread.start()
+
+    @property
+    def ocupado(self):
+        """
+        Indica se ainda há tarefas na fila ou em execução.
+        """
+        return self._pendentes > 0
+
+    def enviar(self, tarefa, ao_concluir=None, ao_falhar=None):
+        """
+        Coloca a tarefa (função sem argumentos) na fila da thread do banco.
+
+        Args:
+            tarefa (callable): Função executada na thread do banco.
+            ao_concluir (callable, optional): Chamado na thread da interface com o retorno da tarefa.
+            ao_falhar (callable, optional): Chamado na thread da interface com a exceção levantada.
+                Se não for informado, o erro é mostrado em uma caixa de mensagem.
+        """
+        self._pendentes += 1
+        self._tarefas.put((tarefa, ao_concluir, ao_falhar))
+        if not self._verificando:
+            self._verificando = True
+            self.root.after(self.intervalo_ms, self._verificar_resultados)
+
+    def parar(self, aguardar=True):
+        """
+        Encerra a thread depois das tarefas já enviadas (ex: ao fechar a janela,
+        para não perder uma venda que ainda estava sendo gravada).
+        """
+        self._tarefas.put(None)
+        if aguardar:
+            self._thread.join()
+
+    def _executar(self):
+        """
+        Laço da thread do banco. Usa a sua própria conexão (uma por thread).
+        """
+        try:
+            while True:
+                trabalho = self._tarefas.get()
+                if trabalho is None:
+                    break
+                tarefa, ao_concluir, ao_falhar = trabalho
+                try:
+                    self._resultados.put((ao_concluir, tarefa(), None, ao_falhar))
+                except Exception as e:
+                    self._resultados.put((ao_concluir, None, e, ao_falhar))
+        finally:
+            gerenciador.fechar_thread_atual()
+
+    def _verificar_resultados(self):
+        """
+        Roda na thread da interface: entrega os resultados prontos aos callbacks.
+        """
+        try:
+            while True:
+                try:
+                    ao_concluir, resultado, erro, ao_falhar = self._resultados.get_nowait()
+                except queue.Empty:
+                    break
+                self._pendentes -= 1
+                if erro is not None:
+                    if ao_falhar is not None:
+                        ao_falhar(erro)
+                    else:
+                        messagebox.showerror("Erro no banco de dados", str(erro))
+                elif ao_concluir is not None:
+                    ao_concluir(resultado)
+        finally:
+            # Mesmo que um callback falhe, continua verificando enquanto houver tarefas
+            if self._pendentes > 0:
+                self.root.after(self.intervalo_ms, self._verificar_resultados)
+            else:
+                self._verificando = False
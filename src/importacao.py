@@ -0,0 +1,290 @@
+# src/importacao.py
+"""
+Importação e exportação do catálogo de produtos em lote (CSV e JSON Lines).
+
+Os arquivos são lidos e escritos em fluxo (linha a linha), então o consumo de
+memória não depende do tamanho do arquivo. A importação grava em transações de
+'tamanho_lote' linhas usando executemany e faz "upsert" pelo nome do produto:
+produtos novos são inseridos e os existentes têm os dados atualizados.
+
+Colunas reconhecidas: nome, preco, tipo_unidade, estoque, codigo_barras.
+Só 'nome' e 'preco' são obrigatórias. Se 'tipo_unidade' ou 'estoque' vierem
+vazios, o produto existente mantém o valor atual (produtos novos recebem
+'UNIDADE' e estoque 0). O preço é em reais ('12,34' ou '12.34') e o estoque é
+um inteiro na unidade de controle do produto (unidades, ou gramas para 'KG'),
+o mesmo formato gerado pela exportação.
+
+Uso:
+    python -m src.importacao importar fornecedor.csv
+    python -m src.importacao exportar catalogo.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from .database import create_tables, get_db_connection, transacao
+from .models import para_centavos, validar_codigo_barras
+from .estoque import registrar_movimentos
+
+COLUNAS = ["nome", "preco", "tipo_unidade", "estoque", "codigo_barras"]
+MAXIMO_ERROS_GUARDADOS = 100
+TAMANHO_BLOCO_IN = 500 # Nomes por consulta 'IN (...)'
+
+SQL_UPSERT = """
+    INSERT INTO produtos (nome, preco, tipo_unidade, estoque, codigo_barras)
+    VALUES (?, ?, COALESCE(?, 'UNIDADE'), COALESCE(?, 0), ?)
+    ON CONFLICT (nome) DO UPDATE SET
+        preco = excluded.preco,
+        tipo_unidade = COALESCE(?, produtos.tipo_unidade),
+        estoque = COALESCE(?, produtos.estoque),
+        codigo_barras = COALESCE(excluded.codigo_barras, produtos.codigo_barras),
+        versao = produtos.versao + 1
+"""
+
+class ResultadoImportacao:
+    """
+    Resumo de uma importação: quantas linhas foram lidas, gravadas e rejeitadas.
+    """
+    def __init__(self):
+        self.lidas = 0
+        self.gravadas = 0
+        self.rejeitadas = 0
+        self.erros = [] # (número da linha, mensagem), limitado a MAXIMO_ERROS_GUARDADOS
+        self.segundos = 0.0
+
+    def registrar_erro(self, numero_linha, mensagem):
+        self.rejeitadas += 1
+        if len(self.erros) < MAXIMO_ERROS_GUARDADOS:
+            self.erros.append((numero_linha, mensagem))
+
+    def __str__(self):
+        return (f"Linhas lidas: {self.lidas} | Gravadas: {self.gravadas} | "
+                f"Rejeitadas: {self.rejeitadas} | Tempo: {self.segundos:.2f}s")
+
+def detectar_formato(caminho):
+    """
+    Descobre o formato pelo nome do arquivo ('csv' ou 'jsonl').
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        return "csv"
+    if extensao in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Formato de arquivo não reconhecido: '{extensao}'. Use .csv ou .jsonl.")
+
+def ler_registros(arquivo, formato, delimitador=","):
+    """
+    Gera (número da linha, dicionário) para cada registro do arquivo aberto.
+    Linhas JSON inválidas geram um dicionário vazio com a chave '_erro'.
+    """
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo, delimiter=delimitador)
+        for registro in leitor:
+            yield leitor.line_num, registro
+    else:
+        for numero_linha, linha in enumerate(arquivo, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+                if not isinstance(registro, dict):
+                    raise ValueError("a linha deve ser um objeto JSON")
+            except ValueError as e:
+                registro = {"_erro": f"JSON inválido ({e})"}
+            yield numero_linha, registro
+
+def _texto(valor):
+    """
+    Normaliza um campo lido do arquivo: None/vazio viram None, o resto vira str sem espaços.
+    """
+    if valor is None:
+        return None
+    valor = str(valor).strip()
+    return valor or None
+
+def validar_registro(registro):
+    """
+    Valida e converte um registro do arquivo.
+    Retorna a tupla de parâmetros para SQL_UPSERT ou levanta ValueError.
+    """
+    if "_erro" in registro:
+        raise ValueError(registro["_erro"])
+
+    nome = _texto(registro.get("nome"))
+    if not nome:
+        raise ValueError("nome vazio")
+
+    preco_texto = _texto(registro.get("preco"))
+    if preco_texto is None:
+        raise ValueError("preço vazio")
+    try:
+        # Aceita vírgula como separador decimal (pt-br); grava em centavos
+        preco = para_centavos(preco_texto)
+    except ValueError:
+        raise ValueError(f"preço inválido: '{preco_texto}'")
+    if preco <= 0:
+        raise ValueError("o preço deve ser maior que zero")
+
+    tipo_unidade = _texto(registro.get("tipo_unidade"))
+    if tipo_unidade is not None:
+        tipo_unidade = tipo_unidade.upper()
+        if tipo_unidade not in ("UNIDADE", "KG"):
+            raise ValueError(f"tipo de unidade inválido: '{tipo_unidade}'")
+
+    estoque_texto = _texto(registro.get("estoque"))
+    estoque = None
+    if estoque_texto is not None:
+        try:
+            estoque = int(estoque_texto)
+        except ValueError:
+            raise ValueError(f"estoque inválido: '{estoque_texto}'")
+        if estoque < 0:
+            raise ValueError("o estoque não pode ser negativo")
+
+    codigo_barras = _texto(registro.get("codigo_barras"))
+    if codigo_barras is not None:
+        codigo_barras = validar_codigo_barras(codigo_barras)
+
+    # tipo_unidade e estoque aparecem duas vezes: no INSERT e no DO UPDATE
+    return (nome, preco, tipo_unidade, estoque, codigo_barras, tipo_unidade, estoque)
+
+def _estoques_por_nome(conn, nomes):
+    """
+    Retorna {nome: (id, estoque)} dos produtos existentes com os nomes informados.
+    """
+    nomes = list(set(nomes))
+    estoques = {}
+    for inicio in range(0, len(nomes), TAMANHO_BLOCO_IN):
+        bloco = nomes[inicio:inicio + TAMANHO_BLOCO_IN]
+        marcadores = ", ".join("?" for _ in bloco)
+        for row in conn.execute(f"SELECT id, nome, estoque FROM produtos WHERE nome IN ({marcadores})", bloco):
+            estoques[row['nome']] = (row['id'], row['estoque'])
+    return estoques
+
+def _executar_upsert(conn, lista_parametros):
+    """
+    Grava as linhas com SQL_UPSERT e registra as mudanças de estoque como
+    movimentos AJUSTE (ver src/estoque.py). Deve ser chamado dentro de uma transação.
+    """
+    nomes = [parametros[0] for parametros in lista_parametros]
+    antes = _estoques_por_nome(conn, nomes)
+    conn.executemany(SQL_UPSERT, lista_parametros)
+    depois = _estoques_por_nome(conn, nomes)
+    registrar_movimentos(conn.cursor(), [
+        (produto_id, "AJUSTE", estoque - antes.get(nome, (None, 0))[1], None, "Importação")
+        for nome, (produto_id, estoque) in depois.items()
+    ])
+
+def _gravar_lote(lote, resultado):
+    """
+    Grava um lote de (número da linha, parâmetros) em uma transação.
+    Se o lote violar alguma restrição (ex: código de barras repetido em outro
+    produto), grava linha a linha para rejeitar apenas as linhas com problema.
+    """
+    try:
+        with transacao() as conn:
+            _executar_upsert(conn, [parametros for _, parametros in lote])
+        resultado.gravadas += len(lote)
+        return
+    except sqlite3.IntegrityError:
+        pass
+
+    for numero_linha, parametros in lote:
+        try:
+            with transacao() as conn:
+                _executar_upsert(conn, [parametros])
+            resultado.gravadas += 1
+        except sqlite3.IntegrityError as e:
+            resultado.registrar_erro(numero_linha, f"conflito no banco ({e})")
+
+def importar_produtos(caminho, formato=None, tamanho_lote=1000, delimitador=","):
+    """
+    Importa (insere ou atualiza) produtos a partir de um arquivo CSV ou JSON Lines.
+    Retorna um ResultadoImportacao.
+    """
+    formato = formato or detectar_formato(caminho)
+    resultado = ResultadoImportacao()
+    inicio = time.perf_counter()
+
+    lote = []
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        for numero_linha, registro in ler_registros(arquivo, formato, delimitador):
+            resultado.lidas += 1
+            try:
+                lote.append((numero_linha, validar_registro(registro)))
+            except ValueError as e:
+                resultado.registrar_erro(numero_linha, str(e))
+                continue
+
+            if len(lote) >= tamanho_lote:
+                _gravar_lote(lote, resultado)
+                lote = []
+
+    if lote:
+        _gravar_lote(lote, resultado)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+def exportar_produtos(caminho, formato=None, delimitador=","):
+    """
+    Exporta todos os produtos para um arquivo CSV ou JSON Lines, em fluxo.
+    Retorna a quantidade de produtos exportados.
+    """
+    formato = formato or detectar_formato(caminho)
+    conn = get_db_connection()
+    cursor = conn.execute(f"SELECT {', '.join(COLUNAS)} FROM produtos ORDER BY nome")
+
+    def valores(row):
+        # O preço sai em reais com duas casas ('12.34'), como a importação espera
+        nome, preco, tipo_unidade, estoque, codigo_barras = row
+        return (nome, f"{preco // 100}.{preco % 100:02d}", tipo_unidade, estoque, codigo_barras)
+
+    total = 0
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        if formato == "csv":
+            escritor = csv.writer(arquivo, delimiter=delimitador)
+            escritor.writerow(COLUNAS)
+            for row in cursor:
+                escritor.writerow(valores(row))
+                total += 1
+        else:
+            for row in cursor:
+                arquivo.write(json.dumps(dict(zip(COLUNAS, valores(row))), ensure_ascii=False))
+                arquivo.write("\n")
+                total += 1
+    return total
+
+def main(argumentos=None):
+    """
+    Linha de comando: importar/exportar o catálogo.
+    """
+    parser = argparse.ArgumentParser(description="Importação e exportação do catálogo de produtos.")
+    parser.add_argument("acao", choices=["importar", "exportar"])
+    parser.add_argument("arquivo", help="Arquivo .csv ou .jsonl")
+    parser.add_argument("--formato", choices=["csv", "jsonl"], help="Força o formato do arquivo")
+    parser.add_argument("--delimitador", default=",", help="Delimitador do CSV (padrão: ',')")
+    parser.add_argument("--lote", type=int, default=1000, help="Linhas por transação na importação")
+    args = parser.parse_args(argumentos)
+
+    create_tables()
+
+    if args.acao == "importar":
+        resultado = importar_produtos(args.arquivo, args.formato, args.lote, args.delimitador)
+        print(resultado)
+        for numero_linha, mensagem in resultado.erros:
+            print(f"  Linha {numero_linha}: {mensagem}")
+        if resultado.rejeitadas > len(resultado.erros):
+            print(f"  ... e mais {resultado.rejeitadas - len(resultado.erros)} erro(s).")
+        return 1 if resultado.rejeitadas else 0
+
+    total = exportar_produtos(args.arquivo, args.formato, args.delimitador)
+    print(f"{total} produto(s) exportado(s) para '{args.arquivo}'.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
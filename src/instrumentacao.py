@@ -0,0 +1,446 @@
+# src/instrumentacao.py
+"""
+Instrumentação opcional da camada de dados: tempo de cada comando SQL, tempo
+de cada método dos repositórios, conexões abertas e log de consultas lentas.
+
+Desligada, não custa nada: as conexões são sqlite3.Connection comuns. Ligada,
+as conexões abertas a partir daí passam a ser ConexaoInstrumentada, cujos
+cursores medem cada comando (execução + leitura das linhas), e os métodos
+públicos dos repositórios e do catálogo são embrulhados para medir o tempo de
+cada chamada. COMMIT e ROLLBACK também são medidos (é onde aparece o fsync).
+Os tempos vão para histogramas com faixas fixas, então a memória não cresce
+com o número de operações.
+
+Para ligar em um caixa sem mexer no código, use variáveis de ambiente:
+    CAIXA_INSTRUMENTACAO=1          liga a instrumentação
+    CAIXA_LIMIAR_LENTO_MS=100       comandos/métodos acima disso vão para o log
+    CAIXA_LOG_LENTO=arquivo.log     log de lentos (padrão: data/consultas_lentas.log)
+    CAIXA_RELATORIO=arquivo.json    grava o relatório completo ao encerrar
+
+Ou no código (deve ser chamado no início, antes de abrir conexões):
+    instrumentacao.ativar(limiar_lento_ms=50)
+    ...
+    instrumentacao.imprimir_relatorio()
+"""
+import atexit
+import datetime
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from .database import gerenciador
+
+LIMIAR_LENTO_MS_PADRAO = 100.0
+LOG_LENTO_PADRAO = os.path.join("data", "consultas_lentas.log")
+# Limites superiores (em ms) das faixas dos histogramas; a última faixa é "acima de 10 s"
+FAIXAS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Histograma:
+    """
+    Contagem de tempos por faixa (FAIXAS_MS), com total e máximo exatos.
+    Os percentis são aproximados pelo limite superior da faixa.
+    """
+    __slots__ = ("contagens", "quantidade", "total", "maximo")
+
+    def __init__(self):
+        self.contagens = [0] * (len(FAIXAS_MS) + 1)
+        self.quantidade = 0
+        self.total = 0.0 # ms
+        self.maximo = 0.0 # ms
+
+    def registrar(self, ms):
+        posicao = 0
+        while posicao < len(FAIXAS_MS) and ms > FAIXAS_MS[posicao]:
+            posicao += 1
+        self.contagens[posicao] += 1
+        self.quantidade += 1
+        self.total += ms
+        if ms > self.maximo:
+            self.maximo = ms
+
+    def percentil(self, fracao):
+        """
+        Limite superior da faixa onde está o percentil 'fracao' (0 a 1), em ms.
+        """
+        if not self.quantidade:
+            return 0.0
+        alvo = fracao * self.quantidade
+        acumulado = 0
+        for posicao, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return min(FAIXAS_MS[posicao], self.maximo) if posicao < len(FAIXAS_MS) else self.maximo
+        return self.maximo
+
+    def como_dict(self):
+        return {
+            "quantidade": self.quantidade,
+            "total_ms": round(self.total, 3),
+            "media_ms": round(self.total / self.quantidade, 3) if self.quantidade else 0.0,
+            "p50_ms": round(self.percentil(0.50), 3),
+            "p95_ms": round(self.percentil(0.95), 3),
+            "p99_ms": round(self.percentil(0.99), 3),
+            "max_ms": round(self.maximo, 3),
+            # {limite superior em ms: contagem}; "+inf" para a última faixa
+            "faixas": {str(limite): contagem for limite, contagem in
+                       zip(FAIXAS_MS + ("+inf",), self.contagens) if contagem},
+        }
+
+class Estatisticas:
+    """
+    Tudo o que a instrumentação coleta. Compartilhada entre as threads.
+    """
+    def __init__(self, limiar_lento_ms=LIMIAR_LENTO_MS_PADRAO, log_lento=None):
+        """
+        Args:
+            limiar_lento_ms (float): Comandos/métodos mais demorados que isso vão para o log.
+            log_lento (str, optional): Arquivo do log de lentos (None: não grava log).
+        """
+        self.limiar_lento_ms = limiar_lento_ms
+        self.log_lento = log_lento
+        self.inicio = time.time()
+        self.comandos = {} # SQL normalizado -> Histograma
+        self.metodos = {} # "Classe.metodo" -> Histograma
+        self.conexoes_abertas = 0 # Abertas desde a ativação
+        self.conexoes_ativas = 0 # Abertas e ainda não fechadas
+        self.lentos = 0
+        self._lock = threading.Lock()
+        # O log tem lock próprio: gravar no disco não segura quem só atualiza os histogramas
+        self._lock_log = threading.Lock()
+        self._arquivo_log = None # Aberto na primeira ocorrência e mantido aberto
+
+    def registrar_comando(self, sql, ms):
+        chave = normalizar_sql(sql)
+        with self._lock:
+            histograma = self.comandos.get(chave)
+            if histograma is None:
+                histograma = self.comandos[chave] = Histograma()
+            histograma.registrar(ms)
+        if ms >= self.limiar_lento_ms:
+            self._registrar_lento("SQL", chave, ms)
+
+    def registrar_metodo(self, nome, ms):
+        with self._lock:
+            histograma = self.metodos.get(nome)
+            if histograma is None:
+                histograma = self.metodos[nome] = Histograma()
+            histograma.registrar(ms)
+        if ms >= self.limiar_lento_ms:
+            self._registrar_lento("METODO", nome, ms)
+
+    def conexao_aberta(self):
+        with self._lock:
+            self.conexoes_abertas += 1
+            self.conexoes_ativas += 1
+
+    def conexao_fechada(self):
+        with self._lock:
+            self.conexoes_ativas -= 1
+
+    def _registrar_lento(self, tipo, descricao, ms):
+        """
+        Uma linha por ocorrência: data/hora, thread, tipo, tempo e o comando/método.
+        Os valores dos parâmetros não são gravados (podem ter dados de clientes).
+        """
+        with self._lock:
+            self.lentos += 1
+        if not self.log_lento:
+            return
+        agora = datetime.datetime.now().isoformat(sep=" ", timespec="milliseconds")
+        linha = f"{agora} | {threading.current_thread().name} | {tipo} | {ms:.1f} ms | {descricao}\n"
+        with self._lock_log:
+            try:
+                if self._arquivo_log is None:
+                    # Bufferizado por linha: cada ocorrência chega ao arquivo sem reabri-lo
+                    self._arquivo_log = open(self.log_lento, "a", encoding="utf-8", buffering=1)
+                self._arquivo_log.write(linha)
+            except OSError:
+                pass # O log nunca pode derrubar uma venda
+
+    def fechar(self):
+        """
+        Fecha o arquivo do log de lentos (é reaberto se houver nova ocorrência).
+        """
+        with self._lock_log:
+            if self._arquivo_log is not None:
+                try:
+                    self._arquivo_log.close()
+                except OSError:
+                    pass
+                self._arquivo_log = None
+
+    def relatorio(self):
+        """
+        Retorna um dicionário (serializável em JSON) com tudo o que foi coletado.
+        Comandos e métodos vêm ordenados pelo tempo total, do maior para o menor.
+        """
+        with self._lock:
+            comandos = sorted(self.comandos.items(), key=lambda item: item[1].total, reverse=True)
+            metodos = sorted(self.metodos.items(), key=lambda item: item[1].total, reverse=True)
+            return {
+                "inicio": datetime.datetime.fromtimestamp(self.inicio).isoformat(timespec="seconds"),
+                "segundos": round(time.time() - self.inicio, 3),
+                "conexoes_abertas": self.conexoes_abertas,
+                "conexoes_ativas": self.conexoes_ativas,
+                "limiar_lento_ms": self.limiar_lento_ms,
+                "lentos": self.lentos,
+                "comandos": {sql: histograma.como_dict() for sql, histograma in comandos},
+                "metodos": {nome: histograma.como_dict() for nome, histograma in metodos},
+            }
+
+_ESPACOS = re.compile(r"\s+")
+_LISTA_MARCADORES = re.compile(r"\?(\s*,\s*\?)+")
+
+def normalizar_sql(sql):
+    """
+    Junta as variações do mesmo comando: espaços em sequência viram um só e
+    listas de marcadores '(?, ?, ?)' viram '(?...)'.
+    """
+    return _LISTA_MARCADORES.sub("?...", _ESPACOS.sub(" ", sql).strip())
+
+# Estatísticas da instrumentação ativa (None quando desligada)
+estatisticas = None
+
+# --------------------------------------------------------------------------------------
+# Conexão e cursor instrumentados
+
+class CursorInstrumentado(sqlite3.Cursor):
+    """
+    Mede o tempo de cada comando: a execução mais a leitura das linhas. O tempo
+    é registrado quando o comando não retorna linhas, quando todas as linhas
+    foram lidas, quando o cursor executa outro comando ou é fechado.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sql = None
+        self._ms = 0.0
+
+    def _medir(self, funcao, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            self._ms += (time.perf_counter() - inicio) * 1000
+
+    def _concluir(self):
+        if getattr(self, "_sql", None) is not None:
+            if estatisticas is not None:
+                estatisticas.registrar_comando(self._sql, self._ms)
+            self._sql = None
+            self._ms = 0.0
+
+    def execute(self, sql, parametros=()):
+        self._concluir()
+        self._sql = sql
+        try:
+            self._medir(super().execute, sql, parametros)
+        finally:
+            if self.description is None: # Não retorna linhas (ou falhou)
+                self._concluir()
+        return self
+
+    def executemany(self, sql, parametros):
+        self._concluir()
+        self._sql = sql
+        try:
+            self._medir(super().executemany, sql, parametros)
+        finally:
+            self._concluir()
+        return self
+
+    def fetchone(self):
+        row = self._medir(super().fetchone)
+        if row is None:
+            self._concluir()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._medir(super().fetchmany, self.arraysize if size is None else size)
+        if not rows:
+            self._concluir()
+        return rows
+
+    def fetchall(self):
+        try:
+            return self._medir(super().fetchall)
+        finally:
+            self._concluir()
+
+    def __next__(self):
+        try:
+            return self._medir(super().__next__)
+        except StopIteration:
+            self._concluir()
+            raise
+
+    def close(self):
+        self._concluir()
+        super().close()
+
+    def __del__(self):
+        # Cursor abandonado antes de ler todas as linhas
+        self._concluir()
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """
+    Conexão cujos cursores são CursorInstrumentado. Usada pelo GerenciadorConexoes
+    enquanto a instrumentação estiver ativa.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._fechada = False
+        if estatisticas is not None:
+            estatisticas.conexao_aberta()
+
+    def cursor(self, factory=CursorInstrumentado):
+        return super().cursor(factory)
+
+    # Os atalhos da conexão usam o cursor instrumentado (os originais não passam por cursor())
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def commit(self):
+        self._medir("COMMIT", super().commit)
+
+    def rollback(self):
+        self._medir("ROLLBACK", super().rollback)
+
+    def close(self):
+        if not self._fechada and estatisticas is not None:
+            estatisticas.conexao_fechada()
+        self._fechada = True
+        super().close()
+
+    def _medir(self, sql, funcao):
+        inicio = time.perf_counter()
+        try:
+            funcao()
+        finally:
+            if estatisticas is not None:
+                estatisticas.registrar_comando(sql, (time.perf_counter() - inicio) * 1000)
+
+# --------------------------------------------------------------------------------------
+# Métodos dos repositórios
+
+_originais = [] # (classe, nome do método, função original), para desativar()
+
+def _embrulhar(nome, funcao):
+    @functools.wraps(funcao)
+    def medido(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            if estatisticas is not None:
+                estatisticas.registrar_metodo(nome, (time.perf_counter() - inicio) * 1000)
+    return medido
+
+def instrumentar_classe(classe):
+    """
+    Embrulha os métodos públicos da classe para medir o tempo de cada chamada.
+    Geradores (ex: VendaRepository.iterar) e métodos estáticos ficam de fora:
+    o tempo deles seria o da criação, não o da leitura.
+    """
+    import inspect # Só usado aqui; importar no topo atrasaria a abertura do caixa
+    for nome, funcao in list(vars(classe).items()):
+        if nome.startswith("_") or not inspect.isfunction(funcao) or inspect.isgeneratorfunction(funcao):
+            continue
+        _originais.append((classe, nome, funcao))
+        setattr(classe, nome, _embrulhar(f"{classe.__name__}.{nome}", funcao))
+
+def _classes_medidas():
+    # Importadas aqui para que este módulo possa ser importado pelo database/repository
+    from .repository import ProdutoRepository, VendaRepository
+    from .catalogo import CatalogoProdutos
+    return [ProdutoRepository, VendaRepository, CatalogoProdutos]
+
+# --------------------------------------------------------------------------------------
+
+def ativar(limiar_lento_ms=LIMIAR_LENTO_MS_PADRAO, log_lento=LOG_LENTO_PADRAO, relatorio=None):
+    """
+    Liga a instrumentação. Só as conexões abertas depois da chamada são medidas,
+    então chame no início do programa. Chamar de novo não tem efeito.
+
+    Args:
+        limiar_lento_ms (float): Tempo a partir do qual um comando ou método vai para o log.
+        log_lento (str, optional): Arquivo do log de lentos (None: só conta, sem gravar).
+        relatorio (str, optional): Se informado, o relatório em JSON é gravado nele ao encerrar.
+
+    Returns:
+        Estatisticas: Onde os dados são coletados.
+    """
+    global estatisticas
+    if estatisticas is not None:
+        return estatisticas
+    if log_lento:
+        diretorio = os.path.dirname(log_lento)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+    estatisticas = Estatisticas(limiar_lento_ms, log_lento)
+    gerenciador.fabrica_conexao = ConexaoInstrumentada
+    for classe in _classes_medidas():
+        instrumentar_classe(classe)
+    if relatorio:
+        atexit.register(gravar_relatorio, relatorio)
+    return estatisticas
+
+def desativar():
+    """
+    Desliga a instrumentação e devolve os métodos originais. Retorna as
+    Estatisticas coletadas. As conexões já abertas continuam instrumentadas,
+    mas deixam de registrar.
+    """
+    global estatisticas
+    coletadas, estatisticas = estatisticas, None
+    gerenciador.fabrica_conexao = sqlite3.Connection
+    while _originais:
+        classe, nome, funcao = _originais.pop()
+        setattr(classe, nome, funcao)
+    if coletadas is not None:
+        coletadas.fechar()
+    return coletadas
+
+def ativar_pelo_ambiente():
+    """
+    Liga a instrumentação se CAIXA_INSTRUMENTACAO estiver definida (ver a descrição do módulo).
+    """
+    if os.environ.get("CAIXA_INSTRUMENTACAO", "").lower() not in ("1", "sim", "true"):
+        return None
+    return ativar(limiar_lento_ms=float(os.environ.get("CAIXA_LIMIAR_LENTO_MS", LIMIAR_LENTO_MS_PADRAO)),
+                  log_lento=os.environ.get("CAIXA_LOG_LENTO", LOG_LENTO_PADRAO),
+                  relatorio=os.environ.get("CAIXA_RELATORIO") or None)
+
+def gravar_relatorio(caminho):
+    """
+    Grava o relatório da instrumentação ativa em JSON.
+    """
+    if estatisticas is None:
+        return
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(estatisticas.relatorio(), arquivo, ensure_ascii=False, indent=2)
+
+def imprimir_relatorio(limite=15):
+    """
+    Mostra os comandos e métodos que mais consumiram tempo.
+    """
+    if estatisticas is None:
+        print("Instrumentação desligada.")
+        return
+    relatorio = estatisticas.relatorio()
+    print("=" * 78)
+    print(f"Conexões abertas: {relatorio['conexoes_abertas']} (ativas: {relatorio['conexoes_ativas']}) | "
+          f"Lentos (>= {relatorio['limiar_lento_ms']:.0f} ms): {relatorio['lentos']}")
+    for titulo, itens in (("MÉTODOS", relatorio["metodos"]), ("COMANDOS SQL", relatorio["comandos"])):
+        print("-" * 78)
+        print(f"{titulo} (por tempo total)")
+        for nome, h in list(itens.items())[:limite]:
+            print(f"{h['total_ms']:>10.1f}ms {h['quantidade']:>7}x  p50 {h['p50_ms']:>7.2f}ms  "
+                  f"p99 {h['p99_ms']:>7.2f}ms  máx {h['max_ms']:>8.1f}ms  {nome[:60]}")
+    print("=" * 78)
@@ -1,20 +1,41 @@
 # src/main.py
-import tkinter as tk
-from src.gui.main_window import MainWindow
-from src.gui.admin_window import AdminWindow
-from src.database import create_tables
-from tkinter import ttk
+# Os módulos pesados (tkinter, janelas, diário, instrumentação) são importados
+# dentro de main(), na ordem em que são necessários: '--help' responde na hora
+# e o caixa não paga por módulos que não vai usar nesta execução.
+import argparse
 
-def main():
+def main(argumentos=None):
     """
     Ponto de entrada da aplicação. Inicializa a janela principal da GUI.
     """
-    create_tables() 
-    
+    parser = argparse.ArgumentParser(description="Sistema de caixa.")
+    parser.add_argument("--diario", nargs="?", const="", metavar="ARQUIVO",
+                        help="Finaliza as vendas no diário de vendas (padrão: data/caixa.diario)")
+    args = parser.parse_args(argumentos)
+
+    from src.instrumentacao import ativar_pelo_ambiente
+    ativar_pelo_ambiente() # CAIXA_INSTRUMENTACAO=1: mede o acesso ao banco (ver src/instrumentacao.py)
+
+    # Com o schema em dia, só confere a versão gravada no banco
+    from src.database import preparar_banco
+    preparar_banco()
+
+    # Modo diário: grava no banco o que ficou pendente da última execução
+    diario = None
+    if args.diario is not None:
+        from src.diario import abrir_diario
+        diario = abrir_diario(args.diario or None)
+
+    import tkinter as tk
+    from src.gui.main_window import MainWindow
+
     root = tk.Tk()
-    app = MainWindow(root)
-    
+    app = MainWindow(root, diario)
+
     app.run()
 
+    if diario is not None:
+        diario.fechar() # Grava no banco as vendas que ainda estão só no diário
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
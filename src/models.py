@@ -1,12 +1,145 @@
 import datetime
+import uuid as uuid_lib
+from array import array
+from decimal import Decimal, DecimalException, ROUND_HALF_UP
+
+# --------------------------------------------------------------------------------------
+# Dinheiro e quantidades
+#
+# Valores em dinheiro são inteiros em centavos (R$ 12,34 -> 1234) e quantidades
+# de produtos vendidos por peso são inteiros em gramas (0,250 kg -> 250).
+# Assim somas e comparações são exatas (sem os erros de arredondamento do float).
+# A conversão de/para texto acontece apenas na entrada e na exibição.
+
+GRAMAS_POR_KG = 1000
+# Maior valor aceito na entrada (em reais ou em quilos/unidades): bem abaixo do
+# limite dos inteiros do SQLite mesmo depois de convertido para centavos ou gramas
+VALOR_MAXIMO = Decimal(10) ** 12
+
+def _para_decimal(valor):
+    """
+    Converte texto ('12,34' ou '12.34'), int, float ou Decimal em Decimal.
+    Levanta ValueError para texto inválido, infinito, NaN ou valores cujo
+    módulo passe de VALOR_MAXIMO.
+    """
+    try:
+        if isinstance(valor, Decimal):
+            numero = valor
+        elif isinstance(valor, float):
+            numero = Decimal(repr(valor))
+        else:
+            numero = Decimal(str(valor).strip().replace(',', '.'))
+        valido = numero.is_finite() and abs(numero) <= VALOR_MAXIMO
+    except DecimalException:
+        valido = False
+    if not valido:
+        raise ValueError(f"Valor numérico inválido: '{valor}'")
+    return numero
+
+def _arredondar(numero, valor):
+    """
+    Arredonda para o inteiro mais próximo (meio para cima), sempre levantando
+    ValueError em caso de erro.
+    """
+    try:
+        return int(numero.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (DecimalException, OverflowError):
+        raise ValueError(f"Valor numérico inválido: '{valor}'")
+
+def para_centavos(valor):
+    """
+    Converte um valor em reais (ex: '12,34', 12.34) para centavos (1234).
+    """
+    reais = _para_decimal(valor)
+    return _arredondar(reais * 100, valor)
+
+def formatar_moeda(centavos):
+    """
+    Formata centavos para exibição (1234 -> 'R$12.34').
+    """
+    sinal = "-" if centavos < 0 else ""
+    centavos = abs(int(centavos))
+    return f"{sinal}R${centavos // 100}.{centavos % 100:02d}"
+
+def para_quantidade(valor, tipo_unidade):
+    """
+    Converte a quantidade digitada para o inteiro usado internamente:
+    unidades para 'UNIDADE' e gramas para 'KG' (ex: '0,25' kg -> 250).
+    """
+    quantidade = _para_decimal(valor)
+    if tipo_unidade == "KG":
+        return _arredondar(quantidade * GRAMAS_POR_KG, valor)
+    if quantidade != quantidade.to_integral_value():
+        raise ValueError("Produtos vendidos por unidade não aceitam quantidade fracionada.")
+    return int(quantidade)
+
+def formatar_quantidade(quantidade, tipo_unidade):
+    """
+    Formata uma quantidade interna para exibição (250 g -> '0.250 kg', 3 -> '3').
+    """
+    if tipo_unidade == "KG":
+        return f"{quantidade // GRAMAS_POR_KG}.{quantidade % GRAMAS_POR_KG:03d} kg"
+    return str(quantidade)
+
+def calcular_subtotal(preco_centavos, quantidade, tipo_unidade):
+    """
+    Subtotal em centavos. Para 'KG' o preço é por quilo e a quantidade em gramas,
+    com arredondamento para o centavo mais próximo.
+    """
+    if tipo_unidade == "KG":
+        return (preco_centavos * quantidade + GRAMAS_POR_KG // 2) // GRAMAS_POR_KG
+    return preco_centavos * quantidade
+
+# --------------------------------------------------------------------------------------
+# Código de barras
+
+# Tamanhos aceitos de código de barras: EAN-8, UPC-A, EAN-13 e GTIN-14
+TAMANHOS_CODIGO_BARRAS = (8, 12, 13, 14)
+
+def digito_verificador_gtin(corpo):
+    """
+    Calcula o dígito verificador GTIN (módulo 10) para os dígitos informados
+    (o código sem o último dígito).
+    """
+    soma = 0
+    # Da direita para a esquerda, os pesos alternam entre 3 e 1
+    for posicao, digito in enumerate(reversed(corpo)):
+        soma += int(digito) * (3 if posicao % 2 == 0 else 1)
+    return (10 - soma % 10) % 10
+
+def validar_codigo_barras(codigo):
+    """
+    Valida um código de barras EAN/GTIN e retorna o código normalizado (só dígitos).
+    Levanta ValueError se o tamanho ou o dígito verificador forem inválidos.
+    """
+    codigo = str(codigo).strip()
+    if not codigo.isdigit() or len(codigo) not in TAMANHOS_CODIGO_BARRAS:
+        raise ValueError("Código de barras deve ter 8, 12, 13 ou 14 dígitos.")
+    if digito_verificador_gtin(codigo[:-1]) != int(codigo[-1]):
+        raise ValueError("Dígito verificador do código de barras inválido.")
+    return codigo
+
+def parece_codigo_barras(texto):
+    """
+    Indica se o texto digitado (ou lido pelo leitor) é um código de barras válido.
+    """
+    try:
+        validar_codigo_barras(texto)
+        return True
+    except ValueError:
+        return False
 
 class Produto:
     """
     Representa um produto no sistema de caixa.
     Cada produto tem um ID (no banco de dados), nome, preço,
-    tipo de unidade (UNIDADE/KG) e estoque.
+    tipo de unidade (UNIDADE/KG), estoque e, opcionalmente, código de barras.
     """
-    def __init__(self, id=None, nome=None, preco=None, tipo_unidade=None, estoque=0):
+    # __slots__ evita um __dict__ por objeto: bem menos memória quando muitos
+    # produtos e itens são carregados de uma vez
+    __slots__ = ("id", "nome", "preco", "tipo_unidade", "estoque", "codigo_barras", "versao")
+
+    def __init__(self, id=None, nome=None, preco=None, tipo_unidade=None, estoque=0, codigo_barras=None, versao=0):
         """
         Construtor da classe Produto.
         Inicializa um novo objeto Produto.
@@ -14,9 +147,12 @@ class Produto:
         Args:
             id (int, optional): ID do produto, usado quando carregado do banco de dados. Defaults to None.
             nome (str): Nome do produto.
-            preco (float): Preço do produto.
+            preco (int): Preço do produto em centavos (por quilo, para 'KG').
             tipo_unidade (str): Tipo de unidade do produto ('UNIDADE' ou 'KG').
-            estoque (int): Quantidade em estoque. Defaults to 0.
+            estoque (int): Quantidade em estoque (unidades, ou gramas para 'KG'). Defaults to 0.
+            codigo_barras (str, optional): Código EAN/GTIN do produto. Defaults to None.
+            versao (int): Versão do registro no banco, usada para detectar alterações
+                concorrentes (ver ProdutoRepository.save). Defaults to 0.
         """
         # Atributos (características) do nosso Produto
         self.id = id # Será preenchido pelo banco de dados após a primeira inserção
@@ -24,12 +160,15 @@ class Produto:
         self.preco = preco
         self.tipo_unidade = tipo_unidade # 'UNIDADE' ou 'KG'
         self.estoque = estoque
+        self.codigo_barras = codigo_barras
+        self.versao = versao
 
     def __str__(self):
         """
         Retorna uma representação em string do objeto Produto, útil para impressão.
         """
-        return f"Produto(ID: {self.id}, Nome: {self.nome}, Preço: R${self.preco:.2f}, Tipo: {self.tipo_unidade}, Estoque: {self.estoque})"
+        return (f"Produto(ID: {self.id}, Nome: {self.nome}, Preço: {formatar_moeda(self.preco)}, "
+                f"Tipo: {self.tipo_unidade}, Estoque: {formatar_quantidade(self.estoque, self.tipo_unidade)})")
 
     def __repr__(self):
         """
@@ -39,11 +178,12 @@ class Produto:
 
     def calcular_subtotal(self, quantidade_vendida):
         """
-        Calcula o subtotal para uma dada quantidade deste produto.
+        Calcula o subtotal (em centavos) para uma dada quantidade deste produto
+        (unidades, ou gramas para 'KG').
         """
-        if not isinstance(quantidade_vendida, (int, float)) or quantidade_vendida <= 0:
-            raise ValueError("Quantidade vendida deve ser um número positivo.")
-        return self.preco * quantidade_vendida
+        if not isinstance(quantidade_vendida, int) or quantidade_vendida <= 0:
+            raise ValueError("Quantidade vendida deve ser um número inteiro positivo.")
+        return calcular_subtotal(self.preco, quantidade_vendida, self.tipo_unidade)
 
     def atualizar_estoque(self, quantidade_movimentada):
         """
@@ -64,7 +204,9 @@ class Venda:
     Uma venda agrupa múltiplos itens de venda e contém informações
     como data/hora, total, status e tipo de pagamento.
     """
-    def __init__(self, id=None, data_hora=None, total=0.0, status="ABERTA", tipo_pagamento=None):
+    __slots__ = ("id", "data_hora", "total", "status", "tipo_pagamento", "uuid", "_linhas", "_ouvintes")
+
+    def __init__(self, id=None, data_hora=None, total=0, status="ABERTA", tipo_pagamento=None, uuid=None):
         """
         Construtor da classe Venda.
         Inicializa um novo objeto Venda.
@@ -72,44 +214,136 @@ class Venda:
         Args:
             id (int, optional): ID da venda, usado quando carregada do banco de dados. Defaults to None.
             data_hora (str, optional): Data e hora da venda (YYYY-MM-DD HH:MM:SS). Defaults to None (set to now if not provided).
-            total (float): Valor total da venda. Defaults to 0.0.
+            total (int): Valor total da venda em centavos. Defaults to 0.
             status (str): Status da venda ('ABERTA', 'FINALIZADA', 'CANCELADA'). Defaults to "ABERTA".
             tipo_pagamento (str, optional): Forma de pagamento ('DINHEIRO', 'CARTAO', 'PIX'). Defaults to None.
+            uuid (str, optional): Identificador único da venda. Defaults to None (gera um novo).
         """
         self.id = id
         self.data_hora = data_hora if data_hora else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.total = total
         self.status = status
         self.tipo_pagamento = tipo_pagamento
-        self.itens = [] # Lista de objetos ItemVenda associados a esta venda
+        # Gerado no caixa: identifica a venda mesmo antes de ela ter um ID no banco
+        self.uuid = uuid if uuid else uuid_lib.uuid4().hex
+        # Carrinho: uma linha (ItemVenda) por produto, na ordem em que foram adicionados.
+        # Com o dicionário, juntar, alterar ou remover uma linha não depende do
+        # tamanho da venda, e o total é mantido a cada operação em vez de recalculado.
+        self._linhas = {} # produto_id -> ItemVenda
+        self._ouvintes = [] # Funções avisadas a cada mudança no carrinho (ver adicionar_ouvinte)
 
     def __str__(self):
-        return f"Venda(ID: {self.id}, Data: {self.data_hora}, Total: R${self.total:.2f}, Status: {self.status})"
+        return f"Venda(ID: {self.id}, Data: {self.data_hora}, Total: {formatar_moeda(self.total)}, Status: {self.status})"
 
     def __repr__(self):
         return self.__str__()
 
+    @property
+    def itens(self):
+        """
+        Lista dos itens (linhas) da venda, na ordem em que foram adicionados.
+        """
+        return list(self._linhas.values())
+
+    def adicionar_ouvinte(self, ouvinte):
+        """
+        Registra uma função chamada a cada mudança no carrinho como
+        ouvinte(evento, linha), com evento 'adicionada', 'alterada' ou 'removida'
+        e linha o ItemVenda afetado. Permite que a tela atualize só a linha mudada.
+        """
+        self._ouvintes.append(ouvinte)
+
+    def remover_ouvinte(self, ouvinte):
+        if ouvinte in self._ouvintes:
+            self._ouvintes.remove(ouvinte)
+
+    def _notificar(self, evento, linha):
+        for ouvinte in self._ouvintes:
+            ouvinte(evento, linha)
+
+    def obter_linha(self, produto_id):
+        """
+        Retorna a linha (ItemVenda) do produto informado, ou None.
+        """
+        return self._linhas.get(produto_id)
+
     def adicionar_item(self, item_venda):
         """
-        Adiciona um objeto ItemVenda à lista de itens desta venda
-        e atualiza o total da venda.
+        Adiciona um objeto ItemVenda à venda e atualiza o total.
+        Se o produto já estiver na venda, a quantidade é somada à linha existente
+        (que mantém o preço unitário da primeira leitura).
+        Retorna a linha da venda que contém o produto.
         """
         if not isinstance(item_venda, ItemVenda):
             raise TypeError("O item adicionado deve ser uma instância de ItemVenda.")
-        self.itens.append(item_venda)
-        self.total += item_venda.subtotal # Acumula o subtotal do item ao total da venda
+        linha = self._linhas.get(item_venda.produto.id)
+        if linha is None:
+            self._linhas[item_venda.produto.id] = item_venda
+            self.total += item_venda.subtotal # Acumula o subtotal do item ao total da venda
+            self._notificar("adicionada", item_venda)
+            return item_venda
+        self.total += linha.definir_quantidade(linha.quantidade + item_venda.quantidade)
+        self._notificar("alterada", linha)
+        return linha
+
+    def carregar_item(self, item_venda):
+        """
+        Acrescenta um item já gravado no banco sem alterar o total da venda
+        (o total carregado do banco já o inclui). Usado pelo repositório.
+        """
+        linha = self._linhas.get(item_venda.produto.id)
+        if linha is None:
+            self._linhas[item_venda.produto.id] = item_venda
+        else:
+            # Vendas antigas podem ter mais de uma linha do mesmo produto
+            linha.quantidade += item_venda.quantidade
+            linha.subtotal += item_venda.subtotal
+
+    def definir_quantidade(self, produto_id, quantidade):
+        """
+        Altera a quantidade da linha do produto; quantidade <= 0 remove a linha.
+        Retorna False se o produto não estiver na venda.
+        """
+        if quantidade <= 0:
+            return self.remover_linha(produto_id)
+        linha = self._linhas.get(produto_id)
+        if linha is None:
+            return False
+        self.total += linha.definir_quantidade(quantidade)
+        self._notificar("alterada", linha)
+        return True
+
+    def decrementar(self, produto_id, quantidade=1):
+        """
+        Diminui a quantidade da linha do produto (ex: um item lido a mais);
+        se chegar a zero, a linha é removida.
+        Retorna False se o produto não estiver na venda.
+        """
+        linha = self._linhas.get(produto_id)
+        if linha is None:
+            return False
+        return self.definir_quantidade(produto_id, linha.quantidade - quantidade)
+
+    def remover_linha(self, produto_id):
+        """
+        Remove a linha do produto informado e desconta o subtotal do total.
+        Retorna True se a linha foi removida, False se o produto não estava na venda.
+        """
+        linha = self._linhas.pop(produto_id, None)
+        if linha is None:
+            return False
+        self.total -= linha.subtotal
+        self._notificar("removida", linha)
+        return True
 
     def remover_item(self, item_venda_id):
         """
         Remove um item da venda pelo seu ID (temporário para a lista em memória).
         NOTA: Para persistência, a remoção deve ocorrer também no banco de dados.
         """
-        original_len = len(self.itens)
-        self.itens = [item for item in self.itens if item.id != item_venda_id]
-        if len(self.itens) < original_len:
-            # Recalcula o total se um item foi removido
-            self.total = sum(item.subtotal for item in self.itens)
-            return True # Item removido com sucesso
+        for produto_id, linha in self._linhas.items():
+            if linha.id == item_venda_id:
+                return self.remover_linha(produto_id)
         return False # Item não encontrado
 
 # --------------------------------------------------------------------------------------
@@ -118,7 +352,10 @@ class ItemVenda:
     """
     Representa um único item dentro de uma venda.
     Cada ItemVenda está ligado a um Produto e a uma Venda.
+    O Produto é uma referência: itens do mesmo produto compartilham a instância.
     """
+    __slots__ = ("id", "venda_id", "produto", "quantidade", "preco_unitario_na_venda", "subtotal")
+
     def __init__(self, id=None, venda_id=None, produto=None, quantidade=None, preco_unitario_na_venda=None, subtotal=None):
         """
         Construtor da classe ItemVenda.
@@ -128,9 +365,9 @@ class ItemVenda:
             id (int, optional): ID do item de venda, usado quando carregado do banco de dados. Defaults to None.
             venda_id (int, optional): ID da venda à qual este item pertence. Defaults to None.
             produto (Produto): Objeto Produto associado a este item.
-            quantidade (float): Quantidade do produto vendida.
-            preco_unitario_na_venda (float): Preço do produto no momento da venda (para histórico).
-            subtotal (float, optional): Subtotal do item (calculado se não fornecido). Defaults to None.
+            quantidade (int): Quantidade do produto vendida (unidades, ou gramas para 'KG').
+            preco_unitario_na_venda (int): Preço do produto em centavos no momento da venda (para histórico).
+            subtotal (int, optional): Subtotal do item em centavos (calculado se não fornecido). Defaults to None.
         """
         self.id = id
         self.venda_id = venda_id
@@ -138,12 +375,106 @@ class ItemVenda:
         self.quantidade = quantidade
         self.preco_unitario_na_venda = preco_unitario_na_venda if preco_unitario_na_venda is not None else produto.preco
         self.subtotal = subtotal if subtotal is not None else \
-                        self.preco_unitario_na_venda * self.quantidade
+                        calcular_subtotal(self.preco_unitario_na_venda, self.quantidade, produto.tipo_unidade)
+
+    def definir_quantidade(self, quantidade):
+        """
+        Altera a quantidade e recalcula o subtotal com o preço unitário da linha.
+        Retorna a diferença no subtotal (para atualizar o total da venda).
+        """
+        subtotal_anterior = self.subtotal
+        self.quantidade = quantidade
+        self.subtotal = calcular_subtotal(self.preco_unitario_na_venda, quantidade, self.produto.tipo_unidade)
+        return self.subtotal - subtotal_anterior
 
     def __str__(self):
         return (f"ItemVenda(ID: {self.id}, Venda ID: {self.venda_id}, "
-                f"Produto: {self.produto.nome}, Qtd: {self.quantidade}, "
-                f"Preço Unit.: R${self.preco_unitario_na_venda:.2f}, Subtotal: R${self.subtotal:.2f})")
+                f"Produto: {self.produto.nome}, Qtd: {formatar_quantidade(self.quantidade, self.produto.tipo_unidade)}, "
+                f"Preço Unit.: {formatar_moeda(self.preco_unitario_na_venda)}, Subtotal: {formatar_moeda(self.subtotal)})")
 
     def __repr__(self):
-        return self.__str__()
\ No newline at end of file
+        return self.__str__()
+# --------------------------------------------------------------------------------------
+# Lotes em colunas
+#
+# Para análises sobre muitas vendas (ex: um mês inteiro) não vale a pena criar um
+# objeto por venda e por item. LoteVendas e LoteItens guardam cada campo em uma
+# coluna (array de inteiros de 8 bytes), e a linha i de todas as colunas forma
+# um registro. Textos repetidos (status, tipo de pagamento) usam a mesma instância.
+
+class LoteVendas:
+    """
+    Vendas em formato de colunas: id, data_hora, total, status, tipo_pagamento e uuid.
+    """
+    __slots__ = ("id", "data_hora", "total", "status", "tipo_pagamento", "uuid", "_textos")
+
+    def __init__(self):
+        self.id = array("q")
+        self.data_hora = []
+        self.total = array("q") # Em centavos
+        self.status = []
+        self.tipo_pagamento = []
+        self.uuid = [] # None nas vendas anteriores à versão 7 do banco
+        self._textos = {}
+
+    def adicionar(self, id, data_hora, total, status, tipo_pagamento, uuid):
+        """
+        Acrescenta uma venda ao final do lote.
+        """
+        self.id.append(id)
+        self.data_hora.append(data_hora)
+        self.total.append(total)
+        self.status.append(self._textos.setdefault(status, status))
+        self.tipo_pagamento.append(self._textos.setdefault(tipo_pagamento, tipo_pagamento))
+        self.uuid.append(uuid)
+
+    def __len__(self):
+        return len(self.id)
+
+    def linha(self, posicao):
+        """
+        Retorna a venda da posição informada como um objeto Venda (sem itens).
+        """
+        return Venda(id=self.id[posicao], data_hora=self.data_hora[posicao], total=self.total[posicao],
+                     status=self.status[posicao], tipo_pagamento=self.tipo_pagamento[posicao],
+                     uuid=self.uuid[posicao])
+
+    def total_geral(self):
+        return sum(self.total)
+
+class LoteItens:
+    """
+    Itens de venda em formato de colunas: venda_id, produto_id, quantidade,
+    preco_unitario e subtotal (quantidades em unidades ou gramas, valores em centavos).
+    """
+    __slots__ = ("venda_id", "produto_id", "quantidade", "preco_unitario", "subtotal")
+
+    def __init__(self):
+        self.venda_id = array("q")
+        self.produto_id = array("q")
+        self.quantidade = array("q")
+        self.preco_unitario = array("q")
+        self.subtotal = array("q")
+
+    def adicionar(self, venda_id, produto_id, quantidade, preco_unitario, subtotal):
+        """
+        Acrescenta um item ao final do lote.
+        """
+        self.venda_id.append(venda_id)
+        self.produto_id.append(produto_id)
+        self.quantidade.append(quantidade)
+        self.preco_unitario.append(preco_unitario)
+        self.subtotal.append(subtotal)
+
+    def __len__(self):
+        return len(self.venda_id)
+
+    def totais_por_produto(self):
+        """
+        Retorna {produto_id: (quantidade, total)} somando todos os itens do lote.
+        """
+        quantidades, totais = {}, {}
+        for produto_id, quantidade, subtotal in zip(self.produto_id, self.quantidade, self.subtotal):
+            quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+            totais[produto_id] = totais.get(produto_id, 0) + subtotal
+        return {produto_id: (quantidades[produto_id], totais[produto_id]) for produto_id in quantidades}
@@ -0,0 +1,224 @@
+# src/relatorios.py
+"""
+Resumos diários de vendas, mantidos de forma incremental.
+
+As tabelas 'resumo_vendas_dia' (por dia e tipo de pagamento) e
+'resumo_produtos_dia' (por dia e produto) são atualizadas pelo VendaRepository
+na mesma transação em que a venda é gravada, alterada ou removida. Assim os
+relatórios de fechamento de caixa leem algumas linhas por dia em vez de
+percorrer todas as vendas e itens. Só vendas FINALIZADAS entram nos resumos.
+
+Se os resumos ficarem inconsistentes (ex: alterações feitas direto no banco),
+recalcule tudo a partir do histórico:
+    python -m src.relatorios reconstruir
+
+Fechamento de um dia:
+    python -m src.relatorios dia 2024-05-31
+
+Análise de um período a partir das vendas (não dos resumos):
+    python -m src.relatorios periodo 2024-05-01 2024-06-01
+"""
+import argparse
+import datetime
+import sys
+
+from .database import create_tables, get_db_connection, transacao
+from .models import formatar_moeda, formatar_quantidade
+
+STATUS_CONTABILIZADO = "FINALIZADA"
+
+def atualizar_resumos_venda(cursor, venda_id, sinal=1):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) a venda informada dos resumos diários,
+    usando os dados já gravados em 'vendas' e 'itens_venda'.
+    Deve ser chamada dentro da transação que grava/remove a venda.
+    """
+    cursor.execute("""
+        INSERT INTO resumo_vendas_dia (dia, tipo_pagamento, quantidade_vendas, total)
+        SELECT substr(data_hora, 1, 10), COALESCE(tipo_pagamento, ''), ?, ? * total
+        FROM vendas
+        WHERE id = ? AND status = ?
+        ON CONFLICT (dia, tipo_pagamento) DO UPDATE SET
+            quantidade_vendas = quantidade_vendas + excluded.quantidade_vendas,
+            total = total + excluded.total
+    """, (sinal, sinal, venda_id, STATUS_CONTABILIZADO))
+    if cursor.rowcount == 0:
+        return # Venda inexistente ou não finalizada: nada a contabilizar
+
+    cursor.execute("""
+        INSERT INTO resumo_produtos_dia (dia, produto_id, quantidade, total)
+        SELECT substr(v.data_hora, 1, 10), iv.produto_id, ? * SUM(iv.quantidade), ? * SUM(iv.subtotal)
+        FROM itens_venda iv
+        JOIN vendas v ON v.id = iv.venda_id
+        WHERE v.id = ?
+        GROUP BY iv.produto_id
+        ON CONFLICT (dia, produto_id) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            total = total + excluded.total
+    """, (sinal, sinal, venda_id))
+
+    if sinal < 0:
+        # Remove as linhas que ficaram zeradas
+        cursor.execute("""
+            DELETE FROM resumo_vendas_dia
+            WHERE quantidade_vendas <= 0
+              AND dia = (SELECT substr(data_hora, 1, 10) FROM vendas WHERE id = ?)
+        """, (venda_id,))
+        cursor.execute("""
+            DELETE FROM resumo_produtos_dia
+            WHERE quantidade <= 0
+              AND dia = (SELECT substr(data_hora, 1, 10) FROM vendas WHERE id = ?)
+        """, (venda_id,))
+
+def reconstruir_resumos():
+    """
+    Recalcula todos os resumos diários a partir do histórico completo de vendas.
+    Os meses arquivados (ver src/arquivamento.py) não mudam mais e mantêm os
+    resumos que já tinham: só os dias dos meses não arquivados são recalculados.
+    """
+    fora_do_arquivo = "substr({coluna}, 1, 7) NOT IN (SELECT periodo FROM arquivos_vendas)"
+    with transacao() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"DELETE FROM resumo_vendas_dia WHERE {fora_do_arquivo.format(coluna='dia')}")
+        cursor.execute(f"DELETE FROM resumo_produtos_dia WHERE {fora_do_arquivo.format(coluna='dia')}")
+        cursor.execute(f"""
+            INSERT INTO resumo_vendas_dia (dia, tipo_pagamento, quantidade_vendas, total)
+            SELECT substr(data_hora, 1, 10), COALESCE(tipo_pagamento, ''), COUNT(*), SUM(total)
+            FROM vendas
+            WHERE status = ? AND {fora_do_arquivo.format(coluna='data_hora')}
+            GROUP BY 1, 2
+        """, (STATUS_CONTABILIZADO,))
+        cursor.execute(f"""
+            INSERT INTO resumo_produtos_dia (dia, produto_id, quantidade, total)
+            SELECT substr(v.data_hora, 1, 10), iv.produto_id, SUM(iv.quantidade), SUM(iv.subtotal)
+            FROM itens_venda iv
+            JOIN vendas v ON v.id = iv.venda_id
+            WHERE v.status = ? AND {fora_do_arquivo.format(coluna='v.data_hora')}
+            GROUP BY 1, 2
+        """, (STATUS_CONTABILIZADO,))
+
+def vendas_por_dia(data_inicio=None, data_fim=None):
+    """
+    Retorna [(dia, tipo_pagamento, quantidade_vendas, total em centavos)] no período
+    (data_inicio inclusiva e data_fim exclusiva, no formato YYYY-MM-DD).
+    """
+    condicoes, params = _filtro_periodo(data_inicio, data_fim)
+    rows = get_db_connection().execute(f"""
+        SELECT dia, tipo_pagamento, quantidade_vendas, total
+        FROM resumo_vendas_dia{condicoes}
+        ORDER BY dia, tipo_pagamento
+    """, params).fetchall()
+    return [tuple(row) for row in rows]
+
+def produtos_mais_vendidos(data_inicio=None, data_fim=None, limite=10):
+    """
+    Retorna [(produto_id, nome, tipo_unidade, quantidade, total)] dos produtos
+    com maior faturamento no período (total em centavos; quantidade em unidades,
+    ou gramas para 'KG').
+    """
+    condicoes, params = _filtro_periodo(data_inicio, data_fim, prefixo="r.")
+    rows = get_db_connection().execute(f"""
+        SELECT r.produto_id, p.nome, p.tipo_unidade, SUM(r.quantidade) AS quantidade, SUM(r.total) AS total
+        FROM resumo_produtos_dia r
+        LEFT JOIN produtos p ON p.id = r.produto_id{condicoes}
+        GROUP BY r.produto_id
+        ORDER BY total DESC
+        LIMIT ?
+    """, params + [limite]).fetchall()
+    return [tuple(row) for row in rows]
+
+def _filtro_periodo(data_inicio, data_fim, prefixo=""):
+    """
+    Monta o WHERE por dia para as consultas nos resumos.
+    """
+    condicoes, params = [], []
+    if data_inicio:
+        condicoes.append(f"{prefixo}dia >= ?")
+        params.append(data_inicio)
+    if data_fim:
+        condicoes.append(f"{prefixo}dia < ?")
+        params.append(data_fim)
+    return ((" WHERE " + " AND ".join(condicoes)) if condicoes else ""), params
+
+def imprimir_fechamento(dia):
+    """
+    Mostra o fechamento de caixa de um dia (YYYY-MM-DD).
+    """
+    dia_seguinte = (datetime.date.fromisoformat(dia) + datetime.timedelta(days=1)).isoformat()
+    linhas = vendas_por_dia(dia, dia_seguinte)
+
+    print("=" * 50)
+    print(f"FECHAMENTO DO DIA {dia}")
+    total_geral = 0
+    quantidade_geral = 0
+    for _, tipo_pagamento, quantidade, total in linhas:
+        print(f"- {tipo_pagamento or 'NÃO INFORMADO'}: {quantidade} venda(s) | {formatar_moeda(total)}")
+        total_geral += total
+        quantidade_geral += quantidade
+    print("-" * 50)
+    print(f"Total: {quantidade_geral} venda(s) | {formatar_moeda(total_geral)}")
+    print("\nMais vendidos:")
+    for _, nome, tipo_unidade, quantidade, total in produtos_mais_vendidos(dia, dia_seguinte):
+        print(f"- {nome or '(produto removido)'}: {formatar_quantidade(quantidade, tipo_unidade)} | {formatar_moeda(total)}")
+    print("=" * 50)
+
+def analisar_periodo(data_inicio, data_fim):
+    """
+    Indicadores de um período calculados direto das vendas e itens finalizados,
+    carregados em colunas (LoteVendas/LoteItens) para caber na memória mesmo
+    em períodos longos.
+
+    Retorna um dicionário com quantidade_vendas, total, ticket_medio,
+    itens_por_venda e totais_por_produto ({produto_id: (quantidade, total)}).
+    """
+    # Importado aqui porque o repository já importa este módulo
+    from .repository import VendaRepository
+
+    vendas, itens = VendaRepository().carregar_lote(STATUS_CONTABILIZADO, data_inicio, data_fim)
+    quantidade_vendas = len(vendas)
+    total = vendas.total_geral()
+    return {
+        "quantidade_vendas": quantidade_vendas,
+        "total": total,
+        "ticket_medio": total // quantidade_vendas if quantidade_vendas else 0,
+        "itens_por_venda": len(itens) / quantidade_vendas if quantidade_vendas else 0.0,
+        "totais_por_produto": itens.totais_por_produto(),
+    }
+
+def imprimir_analise(data_inicio, data_fim):
+    """
+    Mostra os indicadores de analisar_periodo() para o período [data_inicio, data_fim).
+    """
+    analise = analisar_periodo(data_inicio, data_fim)
+    print("=" * 50)
+    print(f"PERÍODO {data_inicio} a {data_fim} (exclusivo)")
+    print(f"Vendas: {analise['quantidade_vendas']} | Total: {formatar_moeda(analise['total'])}")
+    print(f"Ticket médio: {formatar_moeda(analise['ticket_medio'])} | "
+          f"Itens por venda: {analise['itens_por_venda']:.1f}")
+    print(f"Produtos diferentes vendidos: {len(analise['totais_por_produto'])}")
+    print("=" * 50)
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Resumos diários de vendas.")
+    subparsers = parser.add_subparsers(dest="acao", required=True)
+    subparsers.add_parser("reconstruir", help="Recalcula os resumos a partir do histórico")
+    parser_dia = subparsers.add_parser("dia", help="Mostra o fechamento de um dia")
+    parser_dia.add_argument("data", nargs="?", default=datetime.date.today().isoformat(),
+                            help="Dia no formato YYYY-MM-DD (padrão: hoje)")
+    parser_periodo = subparsers.add_parser("periodo", help="Analisa as vendas de um período")
+    parser_periodo.add_argument("inicio", help="Primeiro dia (YYYY-MM-DD)")
+    parser_periodo.add_argument("fim", help="Dia seguinte ao último (YYYY-MM-DD)")
+    args = parser.parse_args(argumentos)
+
+    create_tables()
+    if args.acao == "reconstruir":
+        reconstruir_resumos()
+        print("Resumos diários recalculados.")
+    elif args.acao == "periodo":
+        imprimir_analise(args.inicio, args.fim)
+    else:
+        imprimir_fechamento(args.data)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
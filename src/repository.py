@@ -1,44 +1,103 @@
 
 # src/repository.py
+import re
 import sqlite3
-from .database import get_db_connection
-from .models import Produto, Venda, ItemVenda
+from .database import get_db_connection, transacao, tabela_existe
+from .models import Produto, Venda, ItemVenda, LoteVendas, LoteItens, validar_codigo_barras
+from .relatorios import atualizar_resumos_venda
+from .estoque import registrar_movimentos, registrar_saida_venda
+from .arquivamento import anexar, periodos_arquivados
 import datetime
 
+# Colunas lidas sempre que um Produto é montado a partir da tabela 'produtos'
+COLUNAS_PRODUTO = "id, nome, preco, tipo_unidade, estoque, codigo_barras, versao"
+# Colunas lidas sempre que uma Venda é montada a partir da tabela 'vendas'
+COLUNAS_VENDA = "id, data_hora, total, status, tipo_pagamento, uuid"
+
+# Quantas vezes uma atualização de produto é refeita quando outro caixa alterou
+# o mesmo produto entre a leitura e a gravação (ver ProdutoRepository.atualizar)
+TENTATIVAS_CONFLITO = 3
+
+# Quantidade máxima de parâmetros em um "IN (...)" (o SQLite limita o total por consulta)
+TAMANHO_BLOCO_IN = 500
+
+# Colunas pelas quais a listagem paginada de produtos pode ser ordenada.
+# Só nomes desta tabela entram no SQL (nunca o texto recebido da tela).
+ORDENACOES_PRODUTO = {
+    "id": "id",
+    "nome": "nome COLLATE NOCASE",
+    "preco": "preco",
+    "estoque": "estoque",
+}
+
 # ... o resto do seu código
 
 # src/repository.py
 
 # ... outros imports ...
 
+class ConflitoVersaoError(Exception):
+    """
+    Levantado quando o produto foi alterado por outra conexão (outro caixa)
+    depois de ter sido lido: a gravação é recusada para não perder a alteração
+    do outro. O atributo 'produto_id' guarda o produto em conflito.
+    """
+    def __init__(self, produto_id):
+        self.produto_id = produto_id
+        super().__init__(f"O produto {produto_id} foi alterado por outro usuário. Recarregue e tente novamente.")
+
 class ProdutoRepository:
     """
     Repositório para operações de CRUD (Create, Read, Update, Delete)
     com a tabela 'produtos' no banco de dados SQLite.
     """
+    def __init__(self):
+        self._tem_busca_texto = None # Descoberto na primeira busca
+
     def save(self, produto):
         """
         Salva um objeto Produto no banco de dados.
         Se o produto já tiver um ID, ele será atualizado. Caso contrário, será inserido.
+        Na atualização, levanta ConflitoVersaoError se o produto foi alterado no
+        banco depois de lido (a versão não confere); nada é gravado nesse caso.
         Retorna o objeto Produto com o ID atualizado.
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if produto.id:
-            cursor.execute("""
-                UPDATE produtos SET nome = ?, preco = ?, tipo_unidade = ?, estoque = ?
-                WHERE id = ?
-            """, (produto.nome, produto.preco, produto.tipo_unidade, produto.estoque, produto.id))
+        if produto.codigo_barras:
+            produto.codigo_barras = validar_codigo_barras(produto.codigo_barras)
         else:
-            cursor.execute("""
-                INSERT INTO produtos (nome, preco, tipo_unidade, estoque)
-                VALUES (?, ?, ?, ?)
-            """, (produto.nome, produto.preco, produto.tipo_unidade, produto.estoque))
-            produto.id = cursor.lastrowid
+            produto.codigo_barras = None # Código vazio é gravado como NULL (o índice é único)
+
+        with transacao() as conn:
+            cursor = conn.cursor()
+
+            if produto.id:
+                # Estoque no banco, para registrar a diferença como movimento AJUSTE
+                cursor.execute("SELECT estoque FROM produtos WHERE id = ? AND versao = ?",
+                               (produto.id, produto.versao))
+                row = cursor.fetchone()
+                if row is None:
+                    raise ConflitoVersaoError(produto.id)
+
+                # Compare-and-swap: só grava se ninguém alterou o produto desde que ele foi lido
+                cursor.execute("""
+                    UPDATE produtos SET nome = ?, preco = ?, tipo_unidade = ?, estoque = ?, codigo_barras = ?,
+                                        versao = versao + 1
+                    WHERE id = ? AND versao = ?
+                """, (produto.nome, produto.preco, produto.tipo_unidade, produto.estoque, produto.codigo_barras,
+                      produto.id, produto.versao))
+                if cursor.rowcount == 0:
+                    raise ConflitoVersaoError(produto.id)
+                registrar_movimentos(cursor, [(produto.id, "AJUSTE", produto.estoque - row['estoque'], None,
+                                               "Alteração do cadastro")])
+                produto.versao += 1
+            else:
+                cursor.execute("""
+                    INSERT INTO produtos (nome, preco, tipo_unidade, estoque, codigo_barras)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (produto.nome, produto.preco, produto.tipo_unidade, produto.estoque, produto.codigo_barras))
+                produto.id = cursor.lastrowid
+                registrar_movimentos(cursor, [(produto.id, "AJUSTE", produto.estoque, None, "Cadastro")])
 
-        conn.commit()
-        conn.close()
         return produto
 
     def get_by_id(self, produto_id):
@@ -48,30 +107,129 @@ class ProdutoRepository:
         """
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT id, nome, preco, tipo_unidade, estoque FROM produtos WHERE id = ?", (produto_id,))
+        cursor.execute(f"SELECT {COLUNAS_PRODUTO} FROM produtos WHERE id = ?", (produto_id,))
         row = cursor.fetchone()
-        conn.close()
         
         if row:
-            return Produto(id=row['id'], nome=row['nome'], preco=row['preco'], 
-                            tipo_unidade=row['tipo_unidade'], estoque=row['estoque'])
+            return self._criar_produto(row)
+        return None
+
+    def get_many(self, ids):
+        """
+        Busca vários produtos pelo ID (em blocos de TAMANHO_BLOCO_IN).
+        Retorna a lista de objetos Produto encontrados, sem ordem definida.
+        """
+        conn = get_db_connection()
+        ids = [int(produto_id) for produto_id in ids]
+        produtos = []
+        for inicio in range(0, len(ids), TAMANHO_BLOCO_IN):
+            bloco = ids[inicio:inicio + TAMANHO_BLOCO_IN]
+            marcadores = ", ".join("?" for _ in bloco)
+            rows = conn.execute(f"SELECT {COLUNAS_PRODUTO} FROM produtos WHERE id IN ({marcadores})", bloco).fetchall()
+            produtos.extend(self._criar_produto(row) for row in rows)
+        return produtos
+
+    def versoes(self, ids):
+        """
+        Retorna {id: versao} dos produtos informados que existem no banco
+        (consulta leve, para saber quais mudaram sem ler as linhas inteiras).
+        """
+        conn = get_db_connection()
+        ids = [int(produto_id) for produto_id in ids]
+        versoes = {}
+        for inicio in range(0, len(ids), TAMANHO_BLOCO_IN):
+            bloco = ids[inicio:inicio + TAMANHO_BLOCO_IN]
+            marcadores = ", ".join("?" for _ in bloco)
+            versoes.update(conn.execute(f"SELECT id, versao FROM produtos WHERE id IN ({marcadores})", bloco).fetchall())
+        return versoes
+
+    def get_by_barcode(self, codigo_barras):
+        """
+        Busca um produto pelo código de barras (EAN/GTIN), usando o índice único.
+        Retorna um objeto Produto ou None se não encontrado.
+        """
+        conn = get_db_connection()
+        row = conn.execute(f"SELECT {COLUNAS_PRODUTO} FROM produtos WHERE codigo_barras = ?",
+                           (str(codigo_barras).strip(),)).fetchone()
+        if row:
+            return self._criar_produto(row)
         return None
 
     def get_by_name(self, produto_name):
         """
         Busca um produto pelo seu nome no banco de dados.
+        Primeiro tenta o nome exato (sem diferenciar maiúsculas/minúsculas);
+        se não houver, retorna o candidato mais relevante de buscar().
         Retorna um objeto Produto ou None se não encontrado.
         """
+        produto_name = produto_name.strip()
+        if not produto_name:
+            return None
+
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT id, nome, preco, tipo_unidade, estoque FROM produtos WHERE LOWER(nome) LIKE ?", ('%' + produto_name.lower() + '%',))
+        cursor.execute(f"SELECT {COLUNAS_PRODUTO} FROM produtos WHERE nome = ? COLLATE NOCASE",
+                       (produto_name,))
         row = cursor.fetchone()
-        conn.close()
-        
         if row:
-            return Produto(id=row['id'], nome=row['nome'], preco=row['preco'], 
-                            tipo_unidade=row['tipo_unidade'], estoque=row['estoque'])
-        return None
+            return self._criar_produto(row)
+
+        candidatos = self.buscar(produto_name, limite=1)
+        return candidatos[0] if candidatos else None
+
+    def buscar(self, termo, limite=20):
+        """
+        Busca produtos cujo nome contenha palavras começando pelos termos digitados
+        (ex: "arr bra" encontra "Arroz Branco"), ignorando acentos e maiúsculas.
+        Retorna uma lista de no máximo 'limite' objetos Produto, do mais para o
+        menos relevante (nome exato primeiro).
+        """
+        palavras = re.findall(r"\w+", termo.lower())
+        if not palavras:
+            return []
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        if self._busca_texto_disponivel(conn):
+            # Cada palavra vira um prefixo entre aspas: "arr"* "bra"*
+            consulta = " ".join(f'"{palavra}"*' for palavra in palavras)
+            cursor.execute("""
+                SELECT p.id, p.nome, p.preco, p.tipo_unidade, p.estoque, p.codigo_barras, p.versao
+                FROM produtos_busca b
+                JOIN produtos p ON p.id = b.rowid
+                WHERE produtos_busca MATCH ?
+                ORDER BY (p.nome = ? COLLATE NOCASE) DESC, b.rank, length(p.nome)
+                LIMIT ?
+            """, (consulta, termo.strip(), limite))
+        else:
+            # Alternativa sem FTS5: mais lenta e sensível a acentos
+            condicoes = " AND ".join("nome LIKE ?" for _ in palavras)
+            cursor.execute(f"""
+                SELECT {COLUNAS_PRODUTO} FROM produtos
+                WHERE {condicoes}
+                ORDER BY length(nome), nome
+                LIMIT ?
+            """, tuple(f"%{palavra}%" for palavra in palavras) + (limite,))
+
+        return [self._criar_produto(row) for row in cursor.fetchall()]
+
+    def _busca_texto_disponivel(self, conn):
+        """
+        Indica se o índice de texto completo (FTS5) foi criado pelas migrações.
+        """
+        if self._tem_busca_texto is None:
+            self._tem_busca_texto = tabela_existe('produtos_busca', conn)
+        return self._tem_busca_texto
+
+    @staticmethod
+    def _criar_produto(row):
+        """
+        Cria um objeto Produto a partir de uma linha da tabela 'produtos'.
+        """
+        return Produto(id=row['id'], nome=row['nome'], preco=row['preco'],
+                       tipo_unidade=row['tipo_unidade'], estoque=row['estoque'],
+                       codigo_barras=row['codigo_barras'], versao=row['versao'])
 
     def get_all(self):
         """
@@ -80,31 +238,148 @@ class ProdutoRepository:
         """
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT id, nome, preco, tipo_unidade, estoque FROM produtos ORDER BY nome")
+        cursor.execute(f"SELECT {COLUNAS_PRODUTO} FROM produtos ORDER BY nome")
         rows = cursor.fetchall()
-        conn.close()
         
         produtos = []
         for row in rows:
-            produtos.append(Produto(id=row['id'], nome=row['nome'], preco=row['preco'], 
-                                    tipo_unidade=row['tipo_unidade'], estoque=row['estoque']))
+            produtos.append(self._criar_produto(row))
         return produtos
 
+    def atualizar(self, produto_id, alterar, tentativas=TENTATIVAS_CONFLITO):
+        """
+        Lê o produto, aplica 'alterar(produto)' e grava com save(). Se outro caixa
+        alterou o produto no meio do caminho, relê e tenta de novo, até 'tentativas'
+        vezes (depois disso o ConflitoVersaoError é repassado).
+        'alterar' pode levantar ValueError para desistir da alteração.
+        Retorna o Produto gravado, ou None se o produto não existir.
+        """
+        for tentativa in range(tentativas):
+            produto = self.get_by_id(produto_id)
+            if produto is None:
+                return None
+            alterar(produto)
+            try:
+                return self.save(produto)
+            except ConflitoVersaoError:
+                if tentativa == tentativas - 1:
+                    raise
+
+    def ajustar_estoque(self, produto_id, quantidade, tipo="AJUSTE", observacao=None, venda_id=None):
+        """
+        Soma 'quantidade' ao estoque (negativa para baixa) e registra o movimento
+        (ver src/estoque.py). A soma é feita no próprio UPDATE, sem ler e regravar
+        o produto, então não conflita com outros caixas. Levanta ValueError se o
+        estoque ficaria negativo. Retorna o Produto atualizado, ou None se não existir.
+
+        Args:
+            produto_id (int): ID do produto.
+            quantidade (int): Quantidade com sinal (unidades, ou gramas para 'KG').
+            tipo (str): 'REPOSICAO', 'DEVOLUCAO', 'AJUSTE' ou 'VENDA'.
+            observacao (str, optional): Motivo do movimento (ex: número da nota fiscal).
+            venda_id (int, optional): Venda relacionada (devoluções).
+        """
+        with transacao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE produtos SET estoque = estoque + ?, versao = versao + 1
+                WHERE id = ? AND estoque + ? >= 0
+            """, (quantidade, produto_id, quantidade))
+            if cursor.rowcount == 0:
+                cursor.execute("SELECT 1 FROM produtos WHERE id = ?", (produto_id,))
+                if cursor.fetchone() is None:
+                    return None
+                raise ValueError("Estoque não pode ser negativo.")
+            registrar_movimentos(cursor, [(produto_id, tipo, quantidade, venda_id, observacao)])
+        return self.get_by_id(produto_id)
+
+    def listar_pagina(self, limite=100, apos=None, ordem="nome", decrescente=False, termo=None):
+        """
+        Retorna uma página de produtos, para listas grandes (ex: a tela de administração).
+
+        Como em VendaRepository.listar_pagina(), a paginação é por chave: a próxima
+        página começa logo depois do último produto da anterior, sem OFFSET.
+
+        Args:
+            limite (int): Quantidade máxima de produtos na página.
+            apos (tuple, optional): Cursor devolvido pela página anterior.
+            ordem (str): Coluna de ordenação, uma das chaves de ORDENACOES_PRODUTO.
+            decrescente (bool): Ordena do maior para o menor.
+            termo (str, optional): Filtra pelos termos digitados (mesma regra de buscar()).
+
+        Retorna a tupla (produtos, proximo_cursor); proximo_cursor é None na última página.
+        """
+        if ordem not in ORDENACOES_PRODUTO:
+            raise ValueError(f"Ordenação inválida: '{ordem}'.")
+        coluna = ORDENACOES_PRODUTO[ordem]
+        direcao, comparacao = ("DESC", "<") if decrescente else ("ASC", ">")
+
+        conn = get_db_connection()
+        condicoes, params = self._filtro_busca(termo, conn)
+        if apos is not None:
+            condicoes.append(f"({coluna}, id) {comparacao} (?, ?)")
+            params.extend(apos)
+
+        query = f"SELECT {COLUNAS_PRODUTO} FROM produtos"
+        if condicoes:
+            query += " WHERE " + " AND ".join(condicoes)
+        query += f" ORDER BY {coluna} {direcao}, id {direcao} LIMIT ?"
+        params.append(limite)
+
+        produtos = [self._criar_produto(row) for row in conn.execute(query, params).fetchall()]
+
+        proximo_cursor = None
+        if len(produtos) == limite:
+            ultimo = produtos[-1]
+            proximo_cursor = (getattr(ultimo, ordem), ultimo.id)
+        return produtos, proximo_cursor
+
+    def contar(self, termo=None):
+        """
+        Quantidade de produtos cadastrados (ou que combinam com o termo de busca).
+        """
+        conn = get_db_connection()
+        condicoes, params = self._filtro_busca(termo, conn)
+        query = "SELECT COUNT(*) FROM produtos"
+        if condicoes:
+            query += " WHERE " + " AND ".join(condicoes)
+        return conn.execute(query, params).fetchone()[0]
+
+    def _filtro_busca(self, termo, conn):
+        """
+        Monta as condições (e parâmetros) do WHERE para filtrar produtos pelo termo
+        digitado, com o índice de texto completo quando disponível.
+        """
+        palavras = re.findall(r"\w+", (termo or "").lower())
+        if not palavras:
+            return [], []
+        if self._busca_texto_disponivel(conn):
+            consulta = " ".join(f'"{palavra}"*' for palavra in palavras)
+            return ["id IN (SELECT rowid FROM produtos_busca WHERE produtos_busca MATCH ?)"], [consulta]
+        return ["nome LIKE ?" for _ in palavras], [f"%{palavra}%" for palavra in palavras]
+
     def delete(self, produto_id):
         """
         Remove um produto do banco de dados pelo seu ID.
         Retorna True se o produto foi removido, False caso contrário.
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
-        rows_affected = cursor.rowcount
-        conn.commit()
-        conn.close()
+        with transacao() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM produtos WHERE id = ?", (produto_id,))
+            rows_affected = cursor.rowcount
         return rows_affected > 0
 
 # --------------------------------------------------------------------------------------
 
+class EstoqueInsuficienteError(ValueError):
+    """
+    Levantado quando uma venda não pode ser finalizada por falta de estoque.
+    O atributo 'produtos' guarda os nomes dos produtos sem estoque suficiente.
+    """
+    def __init__(self, produtos):
+        self.produtos = produtos
+        super().__init__("Estoque insuficiente para: " + ", ".join(produtos))
+
 class VendaRepository:
     """
     Repositório para operações de CRUD com a tabela 'vendas' e 'itens_venda'.
@@ -115,146 +390,539 @@ class VendaRepository:
         Se a venda já tiver um ID, ela será atualizada. Caso contrário, será inserida.
         Retorna o objeto Venda com o ID atualizado.
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        with transacao() as conn:
+            cursor = conn.cursor()
 
-        if venda.id: # Atualização de venda
-            cursor.execute("""
-                UPDATE vendas SET data_hora = ?, total = ?, status = ?, tipo_pagamento = ?
-                WHERE id = ?
-            """, (venda.data_hora, venda.total, venda.status, venda.tipo_pagamento, venda.id))
+            if venda.id: # Atualização de venda
+                # Tira a versão antiga da venda dos resumos diários e, depois do
+                # UPDATE, soma a versão nova (ex: venda cancelada sai do resumo)
+                atualizar_resumos_venda(cursor, venda.id, -1)
+                cursor.execute("""
+                    UPDATE vendas SET data_hora = ?, total = ?, status = ?, tipo_pagamento = ?
+                    WHERE id = ?
+                """, (venda.data_hora, venda.total, venda.status, venda.tipo_pagamento, venda.id))
             
-            # Para atualização de itens de venda, a lógica é mais complexa:
-            # Geralmente, deletamos todos os itens antigos e inserimos os novos.
-            # Ou, verificamos item por item (se existe, atualiza; se não, insere; se sumiu, deleta).
-            # Para simplificar aqui, vamos focar na inserção de novos itens para novas vendas.
-            # Em um cenário real, você teria um método ItemVendaRepository para isso.
+                # Para atualização de itens de venda, a lógica é mais complexa:
+                # Geralmente, deletamos todos os itens antigos e inserimos os novos.
+                # Ou, verificamos item por item (se existe, atualiza; se não, insere; se sumiu, deleta).
+                # Para simplificar aqui, vamos focar na inserção de novos itens para novas vendas.
+                # Em um cenário real, você teria um método ItemVendaRepository para isso.
             
-            # Por enquanto, se a venda já existe, não vamos mexer nos itens diretamente por este método.
-            pass # A gente vai tratar isso mais na frente, ou criar um ItemVendaRepository
+                # Por enquanto, se a venda já existe, não vamos mexer nos itens diretamente por este método.
+                atualizar_resumos_venda(cursor, venda.id, 1)
 
-        else: # Nova inserção de venda
-            cursor.execute("""
-                INSERT INTO vendas (data_hora, total, status, tipo_pagamento)
-                VALUES (?, ?, ?, ?)
-            """, (venda.data_hora, venda.total, venda.status, venda.tipo_pagamento))
-            venda.id = cursor.lastrowid # Pega o ID da nova venda
-
-            # Salva os itens da venda
-            for item in venda.itens:
-                # Garante que o item de venda sabe o ID da venda a que pertence
-                item.venda_id = venda.id 
-                # Chamar um ItemVendaRepository.save(item) seria o ideal aqui,
-                # mas por simplicidade, faremos o insert direto por enquanto.
-                cursor.execute("""
-                    INSERT INTO itens_venda (venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (item.venda_id, item.produto.id, item.quantidade, item.preco_unitario_na_venda, item.subtotal))
+            else: # Nova inserção de venda
+                self._inserir_venda(cursor, venda)
+
+        return venda
+
+    def _inserir_venda(self, cursor, venda):
+        """
+        Insere a venda e todos os seus itens usando o cursor informado.
+        Deve ser chamado dentro de uma transação.
+        """
+        cursor.execute("""
+            INSERT INTO vendas (data_hora, total, status, tipo_pagamento, uuid)
+            VALUES (?, ?, ?, ?, ?)
+        """, (venda.data_hora, venda.total, venda.status, venda.tipo_pagamento, venda.uuid))
+        venda.id = cursor.lastrowid # Pega o ID da nova venda
+
+        # Garante que cada item de venda sabe o ID da venda a que pertence
+        for item in venda.itens:
+            item.venda_id = venda.id
+
+        # Insere todos os itens de uma só vez
+        cursor.executemany("""
+            INSERT INTO itens_venda (venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(item.venda_id, item.produto.id, item.quantidade, item.preco_unitario_na_venda, item.subtotal)
+              for item in venda.itens])
+
+        # Mantém os resumos diários na mesma transação
+        atualizar_resumos_venda(cursor, venda.id, 1)
+
+    def finalizar(self, venda, tipo_pagamento):
+        """
+        Finaliza uma venda nova em uma única transação: grava a venda, grava os
+        itens e baixa o estoque de todos os produtos vendidos.
+        Se algum produto não tiver estoque suficiente, nada é gravado e
+        EstoqueInsuficienteError é levantado.
+        Retorna o objeto Venda com o ID atualizado.
+        """
+        if venda.id:
+            raise ValueError("A venda já foi registrada no banco de dados.")
+        if not venda.itens:
+            raise ValueError("Não há itens para finalizar a venda.")
+
+        # Quantidade vendida por produto (a venda já junta as leituras do mesmo produto em uma linha)
+        quantidades = {item.produto.id: item.quantidade for item in venda.itens}
+
+        status_anterior, pagamento_anterior = venda.status, venda.tipo_pagamento
+        venda.status = "FINALIZADA"
+        venda.tipo_pagamento = tipo_pagamento
+        try:
+            with transacao() as conn:
+                cursor = conn.cursor()
+
+                # Confere o estoque de todos os produtos com uma única consulta
+                marcadores = ", ".join("?" for _ in quantidades)
+                cursor.execute(f"SELECT id, nome, estoque, versao FROM produtos WHERE id IN ({marcadores})",
+                               tuple(quantidades))
+                estoques = {row['id']: row for row in cursor.fetchall()}
+
+                faltantes = []
+                for produto_id, quantidade in quantidades.items():
+                    row = estoques.get(produto_id)
+                    if row is None or row['estoque'] < quantidade:
+                        faltantes.append(row['nome'] if row else f"ID {produto_id}")
+                if faltantes:
+                    raise EstoqueInsuficienteError(faltantes)
+
+                # Baixa o estoque de forma condicional: se outro caixa vendeu o mesmo
+                # produto no meio do caminho, a linha não é atualizada e a venda é desfeita.
+                cursor.executemany("""
+                    UPDATE produtos SET estoque = estoque - ?, versao = versao + 1
+                    WHERE id = ? AND estoque >= ?
+                """, [(quantidade, produto_id, quantidade) for produto_id, quantidade in quantidades.items()])
+                if cursor.rowcount != len(quantidades):
+                    raise EstoqueInsuficienteError([estoques[produto_id]['nome'] for produto_id in quantidades])
+
+                self._inserir_venda(cursor, venda)
+                registrar_saida_venda(cursor, venda)
+        except BaseException:
+            # Nada foi gravado: devolve a venda ao estado anterior
+            venda.id = None
+            venda.status, venda.tipo_pagamento = status_anterior, pagamento_anterior
+            raise
+
+        # Mantém os objetos em memória coerentes com o banco
+        for item in venda.itens:
+            produto_id = item.produto.id
+            item.produto.estoque = estoques[produto_id]['estoque'] - quantidades[produto_id]
+            item.produto.versao = estoques[produto_id]['versao'] + 1
 
-        conn.commit()
-        conn.close()
         return venda
 
+    def gravar_finalizadas(self, vendas):
+        """
+        Grava, em uma única transação, vendas que já foram finalizadas no caixa
+        (ex: lidas do diário de vendas). Para cada venda insere a venda e os itens
+        e baixa o estoque, como finalizar().
+
+        A gravação é idempotente pelo UUID: uma venda que já está no banco (ou no
+        arquivo do seu mês, ver src/arquivamento.py) não é gravada de novo
+        (apenas recebe o ID existente). Como a venda já foi
+        confirmada ao cliente, o estoque é baixado mesmo que fique negativo.
+        Retorna a quantidade de vendas efetivamente inseridas.
+        """
+        inseridas = 0
+        # Vendas de meses já arquivados podem estar no arquivo do mês (diário
+        # reaplicado depois do arquivamento)
+        arquivadas = self._ids_arquivados_por_uuid(vendas)
+        try:
+            with transacao() as conn:
+                cursor = conn.cursor()
+                for venda in vendas:
+                    if venda.uuid in arquivadas:
+                        venda.id = arquivadas[venda.uuid]
+                        continue
+                    row = cursor.execute("SELECT id FROM vendas WHERE uuid = ?", (venda.uuid,)).fetchone()
+                    if row is not None:
+                        venda.id = row['id']
+                        continue
+                    cursor.executemany("UPDATE produtos SET estoque = estoque - ?, versao = versao + 1 WHERE id = ?",
+                                       [(item.quantidade, item.produto.id) for item in venda.itens])
+                    self._inserir_venda(cursor, venda)
+                    registrar_saida_venda(cursor, venda)
+                    inseridas += 1
+        except BaseException:
+            # Nada foi gravado: os IDs atribuídos no meio do caminho não valem
+            for venda in vendas:
+                venda.id = None
+            raise
+        return inseridas
+
+    @staticmethod
+    def _ids_arquivados_por_uuid(vendas):
+        """
+        Procura os UUIDs das vendas nos arquivos dos meses delas (anexados antes
+        da transação de gravação). Retorna {uuid: id} das que já estão arquivadas.
+        """
+        conn = get_db_connection()
+        periodos = {row['periodo'] for row in periodos_arquivados(conn=conn)}
+        por_periodo = {}
+        for venda in vendas:
+            periodo = (venda.data_hora or "")[:7]
+            if venda.uuid and periodo in periodos:
+                por_periodo.setdefault(periodo, []).append(venda.uuid)
+
+        encontradas = {}
+        for periodo, uuids in por_periodo.items():
+            esquema = anexar(conn, periodo)
+            for inicio in range(0, len(uuids), TAMANHO_BLOCO_IN):
+                bloco = uuids[inicio:inicio + TAMANHO_BLOCO_IN]
+                marcadores = ", ".join("?" for _ in bloco)
+                for row in conn.execute(f"SELECT uuid, id FROM {esquema}.vendas WHERE uuid IN ({marcadores})",
+                                        bloco).fetchall():
+                    encontradas[row['uuid']] = row['id']
+        return encontradas
+
     def get_by_id(self, venda_id):
         """
         Busca uma venda e seus itens pelo ID.
         Retorna um objeto Venda ou None.
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        vendas = self.get_many_with_items([venda_id])
+        return vendas[0] if vendas else None
 
-        # Busca a venda principal
-        cursor.execute("SELECT id, data_hora, total, status, tipo_pagamento FROM vendas WHERE id = ?", (venda_id,))
-        venda_row = cursor.fetchone()
+    def get_many_with_items(self, ids=None, status=None, data_inicio=None, data_fim=None):
+        """
+        Busca várias vendas já com os seus itens, sem fazer uma consulta por venda.
 
-        if not venda_row:
-            conn.close()
-            return None
+        As vendas são escolhidas pela lista de IDs ou pelos mesmos filtros de
+        listar_pagina(). São feitas apenas duas consultas (vendas e itens; listas de
+        IDs muito grandes são divididas em blocos), e itens do mesmo produto
+        compartilham a mesma instância de Produto. Vendas de períodos arquivados
+        também são encontradas: os IDs que não estão no banco principal são
+        procurados nos arquivos cuja faixa de IDs os contém.
 
-        venda = Venda(id=venda_row['id'], data_hora=venda_row['data_hora'], 
-                      total=venda_row['total'], status=venda_row['status'], 
-                      tipo_pagamento=venda_row['tipo_pagamento'])
+        Retorna a lista de objetos Venda: na ordem dos IDs informados, ou da mais
+        recente para a mais antiga quando a busca é por filtros.
+        """
+        conn = get_db_connection()
+        venda_rows, item_rows = [], []
+        if ids is not None:
+            ids = [int(venda_id) for venda_id in ids]
+            self._ler_vendas_com_itens(conn, "main", venda_rows, item_rows, ids=ids)
+            faltando = set(ids).difference(row['id'] for row in venda_rows)
+            if faltando:
+                for periodo, candidatos in self._periodos_dos_ids(conn, faltando):
+                    antes = len(venda_rows)
+                    self._ler_vendas_com_itens(conn, anexar(conn, periodo), venda_rows, item_rows,
+                                               ids=candidatos)
+                    faltando.difference_update(row['id'] for row in venda_rows[antes:])
+                    if not faltando:
+                        break
+            ordem = {venda_id: posicao for posicao, venda_id in enumerate(ids)}
+            venda_rows.sort(key=lambda row: ordem[row['id']])
+        else:
+            condicoes, params = self._filtros_vendas(status, data_inicio, data_fim)
+            filtro = (" WHERE " + " AND ".join(condicoes)) if condicoes else ""
+            for periodo in self._fontes(conn, data_inicio, data_fim):
+                self._ler_vendas_com_itens(conn, self._esquema(conn, periodo), venda_rows, item_rows, filtro=filtro, params=params)
+            venda_rows.sort(key=lambda row: (row['data_hora'], row['id']), reverse=True)
 
-        # Busca os itens de venda associados
-        cursor.execute("""
-            SELECT iv.id, iv.venda_id, iv.produto_id, iv.quantidade, iv.preco_unitario_na_venda, iv.subtotal,
-                   p.nome, p.preco, p.tipo_unidade, p.estoque
-            FROM itens_venda iv
-            JOIN produtos p ON iv.produto_id = p.id
-            WHERE iv.venda_id = ?
-        """, (venda_id,))
-        item_rows = cursor.fetchall()
-        
+        # Monta as vendas e distribui os itens em uma única passada
+        vendas = [self._criar_venda(row) for row in venda_rows]
+        por_id = {venda.id: venda for venda in vendas}
+        produtos = {} # produto_id -> Produto compartilhado entre os itens
         for item_row in item_rows:
-            # Recria o objeto Produto para o ItemVenda
-            produto = Produto(id=item_row['produto_id'], nome=item_row['nome'], 
-                              preco=item_row['preco'], tipo_unidade=item_row['tipo_unidade'], 
-                              estoque=item_row['estoque'])
-            
-            item_venda = ItemVenda(id=item_row['id'], venda_id=item_row['venda_id'],
-                                   produto=produto, quantidade=item_row['quantidade'],
-                                   preco_unitario_na_venda=item_row['preco_unitario_na_venda'],
-                                   subtotal=item_row['subtotal'])
-            venda.adicionar_item(item_venda) # Adiciona à lista de itens do objeto Venda
+            venda = por_id.get(item_row['venda_id'])
+            if venda is None:
+                continue
 
-        conn.close()
-        return venda
+            produto = produtos.get(item_row['produto_id'])
+            if produto is None:
+                produto = Produto(id=item_row['produto_id'], nome=item_row['nome'],
+                                  preco=item_row['preco'], tipo_unidade=item_row['tipo_unidade'],
+                                  estoque=item_row['estoque'], codigo_barras=item_row['codigo_barras'],
+                                  versao=item_row['versao'])
+                produtos[produto.id] = produto
+
+            venda.carregar_item(ItemVenda(id=item_row['id'], venda_id=item_row['venda_id'],
+                                          produto=produto, quantidade=item_row['quantidade'],
+                                          preco_unitario_na_venda=item_row['preco_unitario_na_venda'],
+                                          subtotal=item_row['subtotal']))
+        # O total de cada venda é o gravado no banco (já carregado em _criar_venda)
+        return vendas
+
+    @staticmethod
+    def _periodos_dos_ids(conn, ids):
+        """
+        Períodos arquivados que podem ter as vendas 'ids' (que não estão no banco
+        principal), como [(periodo, [ids])]: primeiro os das vendas gravadas com
+        atraso, registradas uma a uma, e depois os que têm os IDs na sua faixa.
+        """
+        ids = sorted(ids)
+        por_periodo = {}
+        for inicio in range(0, len(ids), TAMANHO_BLOCO_IN):
+            bloco = ids[inicio:inicio + TAMANHO_BLOCO_IN]
+            marcadores = ", ".join("?" for _ in bloco)
+            for row in conn.execute(f"""
+                SELECT venda_id, periodo FROM arquivos_vendas_avulsas WHERE venda_id IN ({marcadores})
+            """, bloco).fetchall():
+                por_periodo.setdefault(row['periodo'], []).append(row['venda_id'])
+        avulsas = {venda_id for candidatos in por_periodo.values() for venda_id in candidatos}
+        periodos = list(por_periodo.items())
+
+        restantes = [venda_id for venda_id in ids if venda_id not in avulsas]
+        if restantes:
+            for periodo in periodos_arquivados(conn=conn):
+                candidatos = [venda_id for venda_id in restantes
+                              if periodo['menor_id'] <= venda_id <= periodo['maior_id']]
+                if candidatos:
+                    periodos.append((periodo['periodo'], candidatos))
+        return periodos
+
+    @staticmethod
+    def _ler_vendas_com_itens(conn, esquema, venda_rows, item_rows, ids=None, filtro="", params=()):
+        """
+        Acrescenta a 'venda_rows' e 'item_rows' as vendas (e itens) de um banco
+        ('main' ou o esquema de um arquivo anexado), pelos IDs ou pelo filtro.
+        """
+        colunas_item = """
+            iv.id, iv.venda_id, iv.produto_id, iv.quantidade, iv.preco_unitario_na_venda, iv.subtotal,
+            p.nome, p.preco, p.tipo_unidade, p.estoque, p.codigo_barras, p.versao
+        """
+        if ids is not None:
+            for inicio in range(0, len(ids), TAMANHO_BLOCO_IN):
+                bloco = ids[inicio:inicio + TAMANHO_BLOCO_IN]
+                marcadores = ", ".join("?" for _ in bloco)
+                venda_rows.extend(conn.execute(
+                    f"SELECT {COLUNAS_VENDA} FROM {esquema}.vendas WHERE id IN ({marcadores})", bloco).fetchall())
+                item_rows.extend(conn.execute(f"""
+                    SELECT {colunas_item}
+                    FROM {esquema}.itens_venda iv
+                    JOIN main.produtos p ON iv.produto_id = p.id
+                    WHERE iv.venda_id IN ({marcadores})
+                    ORDER BY iv.venda_id, iv.id
+                """, bloco).fetchall())
+        else:
+            venda_rows.extend(conn.execute(
+                f"SELECT {COLUNAS_VENDA} FROM {esquema}.vendas{filtro} ORDER BY data_hora DESC, id DESC",
+                params).fetchall())
+            item_rows.extend(conn.execute(f"""
+                SELECT {colunas_item}
+                FROM {esquema}.itens_venda iv
+                JOIN main.produtos p ON iv.produto_id = p.id
+                WHERE iv.venda_id IN (SELECT id FROM {esquema}.vendas{filtro})
+                ORDER BY iv.venda_id, iv.id
+            """, params).fetchall())
+
+    @staticmethod
+    def _fontes(conn, data_inicio=None, data_fim=None, crescente=False):
+        """
+        Bancos que podem ter vendas no intervalo: None para o banco principal
+        (que tem as vendas recentes e as gravadas com atraso) e as linhas de
+        'arquivos_vendas' dos períodos que cruzam o intervalo. O banco principal
+        vem primeiro e os períodos do mais recente para o mais antigo; com
+        'crescente' a ordem é invertida. Ver _esquema().
+        """
+        fontes = [None] + list(periodos_arquivados(data_inicio, data_fim, conn))
+        return fontes[::-1] if crescente else fontes
+
+    @staticmethod
+    def _esquema(conn, periodo):
+        """
+        Esquema da fonte nas consultas: 'main', ou o arquivo do período, que é
+        anexado à conexão só quando a consulta chega nele.
+        """
+        return "main" if periodo is None else anexar(conn, periodo['periodo'])
 
     def get_all(self, status=None):
         """
         Busca todas as vendas no banco de dados, opcionalmente filtrando por status.
         Retorna uma lista de objetos Venda (sem os itens carregados por padrão para performance).
-        Para carregar os itens, use get_by_id para cada venda.
+        Para históricos grandes prefira iterar() ou listar_pagina(), que não carregam
+        todas as vendas na memória de uma vez.
+        """
+        return list(self.iterar(status=status))
+
+    def listar_pagina(self, limite=50, apos=None, status=None, data_inicio=None, data_fim=None):
         """
+        Retorna uma página de vendas, da mais recente para a mais antiga.
+
+        A paginação é por chave (keyset) em (data_hora, id): em vez de OFFSET, a
+        próxima página começa logo depois da última venda da página anterior, então
+        o custo de cada página não cresce com o tamanho do histórico.
+
+        Args:
+            limite (int): Quantidade máxima de vendas na página.
+            apos (tuple, optional): Cursor (data_hora, id) devolvido pela página anterior.
+            status (str, optional): Filtra pelo status da venda.
+            data_inicio (str, optional): Data/hora mínima (inclusiva), ex: '2024-01-01'.
+            data_fim (str, optional): Data/hora máxima (exclusiva), ex: '2024-02-01'.
+
+        Retorna a tupla (vendas, proximo_cursor); proximo_cursor é None na última página.
+        """
+        condicoes, params = self._filtros_vendas(status, data_inicio, data_fim)
+        if apos is not None:
+            condicoes.append("(data_hora, id) < (?, ?)")
+            params.extend(apos)
+
+        filtro = (" WHERE " + " AND ".join(condicoes)) if condicoes else ""
+        params.append(limite)
+
+        # Cada banco devolve a sua página; a página final é a junção das mais
+        # recentes. Um arquivo só é consultado se ainda puder ter vendas mais
+        # novas que a última da página (os períodos vêm do mais recente ao mais antigo).
         conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT id, data_hora, total, status, tipo_pagamento FROM vendas"
-        params = ()
-        if status:
-            query += " WHERE status = ?"
-            params = (status,)
-        query += " ORDER BY data_hora DESC" # Ordena da mais recente para a mais antiga
+        rows = []
+        for periodo in self._fontes(conn, data_inicio, data_fim):
+            if periodo is not None:
+                if len(rows) >= limite and rows[limite - 1]['data_hora'] >= periodo['data_fim']:
+                    break
+                if apos is not None and periodo['data_inicio'] > apos[0]:
+                    continue # Período inteiro já ficou nas páginas anteriores
+            rows.extend(conn.execute(
+                f"SELECT {COLUNAS_VENDA} FROM {self._esquema(conn, periodo)}.vendas{filtro} "
+                "ORDER BY data_hora DESC, id DESC LIMIT ?", params).fetchall())
+            if periodo is not None:
+                rows.sort(key=lambda row: (row['data_hora'], row['id']), reverse=True)
+        vendas = [self._criar_venda(row) for row in rows[:limite]]
 
+        proximo_cursor = None
+        if len(vendas) == limite:
+            ultima = vendas[-1]
+            proximo_cursor = (ultima.data_hora, ultima.id)
+        return vendas, proximo_cursor
+
+    def iterar(self, status=None, data_inicio=None, data_fim=None, tamanho_lote=500):
+        """
+        Gerador que percorre as vendas (da mais recente para a mais antiga) lendo
+        'tamanho_lote' linhas por vez com fetchmany. A memória usada não depende
+        do tamanho do histórico. Os filtros são os mesmos de listar_pagina().
+        """
+        conn = get_db_connection()
+        if periodos_arquivados(data_inicio, data_fim, conn):
+            # Com arquivos no intervalo, percorre página a página (cada página
+            # junta o banco principal e os arquivos necessários)
+            apos = None
+            while True:
+                vendas, apos = self.listar_pagina(tamanho_lote, apos, status, data_inicio, data_fim)
+                yield from vendas
+                if apos is None:
+                    return
+
+        condicoes, params = self._filtros_vendas(status, data_inicio, data_fim)
+        query = f"SELECT {COLUNAS_VENDA} FROM vendas"
+        if condicoes:
+            query += " WHERE " + " AND ".join(condicoes)
+        query += " ORDER BY data_hora DESC, id DESC" # Ordena da mais recente para a mais antiga
+
+        cursor = conn.cursor()
         cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
+        try:
+            while True:
+                rows = cursor.fetchmany(tamanho_lote)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._criar_venda(row)
+        finally:
+            cursor.close()
 
-        vendas = []
-        for row in rows:
-            vendas.append(Venda(id=row['id'], data_hora=row['data_hora'], 
-                                total=row['total'], status=row['status'], 
-                                tipo_pagamento=row['tipo_pagamento']))
-        return vendas
+    def carregar_lote(self, status=None, data_inicio=None, data_fim=None, tamanho_lote=5000):
+        """
+        Carrega vendas e itens em formato de colunas, para análises sobre muitas
+        vendas (ex: um mês inteiro) sem criar um objeto por venda e por item.
+        Os filtros são os mesmos de listar_pagina(); as vendas vêm em ordem
+        de data/hora e os itens agrupados por venda. Os períodos arquivados no
+        intervalo também são lidos.
+
+        Retorna a tupla (LoteVendas, LoteItens).
+        """
+        condicoes, params = self._filtros_vendas(status, data_inicio, data_fim)
+        filtro = (" WHERE " + " AND ".join(condicoes)) if condicoes else ""
+
+        lote_vendas, lote_itens = LoteVendas(), LoteItens()
+        conn = get_db_connection()
+        fontes = self._fontes(conn, data_inicio, data_fim, crescente=True)
+        # Com mais de um banco, as vendas são juntadas e ordenadas no final
+        # (o banco principal pode ter vendas gravadas com atraso ou restauradas
+        # em meses anteriores aos arquivos)
+        venda_rows = [] if len(fontes) > 1 else None
+        for periodo in fontes:
+            esquema = self._esquema(conn, periodo)
+            cursor = conn.cursor()
+            cursor.row_factory = None # Tuplas simples: mais rápido que sqlite3.Row
+            try:
+                cursor.execute(f"""
+                    SELECT {COLUNAS_VENDA}
+                    FROM {esquema}.vendas{filtro}
+                    ORDER BY data_hora, id
+                """, params)
+                while True:
+                    rows = cursor.fetchmany(tamanho_lote)
+                    if not rows:
+                        break
+                    if venda_rows is not None:
+                        venda_rows.extend(rows)
+                        continue
+                    for row in rows:
+                        lote_vendas.adicionar(*row)
+
+                cursor.execute(f"""
+                    SELECT venda_id, produto_id, quantidade, preco_unitario_na_venda, subtotal
+                    FROM {esquema}.itens_venda
+                    WHERE venda_id IN (SELECT id FROM {esquema}.vendas{filtro})
+                    ORDER BY venda_id, id
+                """, params)
+                while True:
+                    rows = cursor.fetchmany(tamanho_lote)
+                    if not rows:
+                        break
+                    for row in rows:
+                        lote_itens.adicionar(*row)
+            finally:
+                cursor.close()
+        if venda_rows is not None:
+            venda_rows.sort(key=lambda row: (row[1], row[0]))
+            for row in venda_rows:
+                lote_vendas.adicionar(*row)
+        return lote_vendas, lote_itens
+
+    @staticmethod
+    def _filtros_vendas(status=None, data_inicio=None, data_fim=None):
+        """
+        Monta as condições (e parâmetros) do WHERE para os filtros de vendas.
+        """
+        condicoes, params = [], []
+        if status:
+            condicoes.append("status = ?")
+            params.append(status)
+        if data_inicio:
+            condicoes.append("data_hora >= ?")
+            params.append(data_inicio)
+        if data_fim:
+            condicoes.append("data_hora < ?")
+            params.append(data_fim)
+        return condicoes, params
+
+    @staticmethod
+    def _criar_venda(row):
+        """
+        Cria um objeto Venda (sem itens) a partir de uma linha da tabela 'vendas'.
+        """
+        return Venda(id=row['id'], data_hora=row['data_hora'],
+                     total=row['total'], status=row['status'],
+                     tipo_pagamento=row['tipo_pagamento'], uuid=row['uuid'])
 
     def delete(self, venda_id):
         """
         Remove uma venda e seus itens associados do banco de dados.
         Retorna True se a venda foi removida, False caso contrário.
         """
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         try:
-            # Inicia uma transação para garantir que ambas as operações ocorram ou nenhuma ocorra
-            conn.execute("BEGIN TRANSACTION")
-            
-            # Primeiro, remove os itens de venda associados
-            cursor.execute("DELETE FROM itens_venda WHERE venda_id = ?", (venda_id,))
-            
-            # Em seguida, remove a venda principal
-            cursor.execute("DELETE FROM vendas WHERE id = ?", (venda_id,))
-            
-            rows_affected = cursor.rowcount # Verifica se a venda principal foi removida
-            
-            conn.commit() # Confirma as operações
+            # Uma transação garante que ambas as operações ocorram ou nenhuma ocorra
+            with transacao() as conn:
+                cursor = conn.cursor()
+
+                # Tira a venda dos resumos diários antes de apagá-la
+                atualizar_resumos_venda(cursor, venda_id, -1)
+
+                # Primeiro, remove os itens de venda associados
+                cursor.execute("DELETE FROM itens_venda WHERE venda_id = ?", (venda_id,))
+
+                # Em seguida, remove a venda principal
+                cursor.execute("DELETE FROM vendas WHERE id = ?", (venda_id,))
+
+                rows_affected = cursor.rowcount # Verifica se a venda principal foi removida
             return rows_affected > 0
         except sqlite3.Error as e:
-            conn.rollback() # Desfaz todas as operações em caso de erro
+            # A transação já foi desfeita (ROLLBACK) ao sair do bloco com erro
             print(f"Erro ao deletar venda e itens: {e}")
             return False
-        finally:
-            conn.close()
 
 # --------------------------------------------------------------------------------------
 
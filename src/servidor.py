@@ -0,0 +1,440 @@
+# src/servidor.py
+"""
+Servidor HTTP/JSON local para caixas "leves" (vários caixas, um só dono do banco).
+
+Os caixas não abrem o 'caixa.db': falam com este processo, que é o único a
+gravar. As gravações (finalizar venda) passam por uma única thread, uma de cada
+vez, e as consultas rodam em paralelo em outras threads (o banco está em modo
+WAL, então leituras não esperam pela gravação). O carrinho de cada caixa fica
+na memória do servidor até ser finalizado, descartado ou ficar 30 minutos sem uso
+(TEMPO_EXPIRACAO_CARRINHO).
+
+Só usa a biblioteca padrão (asyncio). Valores em dinheiro são inteiros em
+centavos e quantidades são inteiros (unidades, ou gramas para 'KG'); na entrada
+a quantidade também pode ser texto como '0,250' (kg).
+
+Rotas:
+    GET    /produtos/<id>
+    GET    /produtos?codigo_barras=789...   (ou ?nome=..., ou ?busca=...&limite=20)
+    POST   /carrinhos                                  -> {"carrinho": 1, ...}
+    GET    /carrinhos/<id>
+    POST   /carrinhos/<id>/itens       {"produto_id": 1 | "codigo_barras": "...", "quantidade": 2}
+    DELETE /carrinhos/<id>/itens/<produto_id>
+    POST   /carrinhos/<id>/finalizar   {"tipo_pagamento": "PIX"}
+    DELETE /carrinhos/<id>
+    POST   /vendas                     {"tipo_pagamento": "PIX", "itens": [{"produto_id": 1, "quantidade": 2}]}
+
+Uso:
+    python -m src.servidor --porta 8765
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import re
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from .catalogo import CatalogoProdutos
+from .database import create_tables, gerenciador
+from .models import Venda, ItemVenda, para_quantidade
+from .repository import VendaRepository, EstoqueInsuficienteError, ConflitoVersaoError
+from .instrumentacao import ativar_pelo_ambiente
+
+TAMANHO_MAXIMO_CORPO = 1024 * 1024 # 1 MB
+TEMPO_EXPIRACAO_CARRINHO = 30 * 60 # segundos sem uso até o carrinho ser descartado
+MAXIMO_CARRINHOS = 10000 # carrinhos abertos ao mesmo tempo
+MAIOR_INTEIRO_SQLITE = 2 ** 63 - 1
+FORMAS_PAGAMENTO = ("DINHEIRO", "CARTAO", "PIX")
+
+MOTIVOS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+
+class ErroHttp(Exception):
+    """
+    Interrompe o tratamento da requisição com o status e a mensagem informados.
+    """
+    def __init__(self, status, mensagem):
+        self.status = status
+        super().__init__(mensagem)
+
+# --------------------------------------------------------------------------------------
+# Conversão para JSON
+
+def produto_para_json(produto):
+    return {"id": produto.id, "nome": produto.nome, "preco": produto.preco,
+            "tipo_unidade": produto.tipo_unidade, "estoque": produto.estoque,
+            "codigo_barras": produto.codigo_barras}
+
+def venda_para_json(venda, carrinho_id=None):
+    dados = {"id": venda.id, "uuid": venda.uuid, "data_hora": venda.data_hora, "total": venda.total,
+             "status": venda.status, "tipo_pagamento": venda.tipo_pagamento,
+             "itens": [{"produto_id": item.produto.id, "nome": item.produto.nome,
+                        "tipo_unidade": item.produto.tipo_unidade, "quantidade": item.quantidade,
+                        "preco_unitario": item.preco_unitario_na_venda, "subtotal": item.subtotal}
+                       for item in venda.itens]}
+    if carrinho_id is not None:
+        dados["carrinho"] = carrinho_id
+    return dados
+
+# --------------------------------------------------------------------------------------
+
+class ServidorCaixa:
+    """
+    Aplicação: rotas, carrinhos em memória e as threads de leitura e de gravação.
+    """
+    def __init__(self, leitores=4, catalogo=None, venda_repo=None):
+        """
+        Args:
+            leitores (int): Threads para consultas simultâneas ao banco.
+            catalogo (CatalogoProdutos, optional): Cache de produtos usado nas consultas.
+            venda_repo (VendaRepository, optional): Repositório usado para gravar as vendas.
+        """
+        self.catalogo = catalogo or CatalogoProdutos()
+        self.venda_repo = venda_repo or VendaRepository()
+        # Uma única thread grava: as vendas nunca disputam o bloqueio de escrita entre si
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escrita")
+        self._leitores = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix="leitura")
+        # id -> Venda em andamento, do menos para o mais recentemente usado (só acessado no
+        # loop do asyncio). Carrinhos abandonados expiram após TEMPO_EXPIRACAO_CARRINHO.
+        self._carrinhos = OrderedDict()
+        self._ultimo_acesso = {} # id -> time.monotonic() do último uso
+        self._ids_carrinho = itertools.count(1)
+
+        self._rotas = [
+            ("GET", r"/produtos/(\d+)", self.obter_produto),
+            ("GET", r"/produtos", self.consultar_produtos),
+            ("POST", r"/carrinhos", self.criar_carrinho),
+            ("GET", r"/carrinhos/(\d+)", self.obter_carrinho),
+            ("DELETE", r"/carrinhos/(\d+)", self.descartar_carrinho),
+            ("POST", r"/carrinhos/(\d+)/itens", self.adicionar_item),
+            ("DELETE", r"/carrinhos/(\d+)/itens/(\d+)", self.remover_item),
+            ("POST", r"/carrinhos/(\d+)/finalizar", self.finalizar_carrinho),
+            ("POST", r"/vendas", self.registrar_venda),
+        ]
+        self._rotas = [(metodo, re.compile(padrao + r"/?$"), funcao) for metodo, padrao, funcao in self._rotas]
+
+    async def ler(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._leitores, funcao, *args)
+
+    async def gravar(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._escritor, funcao, *args)
+
+    def fechar(self):
+        """
+        Espera as gravações pendentes e encerra as threads.
+        """
+        self._escritor.shutdown(wait=True)
+        self._leitores.shutdown(wait=True)
+        self.catalogo.fechar()
+        gerenciador.fechar_todas()
+
+    # ----------------------------------------------------------------------------------
+    # Rotas
+
+    async def obter_produto(self, consulta, corpo, produto_id):
+        produto = await self.ler(self.catalogo.get_by_id, self._id(produto_id, "produto_id"))
+        if produto is None:
+            raise ErroHttp(404, "Produto não encontrado.")
+        return 200, produto_para_json(produto)
+
+    async def consultar_produtos(self, consulta, corpo):
+        if "codigo_barras" in consulta:
+            produto = await self.ler(self.catalogo.get_by_barcode, consulta["codigo_barras"])
+        elif "nome" in consulta:
+            produto = await self.ler(self.catalogo.get_by_name, consulta["nome"])
+        elif "busca" in consulta:
+            limite = self._inteiro(consulta.get("limite", 20), "limite", 0, MAIOR_INTEIRO_SQLITE)
+            produtos = await self.ler(self.catalogo.buscar, consulta["busca"], limite)
+            return 200, {"produtos": [produto_para_json(produto) for produto in produtos]}
+        else:
+            raise ErroHttp(400, "Informe codigo_barras, nome ou busca.")
+        if produto is None:
+            raise ErroHttp(404, "Produto não encontrado.")
+        return 200, produto_para_json(produto)
+
+    async def criar_carrinho(self, consulta, corpo):
+        self._expirar_carrinhos()
+        if len(self._carrinhos) >= MAXIMO_CARRINHOS:
+            raise ErroHttp(503, "Limite de carrinhos abertos atingido. Tente novamente mais tarde.")
+        carrinho_id = next(self._ids_carrinho)
+        self._guardar_carrinho(carrinho_id, Venda())
+        return 201, venda_para_json(self._carrinhos[carrinho_id], carrinho_id)
+
+    async def obter_carrinho(self, consulta, corpo, carrinho_id):
+        carrinho_id = self._id(carrinho_id, "carrinho")
+        return 200, venda_para_json(self._carrinho(carrinho_id), carrinho_id)
+
+    async def descartar_carrinho(self, consulta, corpo, carrinho_id):
+        carrinho_id = self._id(carrinho_id, "carrinho")
+        self._carrinho(carrinho_id)
+        self._retirar_carrinho(carrinho_id)
+        return 200, {"carrinho": carrinho_id, "descartado": True}
+
+    async def adicionar_item(self, consulta, corpo, carrinho_id):
+        carrinho_id = self._id(carrinho_id, "carrinho")
+        venda = self._carrinho(carrinho_id)
+        item = await self._criar_item(corpo, venda)
+        # Durante a busca do produto o carrinho pode ter sido finalizado ou descartado
+        if self._carrinhos.get(carrinho_id) is not venda:
+            raise ErroHttp(409, "O carrinho foi finalizado ou descartado enquanto o item era adicionado.")
+        venda.adicionar_item(item)
+        return 200, venda_para_json(venda, carrinho_id)
+
+    async def remover_item(self, consulta, corpo, carrinho_id, produto_id):
+        carrinho_id = self._id(carrinho_id, "carrinho")
+        venda = self._carrinho(carrinho_id)
+        if not venda.remover_linha(self._id(produto_id, "produto_id")):
+            raise ErroHttp(404, "Produto não está no carrinho.")
+        return 200, venda_para_json(venda, carrinho_id)
+
+    async def finalizar_carrinho(self, consulta, corpo, carrinho_id):
+        carrinho_id = self._id(carrinho_id, "carrinho")
+        venda = self._carrinho(carrinho_id)
+        tipo_pagamento = self._tipo_pagamento(corpo)
+        # O carrinho sai da lista enquanto é gravado: ninguém o altera no meio da gravação
+        self._retirar_carrinho(carrinho_id)
+        try:
+            await self.gravar(self.venda_repo.finalizar, venda, tipo_pagamento)
+        except BaseException:
+            self._guardar_carrinho(carrinho_id, venda) # Nada foi gravado: o carrinho continua aberto
+            raise
+        return 201, venda_para_json(venda)
+
+    async def registrar_venda(self, consulta, corpo):
+        """
+        Cria e finaliza uma venda em uma única requisição (sem carrinho no servidor).
+        """
+        tipo_pagamento = self._tipo_pagamento(corpo)
+        itens = corpo.get("itens")
+        if not isinstance(itens, list) or not itens:
+            raise ErroHttp(400, "Informe a lista de itens.")
+        venda = Venda()
+        for dados_item in itens:
+            venda.adicionar_item(await self._criar_item(dados_item, venda))
+        await self.gravar(self.venda_repo.finalizar, venda, tipo_pagamento)
+        return 201, venda_para_json(venda)
+
+    # ----------------------------------------------------------------------------------
+    # Funções internas das rotas
+
+    def _carrinho(self, carrinho_id):
+        venda = self._carrinhos.get(carrinho_id)
+        if venda is None:
+            raise ErroHttp(404, "Carrinho não encontrado.")
+        self._guardar_carrinho(carrinho_id, venda)
+        return venda
+
+    def _guardar_carrinho(self, carrinho_id, venda):
+        """
+        Guarda (ou renova) o carrinho como o mais recentemente usado.
+        """
+        self._carrinhos[carrinho_id] = venda
+        self._carrinhos.move_to_end(carrinho_id)
+        self._ultimo_acesso[carrinho_id] = time.monotonic()
+
+    def _retirar_carrinho(self, carrinho_id):
+        self._ultimo_acesso.pop(carrinho_id, None)
+        return self._carrinhos.pop(carrinho_id, None)
+
+    def _expirar_carrinhos(self):
+        """
+        Descarta os carrinhos sem uso há mais de TEMPO_EXPIRACAO_CARRINHO. Como estão em
+        ordem de uso, basta olhar o começo da lista.
+        """
+        limite = time.monotonic() - TEMPO_EXPIRACAO_CARRINHO
+        while self._carrinhos:
+            carrinho_id = next(iter(self._carrinhos))
+            if self._ultimo_acesso[carrinho_id] > limite:
+                break
+            self._retirar_carrinho(carrinho_id)
+
+    async def _criar_item(self, dados, venda):
+        """
+        Monta o ItemVenda a partir de {"produto_id" ou "codigo_barras", "quantidade"}.
+        """
+        if not isinstance(dados, dict):
+            raise ErroHttp(400, "Item inválido.")
+        if "codigo_barras" in dados:
+            produto = await self.ler(self.catalogo.get_by_barcode, str(dados["codigo_barras"]))
+        elif "produto_id" in dados:
+            produto = await self.ler(self.catalogo.get_by_id, self._id(dados["produto_id"], "produto_id"))
+        else:
+            raise ErroHttp(400, "Informe produto_id ou codigo_barras.")
+        if produto is None:
+            raise ErroHttp(404, "Produto não encontrado.")
+
+        try:
+            quantidade = para_quantidade(dados.get("quantidade", 1), produto.tipo_unidade)
+        except ValueError as e:
+            raise ErroHttp(400, str(e))
+        linha = venda.obter_linha(produto.id)
+        ja_na_venda = linha.quantidade if linha else 0
+        if quantidade <= 0 or ja_na_venda + quantidade > produto.estoque:
+            raise ErroHttp(409, "Quantidade inválida ou insuficiente em estoque.")
+        return ItemVenda(produto=produto, quantidade=quantidade, preco_unitario_na_venda=produto.preco)
+
+    @staticmethod
+    def _tipo_pagamento(corpo):
+        tipo_pagamento = str(corpo.get("tipo_pagamento", "")).upper()
+        if tipo_pagamento not in FORMAS_PAGAMENTO:
+            raise ErroHttp(400, f"Tipo de pagamento inválido. Use {', '.join(FORMAS_PAGAMENTO)}.")
+        return tipo_pagamento
+
+    @staticmethod
+    def _inteiro(valor, campo, minimo=None, maximo=None):
+        try:
+            numero = int(valor)
+        except (TypeError, ValueError):
+            raise ErroHttp(400, f"'{campo}' deve ser um número inteiro.")
+        if (minimo is not None and numero < minimo) or (maximo is not None and numero > maximo):
+            raise ErroHttp(400, f"'{campo}' fora do intervalo permitido.")
+        return numero
+
+    @classmethod
+    def _id(cls, valor, campo):
+        """
+        Identificador vindo do caminho ou do corpo. Fora do intervalo do SQLite a consulta
+        estouraria (OverflowError) e viraria um erro 500.
+        """
+        return cls._inteiro(valor, campo, 0, MAIOR_INTEIRO_SQLITE)
+
+    # ----------------------------------------------------------------------------------
+    # HTTP
+
+    async def tratar(self, metodo, alvo, corpo_bruto):
+        """
+        Encaminha a requisição para a rota. Retorna (status, dicionário da resposta).
+        """
+        partes = urlsplit(alvo)
+        consulta = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+        try:
+            corpo = json.loads(corpo_bruto) if corpo_bruto else {}
+            if not isinstance(corpo, dict):
+                raise ValueError("o corpo deve ser um objeto JSON")
+        except ValueError as e:
+            return 400, {"erro": f"JSON inválido ({e})"}
+
+        caminho_encontrado = False
+        for metodo_rota, padrao, funcao in self._rotas:
+            encontrado = padrao.match(partes.path)
+            if not encontrado:
+                continue
+            caminho_encontrado = True
+            if metodo_rota != metodo:
+                continue
+            try:
+                return await funcao(consulta, corpo, *encontrado.groups())
+            except ErroHttp as e:
+                return e.status, {"erro": str(e)}
+            except EstoqueInsuficienteError as e:
+                return 409, {"erro": str(e), "produtos": e.produtos}
+            except ConflitoVersaoError as e:
+                return 409, {"erro": str(e)}
+            except ValueError as e:
+                return 400, {"erro": str(e)}
+            except Exception as e:
+                print(f"Erro em {metodo} {alvo}: {e!r}")
+                return 500, {"erro": "Erro interno do servidor."}
+        if caminho_encontrado:
+            return 405, {"erro": "Método não permitido."}
+        return 404, {"erro": "Rota não encontrada."}
+
+    async def atender(self, leitor, escritor):
+        """
+        Atende uma conexão (HTTP/1.1, com keep-alive) até o cliente fechar.
+        """
+        try:
+            while True:
+                try:
+                    linha = await leitor.readline()
+                    if not linha:
+                        break
+                    cabecalhos = await self._ler_cabecalhos(leitor)
+                except ValueError:
+                    # Linha maior que o limite do StreamReader (64 KiB): a conexão não tem
+                    # como ser reaproveitada
+                    await self._responder(escritor, 431, {"erro": "Linha de requisição ou cabeçalho muito grande."},
+                                          manter=False)
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode("latin-1").split()
+                except ValueError:
+                    await self._responder(escritor, 400, {"erro": "Requisição inválida."}, manter=False)
+                    break
+
+                try:
+                    tamanho = int(cabecalhos.get("content-length") or 0)
+                except ValueError:
+                    tamanho = -1
+                if tamanho < 0:
+                    await self._responder(escritor, 400, {"erro": "Content-Length inválido."}, manter=False)
+                    break
+                if tamanho > TAMANHO_MAXIMO_CORPO:
+                    await self._responder(escritor, 413, {"erro": "Corpo muito grande."}, manter=False)
+                    break
+                corpo = await leitor.readexactly(tamanho) if tamanho else b""
+
+                status, resposta = await self.tratar(metodo.upper(), alvo, corpo)
+                manter = (cabecalhos.get("connection", "").lower() != "close" and versao == "HTTP/1.1")
+                await self._responder(escritor, status, resposta, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+    @staticmethod
+    async def _ler_cabecalhos(leitor):
+        cabecalhos = {}
+        while True:
+            linha = await leitor.readline()
+            if linha in (b"\r\n", b"\n", b""):
+                return cabecalhos
+            nome, _, valor = linha.decode("latin-1").partition(":")
+            cabecalhos[nome.strip().lower()] = valor.strip()
+
+    @staticmethod
+    async def _responder(escritor, status, resposta, manter):
+        dados = json.dumps(resposta, ensure_ascii=False).encode("utf-8")
+        escritor.write((f"HTTP/1.1 {status} {MOTIVOS.get(status, '')}\r\n"
+                        f"Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(dados)}\r\n"
+                        f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n").encode("latin-1") + dados)
+        await escritor.drain()
+
+async def servir(host="127.0.0.1", porta=8765, leitores=4):
+    """
+    Inicia o servidor e atende até ser interrompido (Ctrl+C).
+    """
+    aplicacao = ServidorCaixa(leitores)
+    servidor = await asyncio.start_server(aplicacao.atender, host, porta)
+    print(f"Servidor do caixa em http://{host}:{porta} (Ctrl+C para encerrar)")
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        aplicacao.fechar()
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON local do sistema de caixa.")
+    parser.add_argument("--host", default="127.0.0.1", help="Endereço (padrão: só esta máquina)")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--leitores", type=int, default=4, help="Threads para consultas simultâneas")
+    args = parser.parse_args(argumentos)
+
+    ativar_pelo_ambiente() # CAIXA_INSTRUMENTACAO=1: mede o acesso ao banco (ver src/instrumentacao.py)
+    create_tables()
+    try:
+        asyncio.run(servir(args.host, args.porta, args.leitores))
+    except KeyboardInterrupt:
+        print("Servidor encerrado.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())